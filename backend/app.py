@@ -1,4 +1,22 @@
+import os
+
+# Cooperative serving mode ("gevent" / "eventlet") has to patch the stdlib and the
+# Postgres driver before anything else imports sockets or threads.
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "threading")
+if ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+elif ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+    from psycogreen.eventlet import patch_psycopg
+    patch_psycopg()
+
+import base64
 import json
+import sys
 import subprocess
 import atexit
 import time
@@ -9,16 +27,35 @@ from typing import Any, Dict, Optional, List, Tuple
 from decimal import Decimal
 from datetime import datetime, timezone
 
-from flask import Flask, jsonify, request, abort, make_response
-from flask_socketio import SocketIO, emit
+from flask import Flask, jsonify, request, abort, make_response, g, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from flask_socketio import SocketIO, emit, join_room, leave_room
 
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.engine import Connection, RowMapping
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
+# Shared modules live next to the background jobs in scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import db
+from matching_engine import GTC, MATCH_LOG_PATH, DbReservationStore, EventLog, MatchingEngine, ReservationError
+from metrics import CONTENT_TYPE, REGISTRY, SIZE_BUCKETS, time_queries
+from compression import COMPRESSION_MIN_SIZE, compress_response
+from chain_indexer import INDEXER_INTERVAL, INDEXER_RPC_URL, ChainIndexer, RpcSource
+from order_book import OrderBook, available_amount, to_decimal
+from order_signing import CANCEL_FIELDS, MATCH_FIELDS, OrderVerifier, personal_digest, taker_message
+from portfolio import HOLDINGS_SQL, UPDATE_MARKS_SQL, PortfolioCache, market_inputs, value_portfolio
+from iv_surface import SURFACE_SQL, interpolate_surface
+from price_state import read_price_state
+from tracing import read_traces
+from risk import HOUSE, LATEST_REPORT_SQL, RISK_INTERVAL
+from streaming import BudgetExceeded, RowStream, batched, rows_response, stream_rows
+from supervisor import FETCHER_CHECK_SECONDS, ProcessSupervisor, SupervisedJob
+
 # -------------------------
 # Flask + SocketIO setup
 # -------------------------
@@ -29,33 +66,158 @@ app.config['SECRET_KEY'] = 'secret!'
 CORS(app, 
      origins="*",
      allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+     expose_headers=["X-Next-Cursor"])
 
 # Configure SocketIO with CORS
 socketio = SocketIO(app, 
+                   async_mode=ASYNC_MODE,
                    cors_allowed_origins="*",
                    cors_credentials=True,
-                   logger=True,
-                   engineio_logger=True)
+                   # long-polling bodies; websocket frames use permessage-deflate when the client offers it
+                   http_compression=True,
+                   compression_threshold=COMPRESSION_MIN_SIZE,
+                   logger=ASYNC_MODE == "threading",
+                   engineio_logger=ASYNC_MODE == "threading")
 
 
 # -------------------------
 # Database (Postgres via SQLAlchemy)
 # -------------------------
-DB_NAME = "crypto_info"
-DB_USER = "postgres"
-DB_PASSWORD = "mypassword"
-DB_HOST = "localhost"
-DB_PORT = "5433"
-
 ALLOWED_SORT = {"createdAt", "takerRate", "makerRate", "makerAmount", "takerAmount"}
 
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}", future=True)
+# Green threads share one process, so cooperative modes need a larger pool
+if ASYNC_MODE == "threading":
+    DB_POOL_SIZE, DB_MAX_OVERFLOW = db.POOL_SIZE, db.MAX_OVERFLOW
+else:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW = db.COOPERATIVE_POOL_SIZE, db.COOPERATIVE_MAX_OVERFLOW
+
+engine = db.get_engine("primary", pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+read_engine = db.get_engine("replica", pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+
+# -------------------------
+# Request / socket metrics (served on GET /metrics)
+# -------------------------
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests by route, method and status",
+                                 ["route", "method", "status"])
+HTTP_ERRORS = REGISTRY.counter("http_request_errors_total", "HTTP responses with status >= 400", ["route", "status"])
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Wall time per request", ["route", "method"])
+HTTP_DB_TIME = REGISTRY.histogram("http_request_db_seconds", "Time spent executing SQL per request", ["route"])
+HTTP_SERIALIZE_TIME = REGISTRY.histogram("http_request_serialize_seconds", "JSON encoding time per request", ["route"])
+HTTP_RESPONSE_SIZE = REGISTRY.histogram("http_response_size_bytes", "Response body size", ["route"],
+                                        buckets=SIZE_BUCKETS)
+DB_QUERY_TIME = REGISTRY.histogram("db_query_duration_seconds", "SQL statement time, requests and jobs alike")
+SOCKET_CLIENTS = REGISTRY.gauge("socketio_connected_clients", "Connected SocketIO clients")
+SOCKET_EMITS = REGISTRY.counter("socketio_emits_total", "SocketIO events emitted; rate() gives emits/sec", ["event"])
+REGISTRY.gauge("socketio_subscribed_instruments", "Instruments with at least one subscriber",
+               callback=lambda: len(subscriptions))
+REGISTRY.gauge("socketio_stream_tasks", "Active streaming background tasks",
+               callback=lambda: int(stream_task is not None))
+REGISTRY.gauge("process_threads", "Live threads in the API process", callback=threading.active_count)
+REGISTRY.gauge("db_pool_checked_out", "Connections checked out per pool", ["role"],
+               callback=lambda: {(role,): s["checked_out"] for role, s in db.pool_stats().items()})
+REGISTRY.gauge("db_pool_wait_seconds_max", "Longest pool checkout wait", ["role"],
+               callback=lambda: {(role,): s["wait_seconds_max"] for role, s in db.pool_stats().items()})
+PRICER_CYCLE = REGISTRY.histogram("pricer_cycle_seconds", "Wall time of one pricing subprocess run")
+PRICER_STAGE = REGISTRY.histogram("pricer_stage_seconds", "Time per pricing stage", ["symbol", "stage"])
+PRICER_CONTRACTS = REGISTRY.gauge("pricer_contracts", "Contracts priced in the last cycle", ["symbol"])
+PRICER_EVALS = REGISTRY.counter("pricer_integrand_evaluations_total",
+                                "Heston integrand evaluations by integration method", ["symbol", "method"])
+for _field, _name, _help in (
+        ("interval", "job_interval_seconds", "Current (adaptive) interval per supervised job"),
+        ("lastDuration", "job_last_duration_seconds", "Duration of the last run per supervised job"),
+        ("overruns", "job_overruns", "Runs that took longer than their interval"),
+        ("skipped", "job_skipped_runs", "Runs dropped because the previous one was still going"),
+        ("failures", "job_failures", "Runs that raised")):
+    REGISTRY.gauge(_name, _help, ["job"],
+                   callback=lambda f=_field: {(job_id,): job.health()[f] for job_id, job in jobs.items()})
+REGISTRY.gauge("process_restarts", "Restarts of supervised subprocesses", ["process"],
+               callback=lambda: {(fetcher.name,): fetcher.restarts})
+REGISTRY.gauge("process_up", "Whether a supervised subprocess is running", ["process"],
+               callback=lambda: {(fetcher.name,): int(fetcher.running())})
+
+
+def record_query_time(seconds: float) -> None:
+    DB_QUERY_TIME.observe(seconds)
+    if has_request_context():
+        g.db_seconds = g.get("db_seconds", 0.0) + seconds
+
+
+for _engine in {engine, read_engine}:
+    time_queries(_engine, record_query_time)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its encoding time charged to the current request."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context():
+                g.serialize_seconds = g.get("serialize_seconds", 0.0) + time.perf_counter() - started
+
+
+app.json = TimedJSONProvider(app)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    # templated rule keeps label cardinality bounded (/orders/<orderHash>, not every hash)
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    status = str(response.status_code)
+    HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+    HTTP_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method)
+    HTTP_DB_TIME.observe(g.get("db_seconds", 0.0), route=route)
+    HTTP_SERIALIZE_TIME.observe(g.get("serialize_seconds", 0.0), route=route)
+    size = response.calculate_content_length()
+    if size is not None:
+        HTTP_RESPONSE_SIZE.observe(size, route=route)
+    if response.status_code >= 400:
+        HTTP_ERRORS.inc(route=route, status=status)
+    return response
+
+
+# Registered after the metrics hook so it runs first and the recorded size is the wire size
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get("Accept-Encoding"))
+
+
+_socketio_emit = socketio.emit
+
+
+def counted_emit(event, *args, **kwargs):
+    # flask_socketio.emit() inside handlers also goes through socketio.emit
+    SOCKET_EMITS.inc(event=event)
+    return _socketio_emit(event, *args, **kwargs)
+
+
+socketio.emit = counted_emit
 
 # -------------------------
 # Background processes
 # -------------------------
-fetch_price_process = None
+PRICER_INTERVAL = float(os.environ.get("PRICER_INTERVAL", "1"))
+PRICER_MAX_INTERVAL = float(os.environ.get("PRICER_MAX_INTERVAL", "30"))
+PRICER_TIMEOUT = float(os.environ.get("PRICER_TIMEOUT", "60"))
+RISK_TIMEOUT = float(os.environ.get("RISK_TIMEOUT", str(3 * RISK_INTERVAL)))
+
+fetcher = ProcessSupervisor("fetch_price", ["python3", "scripts/fetch_price.py"])
+
+# Startup waits for these instead of a fixed sleep; after STARTUP_TIMEOUT it serves anyway
+STARTUP_TIMEOUT = float(os.environ.get("STARTUP_TIMEOUT", "60"))
+STARTUP_POLL_SECONDS = 0.2
+PRICED_SYMBOLS = ("ETH", "1INCH")
 
 
 def now_iso() -> str:
@@ -68,26 +230,34 @@ def abort_bad_request(message: str):
 
 
 # ------------------------------ Validation ------------------------------
-def validate_address(addr: str, field: str) -> None:
+def address_error(addr: str, field: str) -> Optional[str]:
     """
     Basic validation: expects a 0x-prefixed hex string of length 42 (20 bytes) or ENS-like names.
-    Raises a 400 abort if invalid.
+    Returns the error message if invalid, None otherwise.
     """
     if not isinstance(addr, str) or not addr:
-        abort_bad_request(f"bad {field}")
+        return f"bad {field}"
     # allow ENS-like (contain a dot) or 0x-address
     if addr.startswith("0x"):
         # hex check (42 chars, 0x + 40 hex chars)
         if len(addr) != 42:
-            abort_bad_request(f"bad {field}: invalid length")
+            return f"bad {field}: invalid length"
         try:
             int(addr[2:], 16)
         except ValueError:
-            abort_bad_request(f"bad {field}: not hex")
+            return f"bad {field}: not hex"
     else:
         # simple ENS-ish check (keep it permissive)
         if " " in addr or len(addr) < 3:
-            abort_bad_request(f"bad {field}")
+            return f"bad {field}"
+    return None
+
+
+def validate_address(addr: str, field: str) -> None:
+    """Raises a 400 abort if `addr` is not a valid address (see address_error)."""
+    message = address_error(addr, field)
+    if message:
+        abort_bad_request(message)
 
 
 def parse_statuses(s: Optional[str]) -> Optional[List[int]]:
@@ -103,6 +273,50 @@ def parse_statuses(s: Optional[str]) -> Optional[List[int]]:
         abort_bad_request("bad statuses")
 
 
+def parse_decimal_arg(name: str) -> Optional[Decimal]:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        parsed = Decimal(value)
+    except Exception:
+        abort_bad_request(f"bad {name}")
+    # NaN/sNaN would poison or raise in comparisons and SQL; Infinity is no bound
+    if not parsed.is_finite():
+        abort_bad_request(f"bad {name}")
+    return parsed
+
+
+def parse_int_arg(name: str) -> Optional[int]:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort_bad_request(f"bad {name}")
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for a serialized orders row: base64 of "<created_at>|<id>"."""
+    raw = f"{row['created_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        created = datetime.fromisoformat(created_at)
+        if created.tzinfo is None:
+            raise ValueError
+        return created, int(row_id)
+    except Exception:
+        abort_bad_request("bad cursor")
+
+
 def parse_pagination() -> Tuple[int, int]:
     try:
         page = int(request.args.get("page", "1"))
@@ -129,7 +343,16 @@ def get_db() -> Connection:
     Returns a SQLAlchemy Connection. Caller is responsible for closing the connection,
     but using "with get_db() as conn:" is preferred.
     """
-    return engine.connect()
+    return db.connect("primary")
+
+
+def get_read_db() -> Connection:
+    """
+    Connection for read-only market data. Routed to DATABASE_REPLICA_URL when configured,
+    otherwise the same primary pool as get_db(). Order reads stay on get_db() so they
+    see their own writes.
+    """
+    return db.connect("replica")
 
 
 def build_where(filters: Dict[str, Any], params: Dict[str, Any]) -> str:
@@ -240,29 +463,254 @@ def serialize_order(row: RowMapping) -> Dict[str, Any]:
     }
 
 
+def serialize_order_row(row: RowMapping) -> Dict[str, Any]:
+    """Row of the `orders` table as returned by /api/orders"""
+    order = {}
+    for k, v in row.items():
+        # Handle large numbers that should remain as strings
+        if k in ["salt", "making_amount", "taking_amount", "maker_traits"] and v:
+            order[k] = str(v)  # Keep as string for large numbers
+        else:
+            order[k] = convert_value(v)
+    return order
+
+
+# ------------------------------
+# Order book (open orders, kept in memory; the DB stays the durable store)
+# ------------------------------
+order_book = OrderBook()
+reservations = DbReservationStore(get_db)
+matching_engine = MatchingEngine(order_book, EventLog(MATCH_LOG_PATH), reservations)
+# Signatures are checked off the request thread: processes under threaded serving, threads under gevent/eventlet
+order_verifier = OrderVerifier(pool="process" if ASYNC_MODE == "threading" else "thread")
+atexit.register(order_verifier.close)
+portfolio_cache = PortfolioCache()
+
+
+def ensure_order_book() -> OrderBook:
+    if not order_book.loaded:
+        with order_book.lock:
+            if not order_book.loaded:
+                # open orders at their remaining amount less live reservations (see order_book.available_amount)
+                rows = stream_rows(get_db, text("""
+                    SELECT o.*, r.reserved_amount
+                    FROM orders o
+                    LEFT JOIN (
+                        SELECT order_hash, SUM(amount)::TEXT AS reserved_amount
+                        FROM order_reservations WHERE reserved_until > :now
+                        GROUP BY order_hash
+                    ) r ON r.order_hash = o.order_hash
+                    WHERE o.status = 'open'
+                    ORDER BY o.created_at ASC, o.id ASC
+                """), {"now": int(time.time())})
+                count = order_book.load(serialize_order_row(r) for r in rows)
+                print(f"✅ Order book loaded with {count} open orders")
+    return order_book
+
+
 # ------------------------------
 # Background jobs
 # ------------------------------
-def start_fetch_price():
-    global fetch_price_process
-    if fetch_price_process is None or fetch_price_process.poll() is not None:
-        fetch_price_process = subprocess.Popen(["python3", "scripts/fetch_price.py"])
-        print("✅ fetch_price started")
+def readiness() -> Dict[str, Any]:
+    """Database reachable and at least one live price published by the fetcher"""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        database = True
+    except Exception:
+        database = False
+    prices = {symbol: read_price_state(symbol) is not None for symbol in PRICED_SYMBOLS}
+    return {"database": database, "prices": prices, "ready": database and any(prices.values())}
+
+
+def wait_until_ready(timeout: float = STARTUP_TIMEOUT) -> bool:
+    started = time.time()
+    state = readiness()
+    while not state["ready"] and time.time() - started < timeout:
+        time.sleep(STARTUP_POLL_SECONDS)
+        state = readiness()
+    elapsed = time.time() - started
+    if state["ready"]:
+        print(f"✅ Ready in {elapsed:.1f}s (prices: {', '.join(s for s, ok in state['prices'].items() if ok)})")
     else:
-        print("ℹ️ fetch_price already running")
+        print(f"⚠️ Not ready after {elapsed:.0f}s (database: {state['database']}, prices: {state['prices']}), "
+              f"serving anyway")
+    return state["ready"]
+
+
+def record_pricer_traces(started: float) -> None:
+    """Fold the stage spans and counters the pricer wrote for this run into /metrics."""
+    for trace in read_traces(newer_than=started):
+        symbol = trace["name"]
+        for span in trace["spans"]:
+            PRICER_STAGE.observe(span["seconds"], symbol=symbol, stage=span["stage"])
+        counters = trace["counters"]
+        if "contracts" in counters:
+            PRICER_CONTRACTS.set(counters["contracts"], symbol=symbol)
+        for name, value in counters.items():
+            if name.startswith("integrand_evals_"):
+                PRICER_EVALS.inc(value, symbol=symbol, method=name[len("integrand_evals_"):])
 
 
 def run_heston_model():
+    # Failures propagate to the job supervisor, which counts them and adjusts the interval
+    started = time.time()
     try:
-        subprocess.run(["python3", "scripts/heston_model.py"], check=True)
+        subprocess.run(["python3", "scripts/heston_model.py"], check=True, timeout=PRICER_TIMEOUT)
         print("✅ heston_model job executed")
+    finally:
+        PRICER_CYCLE.observe(time.time() - started)
+        record_pricer_traces(started)
+    # New quotes: re-mark holdings in one statement and drop cached portfolio valuations
+    try:
+        with get_db() as conn:
+            conn.execute(UPDATE_MARKS_SQL)
+            conn.commit()
     except Exception as e:
-        print(f"❌ heston_model failed: {e}")
+        print(f"❌ holdings mark update failed: {e}")
+    portfolio_cache.bump()
+
+
+def run_risk_batch():
+    # A hung batch is killed at RISK_TIMEOUT; failures and timeouts are counted by the job supervisor
+    subprocess.run(["python3", "scripts/risk.py"], check=True, timeout=RISK_TIMEOUT)
+
+
+# Expired orders leave status = 'open' in bulk; the book's expiry heap says when anything is due.
+# Each sweep also closes open rows whose option expired since the previous sweep, which covers rows
+# that are not in the book (e.g. fully matched); a periodic full sweep catches anything older.
+EXPIRY_SWEEP_SECONDS = float(os.environ.get("EXPIRY_SWEEP_SECONDS", "5"))
+EXPIRY_FULL_SWEEP_SECONDS = float(os.environ.get("EXPIRY_FULL_SWEEP_SECONDS", "300"))
+last_full_sweep = 0.0
+last_sweep = 0.0
+
+
+def publish_invalidations(order_hashes: List[str], reason: str) -> None:
+    """Tell websocket clients which orders just left the open set."""
+    if order_hashes:
+        socketio.emit("orders_invalidated", {"orderHashes": order_hashes, "reason": reason})
+
+
+def sweep_expired_orders():
+    global last_full_sweep, last_sweep
+    now = time.time()
+    try:
+        book = ensure_order_book()
+    except Exception as e:
+        print(f"❌ expiry sweep skipped, order book not loaded: {e}")
+        return
+    # matches whose taker has not settled by their deadline give the amount back to the book
+    try:
+        released = matching_engine.release_expired(now)
+        if released:
+            print(f"✅ released {released} lapsed match reservations")
+    except Exception as e:
+        print(f"❌ reservation release failed: {e}")
+    due = book.pop_expired(now)
+    full = now - last_full_sweep >= EXPIRY_FULL_SWEEP_SECONDS
+    if not due and not full:
+        return
+
+    # incremental passes only look at options that expired in (last_sweep, now]
+    expiry_predicate = "option_expiry <= :now" if full else "option_expiry > :since AND option_expiry <= :now"
+    update_sql = text(f"""
+        UPDATE orders
+        SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'open'
+          AND (order_hash = ANY(:hashes) OR ({expiry_predicate}))
+        RETURNING order_hash
+    """)
+    due_hashes = [order_hash for order_hash, _ in due]
+    try:
+        with get_db() as conn:
+            expired = [r[0] for r in conn.execute(update_sql, {"hashes": due_hashes, "since": int(last_sweep),
+                                                                "now": int(now)})]
+            conn.commit()
+    except Exception as e:
+        book.requeue_expired(due)
+        print(f"❌ expiry sweep failed: {e}")
+        return
+    last_sweep = now
+    if full:
+        last_full_sweep = now
+
+    # due orders that were no longer open in the DB leave the book as well
+    for order_hash in set(expired).union(due_hashes):
+        matching_engine.on_maker_removed(order_hash)
+    if expired:
+        publish_invalidations(expired, "expired")
+        print(f"✅ expired {len(expired)} orders")
+
+
+# On-chain fills/cancels flow back into the book when an RPC endpoint is configured
+chain_indexer = ChainIndexer(RpcSource(INDEXER_RPC_URL), engine) if INDEXER_RPC_URL else None
+
+
+def sync_chain_events():
+    try:
+        result = chain_indexer.sync_once()
+    except Exception as e:
+        print(f"❌ chain indexer failed: {e}")
+        return
+    if result.rolled_back_to is not None:
+        print(f"⚠️ chain indexer rolled back to block {result.rolled_back_to}")
+    book = ensure_order_book()
+    invalidated: Dict[str, List[str]] = {}
+    # reservations are read under the book lock so no fill reserves in between
+    with book.lock:
+        try:
+            reserved = reservations.reserved([row["order_hash"] for row in result.orders
+                                              if row["status"] == "open"], time.time())
+        except Exception as e:
+            print(f"⚠️ chain sync: reservations unavailable, keeping the book's: {e}")
+            reserved = None
+        for row in result.orders:
+            order = serialize_order_row(row)
+            if order["status"] == "open":
+                booked = book.get(order["order_hash"])
+                if reserved is not None:
+                    order["reserved_amount"] = str(reserved.get(order["order_hash"], 0))
+                elif booked is not None:
+                    order["reserved_amount"] = booked.row.get("reserved_amount")
+                if booked is None:
+                    # reopened by a reorg rollback
+                    matching_engine.on_maker_added(book.add(order))
+                else:
+                    # remaining_amount less what is still matched off-chain and not yet settled
+                    booked.amount = available_amount(order)
+                    booked.row = order
+            else:
+                matching_engine.on_maker_removed(order["order_hash"])
+                invalidated.setdefault(order["status"], []).append(order["order_hash"])
+    for status, order_hashes in invalidated.items():
+        publish_invalidations(order_hashes, status)
+    if result.holders:
+        portfolio_cache.invalidate(result.holders)
+        socketio.emit("holdings_updated", {"users": sorted(result.holders)})
 
 
 scheduler = BackgroundScheduler()
-scheduler.add_job(func=run_heston_model, trigger="interval", seconds=1, id="heston_model_job")
-atexit.register(lambda: scheduler.shutdown())
+jobs: Dict[str, SupervisedJob] = {
+    "heston_model_job": SupervisedJob(scheduler, "heston_model_job", run_heston_model, PRICER_INTERVAL,
+                                      PRICER_MAX_INTERVAL),
+    "risk_job": SupervisedJob(scheduler, "risk_job", run_risk_batch, RISK_INTERVAL, RISK_TIMEOUT),
+}
+scheduler.add_job(func=fetcher.check, trigger="interval", seconds=FETCHER_CHECK_SECONDS,
+                  id="fetcher_watchdog_job", max_instances=1, coalesce=True)
+if chain_indexer is not None:
+    scheduler.add_job(func=sync_chain_events, trigger="interval", seconds=INDEXER_INTERVAL,
+                      id="chain_indexer_job", max_instances=1, coalesce=True)
+scheduler.add_job(func=sweep_expired_orders, trigger="interval", seconds=EXPIRY_SWEEP_SECONDS,
+                  id="order_expiry_job", max_instances=1, coalesce=True)
+scheduler.add_listener(lambda event: event.job_id in jobs and jobs[event.job_id].missed(),
+                       EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+
+@atexit.register
+def stop_background_jobs():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    fetcher.stop()
 
 
 # -------------------------
@@ -276,6 +724,10 @@ def convert_value(obj):
     return obj
 
 
+def serialize_row(row: RowMapping) -> Dict[str, Any]:
+    return {k: convert_value(v) for k, v in row.items()}
+
+
 # -------------------------
 # REST Endpoints
 # -------------------------
@@ -283,13 +735,40 @@ def convert_value(obj):
 def get_latest_options():
     query = text("""
         SELECT DISTINCT ON (instrument_name) 
-            instrument_name, heston_price, strike_price, expiration_date, option_type, timestamp
+            instrument_name, heston_price, bid_price, ask_price, implied_vol, strike_price, expiration_date, option_type, timestamp
         FROM crypto_options
+        WHERE expiration_date > EXTRACT(EPOCH FROM NOW())
         ORDER BY instrument_name, timestamp DESC
     """)
-    with get_db() as conn:
-        rows = conn.execute(query).mappings().all()
-    return jsonify([{k: convert_value(v) for k, v in row.items()} for row in rows])
+    return rows_response(RowStream(get_read_db, query), serialize_row)
+
+
+def parse_float_list(name: str) -> Optional[List[float]]:
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        values = [float(v) for v in raw.split(",") if v.strip()]
+    except ValueError:
+        abort_bad_request(f"Invalid {name}, expected comma-separated numbers")
+    if not values or any(not (v > 0) for v in values):
+        abort_bad_request(f"Invalid {name}, expected positive numbers")
+    return values
+
+
+@app.route("/options/iv/<symbol>")
+def get_iv_surface(symbol: str):
+    """
+    Implied-vol surface (expiry x strike) from the latest pricing cycle. Optional
+    ?strikes=3000,3150 and/or ?expiries=<unix ts>,... resample it without repricing.
+    """
+    strikes = parse_float_list("strikes")
+    expiries = parse_float_list("expiries")
+    with get_read_db() as conn:
+        surface = conn.execute(SURFACE_SQL, {"symbol": symbol.upper()}).scalar()
+    if surface is None:
+        return jsonify({"error": f"No volatility surface available for {symbol}"}), 404
+    return jsonify(interpolate_surface(surface, strikes, expiries))
 
 
 @app.route("/option/history")
@@ -299,16 +778,15 @@ def get_option_history():
         return jsonify({"error": "Missing instrument parameter"}), 400
 
     query = text("""
-        SELECT instrument_name, heston_price, strike_price, expiration_date, option_type, timestamp
+        SELECT instrument_name, heston_price, bid_price, ask_price, implied_vol, strike_price, expiration_date, option_type, timestamp
         FROM crypto_options
         WHERE instrument_name = :instrument
         ORDER BY timestamp ASC
     """)
-    with get_db() as conn:
-        rows = conn.execute(query, {"instrument": instrument_name}).mappings().all()
+    rows = RowStream(get_read_db, query, {"instrument": instrument_name})
     if not rows:
         return jsonify({"error": "No data found for instrument"}), 404
-    return jsonify([{k: convert_value(v) for k, v in row.items()} for row in rows])
+    return rows_response(rows, serialize_row)
 
 
 @app.route("/prices/live")
@@ -323,15 +801,29 @@ def get_live_prices():
     """)
     
     try:
-        with get_db() as conn:
-            rows = conn.execute(query).mappings().all()
+        # Prefer the fetcher's live state; completed bars only reach the DB in batches
+        prices = {}
+        for symbol in ('ETH', '1INCH'):
+            snap = read_price_state(symbol)
+            if snap is not None:
+                prices[symbol] = {
+                    'price': snap['spot'],
+                    'timestamp': convert_value(datetime.fromtimestamp(snap['ts'], tz=timezone.utc)),
+                    'symbol': symbol
+                }
+
+        rows = []
+        if len(prices) < 2:
+            with get_read_db() as conn:
+                rows = conn.execute(query).mappings().all()
             
-        if not rows:
+        if not rows and not prices:
             return jsonify({"error": "No price data available"}), 404
             
         # Format the response as a dictionary with symbol as key
-        prices = {}
         for row in rows:
+            if row['symbol'] in prices:
+                continue
             prices[row['symbol']] = {
                 'price': convert_value(row['price']),
                 'timestamp': convert_value(row['timestamp']),
@@ -368,7 +860,26 @@ def get_live_price_by_symbol(symbol: str):
     """)
     
     try:
-        with get_db() as conn:
+        # The in-progress bar lives in the fetcher's shared state until it is flushed
+        snap = read_price_state(symbol)
+        if snap is not None and snap['bar'] is not None:
+            bar = snap['bar']
+            return jsonify({
+                'success': True,
+                'data': {
+                    'symbol': symbol,
+                    'price': snap['spot'],
+                    'open': bar['open'],
+                    'high': bar['high'],
+                    'low': bar['low'],
+                    'volume': 0,
+                    'timestamp': convert_value(datetime.fromtimestamp(snap['ts'], tz=timezone.utc)),
+                    'barStart': convert_value(datetime.fromtimestamp(bar['start'], tz=timezone.utc))
+                },
+                'timestamp': convert_value(datetime.now(timezone.utc))
+            })
+
+        with get_read_db() as conn:
             row = conn.execute(query, {"symbol": symbol}).mappings().first()
             
         if not row:
@@ -417,32 +928,18 @@ def get_price_history(symbol: str):
     """ % hours)
     
     try:
-        with get_db() as conn:
-            rows = conn.execute(query, {"symbol": symbol, "limit": limit}).mappings().all()
-            
+        rows = RowStream(get_read_db, query, {"symbol": symbol, "limit": limit})
         if not rows:
             return jsonify({"error": f"No price history available for {symbol}"}), 404
-            
-        history = []
-        for row in rows:
-            history.append({
-                'symbol': row['symbol'],
-                'price': convert_value(row['price']),
-                'open': convert_value(row['open']),
-                'high': convert_value(row['high']),
-                'low': convert_value(row['low']),
-                'volume': convert_value(row['volume']),
-                'timestamp': convert_value(row['timestamp'])
-            })
-            
-        return jsonify({
+
+        return rows_response(rows, serialize_row, envelope={
             'success': True,
-            'data': history,
             'symbol': symbol,
-            'count': len(history),
             'timestamp': convert_value(datetime.now(timezone.utc))
-        })
-        
+        }, key='data', count_key='count')
+
+    except BudgetExceeded:
+        raise
     except Exception as e:
         return jsonify({
             'error': f'Failed to fetch price history for {symbol}',
@@ -450,22 +947,43 @@ def get_price_history(symbol: str):
         }), 500
 
 
-@app.post("/api/orders")
-def create_order():
-    body = request.get_json(silent=True) or {}
-    required = ["orderHash", "maker", "makerAsset", "takerAsset", "makingAmount", "takingAmount", "salt", "makerTraits", "orderData"]
-    
+ORDER_REQUIRED_FIELDS = ["orderHash", "maker", "makerAsset", "takerAsset", "makingAmount", "takingAmount", "salt", "makerTraits", "orderData"]
+ORDER_COLUMNS = """
+    order_hash, maker, maker_asset, taker_asset, making_amount, taking_amount,
+    salt, maker_traits, order_data, option_strike, option_expiry, option_type,
+    option_premium, signature, extension_data, status, valid_at, chain_order_hash, receiver
+"""
+# Upper bound on orders per batch request (a full chain is ~44 instruments per side)
+MAX_BATCH_ORDERS = 500
+
+
+def build_order(body: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a posted order body; returns (order row, None) or (None, error message)."""
+    if not isinstance(body, dict):
+        return None, "Order must be an object"
+
     # Validate required fields
-    for field in required:
+    for field in ORDER_REQUIRED_FIELDS:
         if field not in body:
-            return jsonify({"statusCode": 400, "message": f"Missing {field}", "error": "Bad Request"}), 400
-    
+            return None, f"Missing {field}"
+
     # Validate addresses
     for addr_field in ["maker", "makerAsset", "takerAsset"]:
-        validate_address(body[addr_field], addr_field)
-    
+        message = address_error(body[addr_field], addr_field)
+        if message:
+            return None, message
+    if body.get("receiver"):
+        message = address_error(body["receiver"], "receiver")
+        if message:
+            return None, message
+
+    try:
+        valid_at = datetime.fromtimestamp(body.get("validAt"), tz=timezone.utc) if body.get("validAt") else None
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None, "bad validAt"
+
     # Build order object
-    order = {
+    return {
         "order_hash": body["orderHash"],
         "maker": body["maker"],
         "maker_asset": body["makerAsset"],
@@ -482,87 +1000,234 @@ def create_order():
         "signature": body.get("signature"),
         "extension_data": body.get("extensionData"),
         "status": "open",
-        "valid_at": datetime.fromtimestamp(body.get("validAt"), tz=timezone.utc) if body.get("validAt") else None
-    }
+        "valid_at": valid_at,
+        "chain_order_hash": None,
+        # signed into the order struct; NULL means the frontend's default, receiver = maker
+        "receiver": body.get("receiver") or None
+    }, None
+
+
+@app.post("/api/orders")
+def create_order():
+    body = request.get_json(silent=True) or {}
+    order, message = build_order(body)
+    if not message:
+        message = order_verifier.verify(order, order["receiver"])
+    if message:
+        return jsonify({"statusCode": 400, "message": message, "error": "Bad Request"}), 400
+    order["chain_order_hash"] = order_verifier.chain_hash(order, order["receiver"])
     
-    insert_sql = text("""
-        INSERT INTO orders (
-            order_hash, maker, maker_asset, taker_asset, making_amount, taking_amount,
-            salt, maker_traits, order_data, option_strike, option_expiry, option_type,
-            option_premium, signature, extension_data, status, valid_at
-        ) VALUES (
+    insert_sql = text(f"""
+        INSERT INTO orders ({ORDER_COLUMNS}) VALUES (
             :order_hash, :maker, :maker_asset, :taker_asset, :making_amount, :taking_amount,
             :salt, :maker_traits, :order_data, :option_strike, :option_expiry, :option_type,
-            :option_premium, :signature, :extension_data, :status, :valid_at
+            :option_premium, :signature, :extension_data, :status, :valid_at, :chain_order_hash, :receiver
         )
+        RETURNING *
     """)
     
     try:
+        book = ensure_order_book()
         with get_db() as conn:
-            conn.execute(insert_sql, order)
+            row = conn.execute(insert_sql, order).mappings().first()
             conn.commit()
+        bundles = matching_engine.on_maker_added(book.add(serialize_order_row(row)))
     except IntegrityError:
         return jsonify({"statusCode": 400, "message": "Duplicate entry", "error": "Bad Request"}), 400
     except Exception as e:
         return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
     
+    if bundles:
+        return jsonify({"success": True, "matches": [b.to_dict() for b in bundles]}), 201
     return jsonify({"success": True}), 201
 
 
+def batch_items(field: str) -> List[Any]:
+    body = request.get_json(silent=True) or {}
+    items = body.get(field) if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        abort_bad_request(f"{field} must be a non-empty list")
+    if len(items) > MAX_BATCH_ORDERS:
+        abort_bad_request(f"at most {MAX_BATCH_ORDERS} {field} per batch")
+    return items
+
+
+@app.post("/api/orders/batch")
+def create_orders_batch():
+    """
+    Insert up to MAX_BATCH_ORDERS orders with one statement in one transaction.
+    Invalid or duplicate items are reported per item and do not block the rest.
+    """
+    items = batch_items("orders")
+    results: List[Dict[str, Any]] = [None] * len(items)
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+    seen = set()
+    for i, body in enumerate(items):
+        order, message = build_order(body)
+        if order is not None and order["order_hash"] in seen:
+            message = "Duplicate entry in batch"
+        if message:
+            order_hash = body.get("orderHash") if isinstance(body, dict) else None
+            results[i] = {"index": i, "orderHash": order_hash, "statusCode": 400, "message": message}
+            continue
+        seen.add(order["order_hash"])
+        valid.append((i, order))
+
+    # Hash/signature checks for the whole batch run in parallel on the verifier pool
+    reasons = order_verifier.verify_many([(order, order["receiver"]) for _, order in valid])
+    for (i, order), reason in zip(valid, reasons):
+        if reason:
+            results[i] = {"index": i, "orderHash": order["order_hash"], "statusCode": 400, "message": reason}
+    valid = [(i, order) for (i, order), reason in zip(valid, reasons) if not reason]
+    for _, order in valid:
+        order["chain_order_hash"] = order_verifier.chain_hash(order, order["receiver"])
+
+    # One round trip: rows travel as a JSON array and conflicts are skipped rather than aborting
+    insert_sql = text(f"""
+        INSERT INTO orders ({ORDER_COLUMNS})
+        SELECT {ORDER_COLUMNS}
+        FROM jsonb_to_recordset(CAST(:orders AS jsonb)) AS r(
+            order_hash TEXT, maker TEXT, maker_asset TEXT, taker_asset TEXT, making_amount TEXT,
+            taking_amount TEXT, salt TEXT, maker_traits TEXT, order_data TEXT, option_strike NUMERIC,
+            option_expiry BIGINT, option_type VARCHAR(4), option_premium NUMERIC, signature TEXT,
+            extension_data TEXT, status TEXT, valid_at TIMESTAMPTZ, chain_order_hash TEXT, receiver TEXT
+        )
+        ON CONFLICT (order_hash) DO NOTHING
+        RETURNING *
+    """)
+
+    matches = []
+    if valid:
+        try:
+            book = ensure_order_book()
+            payload = json.dumps([order for _, order in valid], default=str)
+            with get_db() as conn:
+                rows = conn.execute(insert_sql, {"orders": payload}).mappings().all()
+                conn.commit()
+        except Exception as e:
+            return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+
+        inserted = {row["order_hash"]: row for row in rows}
+        with book.lock:
+            for i, order in valid:
+                row = inserted.get(order["order_hash"])
+                if row is None:
+                    results[i] = {"index": i, "orderHash": order["order_hash"], "statusCode": 400,
+                                  "message": "Duplicate entry"}
+                    continue
+                bundles = matching_engine.on_maker_added(book.add(serialize_order_row(row)))
+                matches.extend(b.to_dict() for b in bundles)
+                results[i] = {"index": i, "orderHash": order["order_hash"], "statusCode": 201, "success": True}
+
+    created = sum(1 for r in results if r["statusCode"] == 201)
+    response = {"success": created == len(items), "created": created, "failed": len(items) - created,
+                "results": results}
+    if matches:
+        response["matches"] = matches
+    return jsonify(response), 200
+
+
 # Updated get_orders function with proper large number handling
 @app.get("/api/orders")
 def get_orders():
+    """
+    Newest-first order listing. Pages are keyset-based: pass the X-Next-Cursor header of
+    one page as `cursor` to get the next, so deep pages cost the same as the first.
+    """
     # Parse query parameters
     status = request.args.get("status", "open")
     maker_asset = request.args.get("makerAsset")
     taker_asset = request.args.get("takerAsset")
-    limit = min(int(request.args.get("limit", "50")), 100)
+    maker = request.args.get("maker")
+    try:
+        limit = min(int(request.args.get("limit", "50")), 100)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        abort_bad_request("bad limit")
     option_strike = request.args.get("strikePrice")
+    option_type = request.args.get("optionType")
+    ranges = {
+        "min_strike": parse_decimal_arg("minStrike"),
+        "max_strike": parse_decimal_arg("maxStrike"),
+        "min_expiry": parse_int_arg("minExpiry"),
+        "max_expiry": parse_int_arg("maxExpiry"),
+        "min_premium": parse_decimal_arg("minPremium"),
+        "max_premium": parse_decimal_arg("maxPremium"),
+    }
+    before = decode_cursor(request.args.get("cursor"))
     
     if maker_asset:
         validate_address(maker_asset, "makerAsset")
     if taker_asset:
         validate_address(taker_asset, "takerAsset")
+    if maker:
+        validate_address(maker, "maker")
+
+    # Open orders are served from the in-memory book
+    if status == "open":
+        try:
+            rows = ensure_order_book().list(maker_asset, taker_asset, option_type, option_strike, limit=limit,
+                                            maker=maker, before=before, **ranges)
+        except Exception as e:
+            return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+        return paged_response(rows, limit)
     
     # Build WHERE clause
     where_clauses = ["status = :status"]
     params = {"status": status, "limit": limit}
     
+    # addresses match case-insensitively, as in the order book
     if maker_asset:
-        where_clauses.append("maker_asset = :maker_asset")
-        params["maker_asset"] = maker_asset
+        where_clauses.append("lower(maker_asset) = :maker_asset")
+        params["maker_asset"] = maker_asset.lower()
     if taker_asset:
-        where_clauses.append("taker_asset = :taker_asset")
-        params["taker_asset"] = taker_asset
+        where_clauses.append("lower(taker_asset) = :taker_asset")
+        params["taker_asset"] = taker_asset.lower()
+    if maker:
+        where_clauses.append("lower(maker) = :maker")
+        params["maker"] = maker.lower()
     if option_strike:
         where_clauses.append("option_strike = :option_strike")
         params["option_strike"] = option_strike
+    if option_type:
+        where_clauses.append("option_type = :option_type")
+        params["option_type"] = option_type
+    for name, column, op in (
+        ("min_strike", "option_strike", ">="), ("max_strike", "option_strike", "<="),
+        ("min_expiry", "option_expiry", ">="), ("max_expiry", "option_expiry", "<="),
+        ("min_premium", "option_premium", ">="), ("max_premium", "option_premium", "<="),
+    ):
+        if ranges[name] is not None:
+            where_clauses.append(f"{column} {op} :{name}")
+            params[name] = ranges[name]
+    if before:
+        where_clauses.append("(created_at, id) < (:cursor_created_at, :cursor_id)")
+        params["cursor_created_at"], params["cursor_id"] = before
     
     where_clause = " AND ".join(where_clauses)
     
     sql = text(f"""
         SELECT * FROM orders
         WHERE {where_clause}
-        ORDER BY created_at DESC
+        ORDER BY created_at DESC, id DESC
         LIMIT :limit
     """)
     
     try:
         with get_db() as conn:
             rows = conn.execute(sql, params).mappings().all()
-            orders = []
-            for row in rows:
-                order = {}
-                for k, v in row.items():
-                    # Handle large numbers that should remain as strings
-                    if k in ["salt", "making_amount", "taking_amount", "maker_traits"] and v:
-                        order[k] = str(v)  # Keep as string for large numbers
-                    else:
-                        order[k] = convert_value(v)
-                orders.append(order)
-            return jsonify(orders)
     except Exception as e:
         return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+    return paged_response([serialize_order_row(row) for row in rows], limit)
+
+
+def paged_response(rows: List[Dict[str, Any]], limit: int):
+    """The body stays a plain list; the cursor for the next page goes in X-Next-Cursor."""
+    response = jsonify(rows)
+    if len(rows) == limit and rows[-1].get("created_at") and rows[-1].get("id") is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return response
 
 
 # New endpoint to close an order
@@ -570,36 +1235,39 @@ def get_orders():
 def close_order(orderHash: str):
     """Mark an order as closed by orderHash"""
     
-    # First check if order exists
+    # Close in one statement; only look the order up again to explain a miss
+    update_sql = text("""
+        UPDATE orders 
+        SET status = 'closed', updated_at = CURRENT_TIMESTAMP 
+        WHERE order_hash = :order_hash AND status = 'open'
+        RETURNING id
+    """)
     check_sql = text("SELECT id, status FROM orders WHERE order_hash = :order_hash")
     
     try:
         with get_db() as conn:
-            existing_order = conn.execute(check_sql, {"order_hash": orderHash}).mappings().first()
-            
-            if not existing_order:
-                return jsonify({
-                    "statusCode": 404, 
-                    "message": "Order not found", 
-                    "error": "Not Found"
-                }), 404
+            closed = conn.execute(update_sql, {"order_hash": orderHash}).first()
             
-            if existing_order["status"] == "closed":
+            if closed is None:
+                existing_order = conn.execute(check_sql, {"order_hash": orderHash}).first()
+                conn.rollback()
+                if not existing_order:
+                    return jsonify({
+                        "statusCode": 404, 
+                        "message": "Order not found", 
+                        "error": "Not Found"
+                    }), 404
+                # filled, expired, cancelled or already closed orders are not reopened as closed;
+                # all of them keep the endpoint's 400, the message names the status
                 return jsonify({
-                    "statusCode": 400, 
-                    "message": "Order is already closed", 
+                    "statusCode": 400,
+                    "message": f"Order is already {existing_order.status}",
                     "error": "Bad Request"
                 }), 400
             
-            # Update order status to closed
-            update_sql = text("""
-                UPDATE orders 
-                SET status = 'closed', updated_at = CURRENT_TIMESTAMP 
-                WHERE order_hash = :order_hash
-            """)
-            
-            conn.execute(update_sql, {"order_hash": orderHash})
             conn.commit()
+            matching_engine.on_maker_removed(orderHash)
+            publish_invalidations([orderHash], "closed")
             
             return jsonify({
                 "success": True,
@@ -615,6 +1283,187 @@ def close_order(orderHash: str):
         }), 500
 
 
+@app.post("/api/orders/close/batch")
+def close_orders_batch():
+    """Close up to MAX_BATCH_ORDERS orders by hash in one transaction, with per-hash results."""
+    hashes = batch_items("orderHashes")
+    if not all(isinstance(h, str) and h for h in hashes):
+        abort_bad_request("orderHashes must be strings")
+    unique = list(dict.fromkeys(hashes))
+
+    update_sql = text("""
+        UPDATE orders
+        SET status = 'closed', updated_at = CURRENT_TIMESTAMP
+        WHERE order_hash = ANY(:hashes) AND status = 'open'
+        RETURNING order_hash
+    """)
+    check_sql = text("SELECT order_hash, status FROM orders WHERE order_hash = ANY(:hashes)")
+
+    try:
+        with get_db() as conn:
+            closed = {r[0] for r in conn.execute(update_sql, {"hashes": unique})}
+            missed = [h for h in unique if h not in closed]
+            existing = {r[0]: r[1] for r in conn.execute(check_sql, {"hashes": missed})} if missed else {}
+            conn.commit()
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+
+    for order_hash in closed:
+        matching_engine.on_maker_removed(order_hash)
+    publish_invalidations([h for h in unique if h in closed], "closed")
+
+    results = []
+    reported = set()
+    for i, order_hash in enumerate(hashes):
+        if order_hash in reported:
+            results.append({"index": i, "orderHash": order_hash, "statusCode": 400, "message": "Duplicate entry in batch"})
+        elif order_hash in closed:
+            results.append({"index": i, "orderHash": order_hash, "statusCode": 200, "success": True})
+        elif order_hash in existing:
+            results.append({"index": i, "orderHash": order_hash, "statusCode": 400,
+                            "message": f"Order is already {existing[order_hash]}"})
+        else:
+            results.append({"index": i, "orderHash": order_hash, "statusCode": 404, "message": "Order not found"})
+        reported.add(order_hash)
+
+    return jsonify({
+        "success": len(closed) == len(hashes),
+        "closed": len(closed),
+        "failed": len(hashes) - len(closed),
+        "results": results,
+    }), 200
+
+
+@app.get("/api/orders/book")
+def get_order_book():
+    """Best bid/ask and premium depth per instrument key, from the in-memory book"""
+    maker_asset = request.args.get("makerAsset")
+    taker_asset = request.args.get("takerAsset")
+    if maker_asset:
+        validate_address(maker_asset, "makerAsset")
+    if taker_asset:
+        validate_address(taker_asset, "takerAsset")
+    try:
+        expiry = int(request.args["optionExpiry"]) if request.args.get("optionExpiry") else None
+        levels = min(int(request.args.get("depth", "10")), 100)
+    except ValueError:
+        return jsonify({"statusCode": 400, "message": "bad optionExpiry or depth", "error": "Bad Request"}), 400
+
+    try:
+        books = ensure_order_book().books(maker_asset, taker_asset, request.args.get("optionType"),
+                                          request.args.get("strikePrice"), expiry, levels)
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+    return jsonify(books)
+
+
+# Signed taker requests are good until their deadline, at most this far ahead; a request id is
+# the signed digest, so each signature is accepted once while it is valid
+MATCH_SIGNATURE_MAX_SECONDS = int(os.environ.get("MATCH_SIGNATURE_MAX_SECONDS", "300"))
+seen_taker_requests: Dict[str, int] = {}
+seen_taker_lock = threading.Lock()
+
+
+def authenticate_taker(action: str, body: Dict[str, Any], fields) -> str:
+    """Check the taker's signature over `fields` of `body`; returns the request digest (0x-hex)."""
+    try:
+        deadline = int(body.get("deadline"))
+    except (TypeError, ValueError):
+        abort_bad_request("bad deadline")
+    now = int(time.time())
+    if not now < deadline <= now + MATCH_SIGNATURE_MAX_SECONDS:
+        abort_bad_request(f"deadline must be within {MATCH_SIGNATURE_MAX_SECONDS} seconds from now")
+    message = taker_message(action, body, fields)
+    reason = order_verifier.verify_taker(message, body.get("signature"), body["taker"])
+    if reason:
+        abort(make_response(jsonify({"statusCode": 401, "message": reason, "error": "Unauthorized"}), 401))
+    digest = "0x" + personal_digest(message).hex()
+    with seen_taker_lock:
+        for key in [k for k, until in seen_taker_requests.items() if until < now]:
+            del seen_taker_requests[key]
+        if digest in seen_taker_requests:
+            abort(make_response(jsonify({"statusCode": 409, "message": "Request already submitted",
+                                         "error": "Conflict"}), 409))
+        seen_taker_requests[digest] = deadline
+    return digest
+
+
+@app.post("/api/match")
+def submit_match():
+    """
+    Cross a taker request against the book; returns the fill bundle for on-chain submission.
+    Matched maker amounts stay reserved until the fill lands, the request is cancelled or
+    each fill's reservedUntil passes.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        abort_bad_request("Request must be an object")
+    required = ["taker", "makerAsset", "takerAsset", "maxPremium", "amount", "deadline"]
+    for field in required:
+        if field not in body:
+            return jsonify({"statusCode": 400, "message": f"Missing {field}", "error": "Bad Request"}), 400
+    for addr_field in ["taker", "makerAsset", "takerAsset"]:
+        validate_address(body[addr_field], addr_field)
+    amount = body["amount"]
+    if isinstance(amount, str) and amount.isascii() and amount.isdecimal():
+        amount = int(amount)
+    if isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+        abort_bad_request("amount must be a positive integer")
+    max_premium = to_decimal(body["maxPremium"]) if not isinstance(body["maxPremium"], (bool, list, dict)) else None
+    if max_premium is None or not max_premium.is_finite() or max_premium < 0:
+        abort_bad_request("maxPremium must be a non-negative number")
+    request_id = authenticate_taker("match", body, MATCH_FIELDS)
+
+    try:
+        ensure_order_book()
+        bundle = matching_engine.submit(
+            body["taker"], body["makerAsset"], body["takerAsset"], body.get("optionType"),
+            body.get("optionStrike"), body.get("optionExpiry"), max_premium, amount,
+            body.get("timeInForce", GTC), request_id,
+        )
+    except ValueError as e:
+        return jsonify({"statusCode": 400, "message": str(e), "error": "Bad Request"}), 400
+    except ReservationError as e:
+        return jsonify({"statusCode": 503, "message": "Could not reserve matched amount", "error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+    return jsonify(bundle.to_dict()), 200
+
+
+@app.post("/api/match/<requestId>/cancel")
+def cancel_match(requestId: str):
+    """Withdraw a resting request and release its reservations; signed by the taker like the request."""
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        abort_bad_request("Request must be an object")
+    for field in ["taker", "deadline"]:
+        if field not in body:
+            return jsonify({"statusCode": 400, "message": f"Missing {field}", "error": "Bad Request"}), 400
+    validate_address(body["taker"], "taker")
+    authenticate_taker("cancel", {**body, "requestId": requestId}, CANCEL_FIELDS)
+    try:
+        cancelled = matching_engine.cancel(requestId, body["taker"])
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+    if not cancelled:
+        return jsonify({"statusCode": 404, "message": "Request not found", "error": "Not Found"}), 404
+    return jsonify({"success": True, "requestId": requestId}), 200
+
+
+@app.get("/api/match/bundles")
+def get_match_bundles():
+    taker = request.args.get("taker")
+    if taker:
+        validate_address(taker, "taker")
+    try:
+        limit = min(int(request.args.get("limit", "100")), 1000)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        abort_bad_request("bad limit")
+    return jsonify(matching_engine.recent_bundles(taker, limit))
+
+
 @app.get("/api/orders/<orderHash>")
 def get_order_by_hash(orderHash: str):
     sql = text("SELECT * FROM orders WHERE order_hash = :order_hash")
@@ -758,78 +1607,238 @@ def get_order_by_hash(orderHash: str):
 #     return jsonify({"count": c})
 
 
+# -------------------------
+# Holdings / portfolio
+# -------------------------
+def load_portfolio(user: str) -> Dict[str, Any]:
+    user = user.lower()
+    payload, version = portfolio_cache.get(user)
+    if payload is None:
+        with get_read_db() as conn:
+            rows = conn.execute(HOLDINGS_SQL, {"user": user}).all()
+            market = market_inputs(conn, {r.symbol for r in rows})
+        payload = value_portfolio(rows, market)
+        portfolio_cache.put(user, version, payload)
+    return payload
+
+
+@app.get("/holdings")
+def get_holdings():
+    """A user's positions marked to the latest Heston quotes, with per-position Greeks"""
+    user = request.args.get("user") or request.args.get("address")
+    validate_address(user, "user")
+    try:
+        return jsonify(load_portfolio(user)["holdings"])
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+
+
+@app.get("/holdings/summary")
+def get_portfolio_summary():
+    """Portfolio totals and aggregate Greeks (cached until the next pricing cycle)"""
+    user = request.args.get("user") or request.args.get("address")
+    validate_address(user, "user")
+    try:
+        return jsonify(load_portfolio(user)["summary"])
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+
+
+@app.get("/risk")
+def get_risk():
+    """Latest scenario P&L surface and historical VaR for a user, or house-wide without ?user"""
+    user = request.args.get("user") or request.args.get("address")
+    if user:
+        validate_address(user, "user")
+    scope = user.lower() if user else HOUSE
+    try:
+        with get_read_db() as conn:
+            report = conn.execute(LATEST_REPORT_SQL, {"scope": scope}).scalar()
+    except Exception as e:
+        return jsonify({"statusCode": 500, "message": "DB error", "error": str(e)}), 500
+    if report is None:
+        return jsonify({"statusCode": 404, "message": "No risk report yet", "error": "Not Found"}), 404
+    return jsonify(report)
+
+
+@app.get("/db/stats")
+def get_db_stats():
+    """Connection pool metrics per route (primary / replica)"""
+    return jsonify(db.pool_stats())
+
+
+@app.errorhandler(BudgetExceeded)
+def handle_budget_exceeded(e: BudgetExceeded):
+    payload = {"statusCode": 413, "message": str(e), "error": "Payload Too Large"}
+    return jsonify(payload), 413
+
+
+@app.get("/ready")
+def get_ready():
+    """Startup readiness: 200 once the database answers and a live price has arrived"""
+    state = readiness()
+    return jsonify(state), 200 if state["ready"] else 503
+
+
+@app.get("/jobs/health")
+def get_jobs_health():
+    """Supervised jobs and processes; 503 when any of them is unhealthy"""
+    body = {
+        "jobs": {job_id: job.health() for job_id, job in jobs.items()},
+        "processes": {fetcher.name: fetcher.health()},
+        "schedulerRunning": scheduler.running,
+    }
+    body["healthy"] = scheduler.running and all(
+        h["healthy"] for group in ("jobs", "processes") for h in body[group].values())
+    return jsonify(body), 200 if body["healthy"] else 503
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Request, socket and pool metrics in the Prometheus text format"""
+    return make_response(REGISTRY.render(), 200, {"Content-Type": CONTENT_TYPE})
+
+
 # -------------------------
 # SocketIO events
 # -------------------------
+# One background task polls every subscribed instrument and fans updates out to
+# per-instrument rooms, instead of one thread and DB query loop per subscriber.
+subscriptions: Dict[str, set] = {}  # instrument -> sids
+last_update_ts: Dict[str, datetime] = {}  # instrument -> timestamp of the last row streamed
+subscriptions_lock = threading.Lock()
+stream_task = None
+HISTORY_CHUNK_ROWS = int(os.environ.get("SOCKET_HISTORY_CHUNK_ROWS", "5000"))
+
+
+def stream_updates():
+    while True:
+        with subscriptions_lock:
+            instruments = list(subscriptions)
+        if instruments:
+            try:
+                with get_read_db() as conn:
+                    rows = conn.execute(text("""
+                        SELECT DISTINCT ON (instrument_name)
+                            instrument_name, heston_price, bid_price, ask_price, implied_vol, strike_price, expiration_date, option_type, timestamp
+                        FROM crypto_options
+                        WHERE instrument_name = ANY(:instruments)
+                        ORDER BY instrument_name, timestamp DESC
+                    """), {"instruments": instruments}).mappings().all()
+
+                for row in rows:
+                    name = row["instrument_name"]
+                    last_ts = last_update_ts.get(name)
+                    if last_ts is None or row["timestamp"] > last_ts:
+                        socketio.emit(
+                            'update',
+                            {
+                                "instrument": name,
+                                "data": {k: convert_value(v) for k, v in dict(row).items()}
+                            },
+                            to=name
+                        )
+                        last_update_ts[name] = row["timestamp"]
+            except Exception as e:
+                print("subscribe stream error:", e)
+        socketio.sleep(1)
+
+
+def unsubscribe(sid: str, instrument: Optional[str] = None) -> None:
+    with subscriptions_lock:
+        names = [instrument] if instrument else list(subscriptions)
+        for name in names:
+            sids = subscriptions.get(name)
+            if sids is None or sid not in sids:
+                continue
+            sids.discard(sid)
+            if not sids:
+                del subscriptions[name]
+                last_update_ts.pop(name, None)
+
+
 @socketio.on('connect')
 def handle_connect():
+    SOCKET_CLIENTS.inc()
     print(f"Client connected: {request.sid}")
     emit('message', f"Connected: {request.sid}")
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    SOCKET_CLIENTS.dec()
     print(f"Client disconnected: {request.sid}")
+    unsubscribe(request.sid)
 
 @socketio.on('subscribe')
 def handle_subscribe(data):
+    global stream_task
     instrument = data.get("instrument")
     if not instrument:
         emit('error', {"error": "Missing instrument"})
         return
 
-    # Send historical data
-    with get_db() as conn:
-        rows = conn.execute(text("""
-            SELECT instrument_name, heston_price, strike_price, expiration_date, option_type, timestamp
-            FROM crypto_options
-            WHERE instrument_name = :instrument
-            ORDER BY timestamp ASC
-        """), {"instrument": instrument}).mappings().all()
-
-    emit('history', {
-        "instrument": instrument,
-        "data": [{k: convert_value(v) for k, v in r.items()} for r in rows]
-    })
-
-    # Background thread to stream updates
-    def stream_updates(sid, instrument_name, last_ts):
+    # Send historical data straight off the cursor; long histories go out as consecutive
+    # "history" chunks (offset / final) that the client concatenates
+    rows = RowStream(get_read_db, text("""
+        SELECT instrument_name, heston_price, bid_price, ask_price, implied_vol, strike_price, expiration_date, option_type, timestamp
+        FROM crypto_options
+        WHERE instrument_name = :instrument
+        ORDER BY timestamp ASC
+    """), {"instrument": instrument}, head=HISTORY_CHUNK_ROWS)
+    last_ts = None
+    sent = 0
+    chunks = batched(rows, HISTORY_CHUNK_ROWS)
+    try:
+        chunk = next(chunks, [])
         while True:
-            try:
-                with get_db() as conn:
-                    row = conn.execute(text("""
-                        SELECT instrument_name, heston_price, strike_price, expiration_date, option_type, timestamp
-                        FROM crypto_options
-                        WHERE instrument_name = :instrument
-                        ORDER BY timestamp DESC
-                        LIMIT 1
-                    """), {"instrument": instrument_name}).mappings().first()
-
-                if row and (last_ts is None or row["timestamp"] > last_ts):
-                    socketio.emit(  # ✅ use socketio.emit, not emit
-                        'update',
-                        {
-                            "instrument": instrument_name,
-                            "data": {k: convert_value(v) for k, v in dict(row).items()}
-                        },
-                        to=sid
-                    )
-                    last_ts = row["timestamp"]
-            except Exception as e:
-                print("subscribe stream error:", e)
-            time.sleep(1)
+            following = next(chunks, None)
+            emit('history', {
+                "instrument": instrument,
+                "data": [serialize_row(r) for r in chunk],
+                "offset": sent,
+                "final": following is None
+            })
+            sent += len(chunk)
+            if chunk:
+                last_ts = chunk[-1]["timestamp"]
+            if following is None:
+                break
+            chunk = following
+    except BudgetExceeded as e:
+        rows.close()
+        emit('error', {"error": str(e), "instrument": instrument})
+        return
 
-    last_ts = rows[-1]["timestamp"] if rows else None
-    t = threading.Thread(target=stream_updates, args=(request.sid, instrument, last_ts), daemon=True)
-    t.start()
+    join_room(instrument)
+    with subscriptions_lock:
+        if instrument not in subscriptions:
+            subscriptions[instrument] = set()
+            if last_ts is not None:
+                last_update_ts[instrument] = last_ts
+        subscriptions[instrument].add(request.sid)
+        if stream_task is None:
+            stream_task = socketio.start_background_task(stream_updates)
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    instrument = data.get("instrument")
+    if not instrument:
+        emit('error', {"error": "Missing instrument"})
+        return
+    leave_room(instrument)
+    unsubscribe(request.sid, instrument)
 
 
 # -------------------------
 # Main entry
 # -------------------------
 if __name__ == "__main__":
-    start_fetch_price()
-    print("⏳ Waiting 10 seconds for fetch_price to initialize...")
-    time.sleep(10)
+    fetcher.start()
+    wait_until_ready()
+    try:
+        ensure_order_book()
+    except Exception as e:
+        print(f"❌ Order book not loaded, will retry on first request: {e}")
 
     scheduler.start()
     print("✅ Heston Scheduler started")
@@ -0,0 +1,148 @@
+"""
+Peak-memory benchmark for large history exports (scripts/streaming.py).
+
+Fills a scratch table shaped like crypto_options with N rows of one instrument, then
+exports it to /dev/null in a fresh process per run, either the old way (.mappings().all()
+then one json.dumps) or through the streaming query layer (server-side cursor with
+yield_per into the incremental serializer). Each run reports peak RSS and its growth over
+the process baseline; for the streaming path it should stay flat as N grows.
+
+    python benchmarks/export_memory_bench.py --rows 100000 1000000
+    python benchmarks/export_memory_bench.py --rows 1000000 --modes stream --database-url sqlite:////tmp/export.db
+
+Uses DATABASE_URL (or the DB_* settings in scripts/db.py) unless --database-url is given.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from sqlalchemy import text  # noqa: E402
+
+TABLE = "export_bench"
+INSTRUMENT = "ETH-3000-20260130-call"
+EXPORT_SQL = text(f"""
+    SELECT instrument_name, heston_price, bid_price, ask_price, implied_vol, strike_price, expiration_date, option_type, timestamp
+    FROM {TABLE}
+    WHERE instrument_name = :instrument
+    ORDER BY timestamp ASC
+""")
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def fill(engine, rows: int) -> None:
+    postgres = engine.dialect.name == "postgresql"
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                instrument_name TEXT NOT NULL,
+                timestamp {"TIMESTAMP WITH TIME ZONE" if postgres else "TIMESTAMP"} NOT NULL,
+                heston_price NUMERIC(18, 8), bid_price NUMERIC(18, 8), ask_price NUMERIC(18, 8),
+                expiration_date BIGINT, strike_price NUMERIC(18, 8), option_type VARCHAR(4),
+                implied_vol DOUBLE PRECISION
+            )
+        """))
+        if postgres:
+            conn.execute(text(f"""
+                INSERT INTO {TABLE}
+                SELECT :instrument, TIMESTAMPTZ '2026-01-01' + g * INTERVAL '1 second',
+                       100 + g % 1000 * 0.01, 99 + g % 1000 * 0.01, 101 + g % 1000 * 0.01,
+                       1769760000, 3000, 'call', 0.6
+                FROM generate_series(1, :rows) AS g
+            """), {"instrument": INSTRUMENT, "rows": rows})
+        else:
+            conn.execute(text(f"""
+                WITH RECURSIVE g(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM g WHERE n < :rows)
+                INSERT INTO {TABLE}
+                SELECT :instrument, datetime('2026-01-01', '+' || n || ' seconds'),
+                       100 + n % 1000 * 0.01, 99 + n % 1000 * 0.01, 101 + n % 1000 * 0.01,
+                       1769760000, 3000, 'call', 0.6
+                FROM g
+            """), {"instrument": INSTRUMENT, "rows": rows})
+        conn.execute(text(f"CREATE INDEX ON {TABLE} (instrument_name, timestamp)") if postgres else
+                     text(f"CREATE INDEX {TABLE}_idx ON {TABLE} (instrument_name, timestamp)"))
+
+
+def export(mode: str) -> None:
+    """Child process: one export to /dev/null, then a JSON line of measurements."""
+    from streaming import QueryBudget, RowStream, json_array_chunks, _default
+    from db import get_engine
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # pool, dialect and driver loaded before the baseline
+    baseline = rss_mb()
+    samples = []
+    started = time.perf_counter()
+    written = 0
+    with open(os.devnull, "w") as out:
+        if mode == "stream":
+            stream = RowStream(engine.connect, EXPORT_SQL, {"instrument": INSTRUMENT},
+                               budget=QueryBudget(max_rows=10 ** 9, max_bytes=2 ** 62))
+            for i, chunk in enumerate(json_array_chunks(stream, budget=stream.budget)):
+                written += out.write(chunk)
+                if i % 200 == 0:
+                    samples.append(round(rss_mb(), 1))
+        else:
+            with engine.connect() as conn:
+                rows = conn.execute(EXPORT_SQL, {"instrument": INSTRUMENT}).mappings().all()
+            samples.append(round(rss_mb(), 1))
+            written = out.write(json.dumps([dict(r) for r in rows], default=_default, separators=(",", ":")))
+    print(json.dumps({
+        "seconds": time.perf_counter() - started,
+        "bytes": written,
+        "baseline_mb": baseline,
+        "peak_mb": peak_rss_mb(),
+        "samples": samples,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", nargs="+", choices=("buffered", "stream"), default=["buffered", "stream"])
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL")
+    parser.add_argument("--keep", action="store_true", help=f"leave the {TABLE} table behind")
+    parser.add_argument("--child", choices=("buffered", "stream"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    if args.child:
+        export(args.child)
+        return
+
+    from db import get_engine
+    engine = get_engine()
+    print(f"{'rows':>9s} {'mode':>9s} {'time':>7s} {'MB out':>8s} {'base MB':>8s} {'peak MB':>8s} {'growth':>7s}  rss samples")
+    try:
+        for rows in args.rows:
+            fill(engine, rows)
+            for mode in args.modes:
+                out = subprocess.run([sys.executable, __file__, "--child", mode], check=True,
+                                     capture_output=True, text=True, env=os.environ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                samples = r["samples"] if len(r["samples"]) <= 8 else r["samples"][::len(r["samples"]) // 8]
+                print(f"{rows:>9d} {mode:>9s} {r['seconds']:>6.1f}s {r['bytes'] / 2 ** 20:>8.1f} "
+                      f"{r['baseline_mb']:>8.1f} {r['peak_mb']:>8.1f} {r['peak_mb'] - r['baseline_mb']:>+7.1f}  {samples}")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold-start benchmark for app.py.
+
+Starts the server as a fresh process and records how long it takes to pass each
+startup milestone: the first HTTP answer, /ready returning 200 (database reachable and
+a live price published), the first /options/latest response, and the first
+/options/latest carrying a quote priced after the process was spawned. Repeats
+--runs times, stopping the server in between. Needs Postgres and network access for
+the price feed, like the server itself.
+
+    python benchmarks/startup_bench.py --runs 3
+    python benchmarks/startup_bench.py --pricer     # also one pricing cycle, cold vs cached numba
+
+Requires: httpx
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MILESTONES = ("http", "ready", "options", "fresh_quote")
+
+
+def parse_ts(value):
+    try:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def cold_start(url, timeout, poll):
+    spawned = time.time()
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=BACKEND, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, start_new_session=True)
+    reached = {}
+    try:
+        with httpx.Client(base_url=url, timeout=5) as client:
+            while len(reached) < len(MILESTONES) and time.time() - spawned < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"app.py exited with {server.returncode}")
+                try:
+                    ready = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(poll)
+                    continue
+                now = time.time() - spawned
+                reached.setdefault("http", now)
+                if ready.status_code == 200:
+                    reached.setdefault("ready", now)
+                options = client.get("/options/latest")
+                now = time.time() - spawned
+                if options.status_code == 200:
+                    reached.setdefault("options", now)
+                    stamps = [parse_ts(row.get("timestamp")) for row in options.json()]
+                    if any(ts is not None and ts.timestamp() >= spawned for ts in stamps):
+                        reached.setdefault("fresh_quote", now)
+                time.sleep(poll)
+    finally:
+        # the server starts fetch_price; stop the whole process group
+        os.killpg(server.pid, signal.SIGTERM)
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+    return reached
+
+
+def pricer_cycle(cache_dir):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "scripts/heston_model.py"], cwd=BACKEND, check=True,
+                   stdout=subprocess.DEVNULL, env={**os.environ, "NUMBA_CACHE_DIR": cache_dir})
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5080")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0, help="give up on a run after this many seconds")
+    parser.add_argument("--poll", type=float, default=0.05)
+    parser.add_argument("--pricer", action="store_true", help="time one pricing cycle with a cold and a warm numba cache")
+    args = parser.parse_args()
+
+    results = {name: [] for name in MILESTONES}
+    for run in range(args.runs):
+        reached = cold_start(args.url, args.timeout, args.poll)
+        print(f"run {run + 1}: " + "  ".join(
+            f"{name}={reached[name]:.2f}s" if name in reached else f"{name}=timeout" for name in MILESTONES))
+        for name, seconds in reached.items():
+            results[name].append(seconds)
+
+    print()
+    for name in MILESTONES:
+        values = results[name]
+        if values:
+            print(f"{name:12s} median {statistics.median(values):6.2f}s  min {min(values):6.2f}s  "
+                  f"max {max(values):6.2f}s  ({len(values)}/{args.runs} runs)")
+        else:
+            print(f"{name:12s} not reached")
+
+    if args.pricer:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold = pricer_cycle(cache_dir)
+            warm = pricer_cycle(cache_dir)
+        print(f"\npricer cycle: cold numba cache {cold:.2f}s, cached {warm:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
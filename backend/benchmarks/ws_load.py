@@ -0,0 +1,116 @@
+"""
+Websocket + REST load test for app.py.
+
+Opens N concurrent SocketIO clients subscribed to one instrument, then measures REST
+latency while they are connected. Run it once per serving mode and compare, e.g.
+
+    ASYNC_MODE=threading python app.py      # terminal 1
+    python benchmarks/ws_load.py --clients 2000 --instrument ETH-3400-7d-call
+
+    ASYNC_MODE=gevent python app.py
+    python benchmarks/ws_load.py --clients 2000 --instrument ETH-3400-7d-call
+
+Requires: python-socketio[asyncio_client], aiohttp, httpx
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import socketio
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def run_client(url, instrument, stats, stop):
+    sio = socketio.AsyncClient(reconnection=False)
+
+    @sio.on("history")
+    async def on_history(data):
+        stats["history"] += 1
+
+    @sio.on("update")
+    async def on_update(data):
+        stats["updates"] += 1
+
+    try:
+        started = time.perf_counter()
+        await sio.connect(url, transports=["websocket"], wait_timeout=30)
+        stats["connect_ms"].append((time.perf_counter() - started) * 1000)
+        stats["connected"] += 1
+        await sio.emit("subscribe", {"instrument": instrument})
+        await stop.wait()
+    except Exception:
+        stats["failed"] += 1
+    finally:
+        if sio.connected:
+            await sio.disconnect()
+
+
+async def run_rest(url, paths, duration, concurrency, latencies, errors):
+    deadline = time.perf_counter() + duration
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        async def worker(i):
+            n = i
+            while time.perf_counter() < deadline:
+                path = paths[n % len(paths)]
+                n += 1
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(path)
+                    resp.raise_for_status()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except Exception:
+                    errors.append(path)
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+async def main(args):
+    stats = {"connected": 0, "failed": 0, "history": 0, "updates": 0, "connect_ms": []}
+    stop = asyncio.Event()
+
+    print(f"⏳ Opening {args.clients} websocket clients...")
+    clients = []
+    for i in range(args.clients):
+        clients.append(asyncio.create_task(run_client(args.url, args.instrument, stats, stop)))
+        if i % args.ramp_batch == args.ramp_batch - 1:
+            await asyncio.sleep(0.1)
+    await asyncio.sleep(args.settle)
+
+    print(f"⏳ Running REST load for {args.duration}s with {args.concurrency} workers...")
+    latencies, errors = [], []
+    paths = ["/options/latest", "/prices/live", f"/option/history?instrument={args.instrument}"]
+    started = time.perf_counter()
+    await run_rest(args.url, paths, args.duration, args.concurrency, latencies, errors)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    print("")
+    print(f"websocket clients connected : {stats['connected']} / {args.clients} ({stats['failed']} failed)")
+    print(f"connect p50 / p99 (ms)      : {percentile(stats['connect_ms'], 50):.1f} / {percentile(stats['connect_ms'], 99):.1f}")
+    print(f"history / update events     : {stats['history']} / {stats['updates']}")
+    print(f"REST requests               : {len(latencies)} ok, {len(errors)} errors, {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(f"REST mean / p50 / p99 (ms)  : {statistics.mean(latencies):.1f} / "
+              f"{percentile(latencies, 50):.1f} / {percentile(latencies, 99):.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5080")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--instrument", required=True)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=20, help="parallel REST workers")
+    parser.add_argument("--ramp-batch", type=int, default=100, help="clients opened per 100ms")
+    parser.add_argument("--settle", type=float, default=5, help="seconds to wait after ramp-up")
+    asyncio.run(main(parser.parse_args()))
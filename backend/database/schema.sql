@@ -35,12 +35,62 @@ CREATE TABLE public.crypto_options (
     timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
     crypto_id INTEGER NOT NULL REFERENCES public.cryptocurrencies(crypto_id) ON DELETE CASCADE,
     heston_price NUMERIC(18, 8),
+    bid_price NUMERIC(18, 8),
+    ask_price NUMERIC(18, 8),
     expiration_date BIGINT,
     strike_price NUMERIC(18, 8),
     option_type VARCHAR(4),
+    implied_vol DOUBLE PRECISION,
+    instrument_id INTEGER,
     PRIMARY KEY (instrument_name, timestamp)
 );
 
+ALTER TABLE public.crypto_options ADD COLUMN IF NOT EXISTS implied_vol DOUBLE PRECISION;
+ALTER TABLE public.crypto_options ADD COLUMN IF NOT EXISTS instrument_id INTEGER;
+ALTER TABLE public.crypto_options ADD COLUMN IF NOT EXISTS bid_price NUMERIC(18, 8);
+ALTER TABLE public.crypto_options ADD COLUMN IF NOT EXISTS ask_price NUMERIC(18, 8);
+
+-- Latest-quote lookups (holdings valuation) scan only the recent tail
+CREATE INDEX IF NOT EXISTS idx_crypto_options_timestamp ON public.crypto_options (timestamp);
+
+-- Instrument catalog: one row per listed contract with a fixed expiry (scripts/instruments.py)
+CREATE TABLE IF NOT EXISTS public.option_instruments (
+    instrument_id SERIAL PRIMARY KEY,
+    instrument_name TEXT NOT NULL UNIQUE,
+    symbol TEXT NOT NULL,
+    crypto_id INTEGER NOT NULL REFERENCES public.cryptocurrencies(crypto_id) ON DELETE CASCADE,
+    strike_price NUMERIC(18, 8) NOT NULL,
+    expiration_date BIGINT NOT NULL,
+    option_type VARCHAR(4) NOT NULL,
+    listed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    expired_at TIMESTAMP WITH TIME ZONE,
+    settlement_spot NUMERIC(18, 8)
+);
+
+ALTER TABLE public.option_instruments ADD COLUMN IF NOT EXISTS expired_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE public.option_instruments ADD COLUMN IF NOT EXISTS settlement_spot NUMERIC(18, 8);
+
+-- The live chain is a small partial index; expired contracts drop out of it
+CREATE INDEX IF NOT EXISTS idx_option_instruments_active ON public.option_instruments (symbol, expiration_date)
+    WHERE expired_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_option_instruments_expired ON public.option_instruments (expired_at)
+    WHERE expired_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_crypto_options_instrument_id ON public.crypto_options (instrument_id);
+
+-- Spot each symbol's strike ladder was last centred on
+CREATE TABLE IF NOT EXISTS public.strike_ladders (
+    symbol TEXT PRIMARY KEY,
+    center NUMERIC(18, 8) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- Latest implied-vol grid per symbol, replaced every pricing cycle
+CREATE TABLE IF NOT EXISTS public.iv_surfaces (
+    symbol TEXT PRIMARY KEY,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    surface JSONB NOT NULL
+);
+
 
 -- Table: holdings
 CREATE TABLE public.holdings (
@@ -84,12 +134,123 @@ CREATE TABLE IF NOT EXISTS public.orders (
     status TEXT DEFAULT 'open',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    valid_at TIMESTAMP WITH TIME ZONE
+    valid_at TIMESTAMP WITH TIME ZONE,
+    chain_order_hash TEXT,
+    remaining_amount TEXT,
+    receiver TEXT
 );
 
+-- Columns added after the first release (no-ops on a fresh database)
+-- chain_order_hash: EIP-712 hash the LimitOrderProtocol emits in OrderFilled/OrderCancelled
+-- remaining_amount: maker amount left after on-chain fills, NULL until the first fill
+-- receiver: receiver the order was signed with, NULL when it is the maker
+ALTER TABLE public.orders ADD COLUMN IF NOT EXISTS chain_order_hash TEXT;
+ALTER TABLE public.orders ADD COLUMN IF NOT EXISTS remaining_amount TEXT;
+-- superseded by order_reservations
+ALTER TABLE public.orders DROP COLUMN IF EXISTS reserved_amount;
+ALTER TABLE public.orders ADD COLUMN IF NOT EXISTS receiver TEXT;
+
 -- Indexes for orders table
-CREATE INDEX IF NOT EXISTS idx_orders_status ON public.orders(status);
-CREATE INDEX IF NOT EXISTS idx_orders_maker ON public.orders(maker);
-CREATE INDEX IF NOT EXISTS idx_orders_assets ON public.orders(maker_asset, taker_asset);
-CREATE INDEX IF NOT EXISTS idx_orders_created ON public.orders(created_at);
-CREATE INDEX IF NOT EXISTS idx_orders_hash ON public.orders(order_hash);
\ No newline at end of file
+-- Listings page newest-first on (created_at, id) behind an equality prefix, so a
+-- keyset cursor is a single index range scan at any depth.
+CREATE INDEX IF NOT EXISTS idx_orders_status_created ON public.orders(status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_maker_created ON public.orders(lower(maker), created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_orders_assets_created;
+CREATE INDEX IF NOT EXISTS idx_orders_lower_assets_created ON public.orders(lower(maker_asset), lower(taker_asset), status, created_at DESC, id DESC);
+
+-- Open orders are the hot path (order book load, strike/expiry/premium range filters)
+CREATE INDEX IF NOT EXISTS idx_orders_open_created ON public.orders(created_at DESC, id DESC) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS idx_orders_open_instrument ON public.orders(maker_asset, taker_asset, option_type, option_strike, option_expiry) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS idx_orders_open_expiry ON public.orders(option_expiry) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS idx_orders_open_premium ON public.orders(option_premium) WHERE status = 'open';
+
+-- Superseded by the composites above (order_hash is already indexed by its UNIQUE constraint)
+DROP INDEX IF EXISTS public.idx_orders_status;
+DROP INDEX IF EXISTS public.idx_orders_maker;
+DROP INDEX IF EXISTS public.idx_orders_assets;
+DROP INDEX IF EXISTS public.idx_orders_created;
+DROP INDEX IF EXISTS public.idx_orders_hash;
+CREATE INDEX IF NOT EXISTS idx_orders_chain_hash ON public.orders(chain_order_hash);
+
+-- Maker amounts matched off-chain (POST /api/match), held until the fill lands on chain, the
+-- taker cancels the request or reserved_until (unix seconds) passes; the order book offers
+-- remaining_amount less the live reservations
+CREATE TABLE IF NOT EXISTS public.order_reservations (
+    request_id TEXT NOT NULL,
+    order_hash TEXT NOT NULL REFERENCES public.orders(order_hash) ON DELETE CASCADE,
+    taker TEXT NOT NULL,
+    amount NUMERIC(78, 0) NOT NULL,
+    reserved_until BIGINT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (request_id, order_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_order_reservations_order ON public.order_reservations(order_hash, created_at);
+CREATE INDEX IF NOT EXISTS idx_order_reservations_until ON public.order_reservations(reserved_until);
+
+
+-- Chain indexer (scripts/chain_indexer.py)
+-- Checkpoint per indexer; the row is locked while a batch is applied
+CREATE TABLE IF NOT EXISTS public.chain_sync (
+    name TEXT PRIMARY KEY,
+    block_number BIGINT,
+    block_hash TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Recent block hashes, compared against the node to find the fork point on a reorg
+CREATE TABLE IF NOT EXISTS public.chain_blocks (
+    block_number BIGINT PRIMARY KEY,
+    block_hash TEXT NOT NULL
+);
+
+-- Decoded OptionEngine / OptionHook / OptionNFT / OrderMixin logs; source of truth for derived state
+CREATE TABLE IF NOT EXISTS public.chain_events (
+    block_number BIGINT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_hash TEXT,
+    tx_hash TEXT,
+    contract TEXT NOT NULL,
+    event TEXT NOT NULL,
+    option_id NUMERIC(78, 0),
+    order_hash TEXT,
+    account TEXT,
+    counterparty TEXT,
+    amount NUMERIC(78, 0),
+    PRIMARY KEY (block_number, log_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_chain_events_option ON public.chain_events (option_id, block_number, log_index);
+CREATE INDEX IF NOT EXISTS idx_chain_events_order ON public.chain_events (order_hash, block_number, log_index);
+CREATE INDEX IF NOT EXISTS idx_chain_events_tx ON public.chain_events (tx_hash, log_index);
+
+-- One row per option NFT, recomputed from chain_events
+CREATE TABLE IF NOT EXISTS public.option_positions (
+    option_id NUMERIC(78, 0) PRIMARY KEY,
+    creator TEXT,
+    owner TEXT,
+    exercised BOOLEAN NOT NULL DEFAULT FALSE,
+    order_hash TEXT,
+    premium NUMERIC(78, 0),
+    underlying_token TEXT,
+    quote_token TEXT,
+    strike NUMERIC(18, 8),
+    size NUMERIC(18, 8),
+    expiry BIGINT,
+    is_call BOOLEAN,
+    instrument_name TEXT,
+    updated_block BIGINT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_option_positions_owner ON public.option_positions (owner);
+
+-- Scenario risk snapshots written by scripts/risk.py (scope = user address or 'house')
+CREATE TABLE IF NOT EXISTS public.risk_reports (
+    id SERIAL PRIMARY KEY,
+    scope TEXT NOT NULL,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    report JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_risk_reports_scope_run ON public.risk_reports (scope, run_at DESC);
+CREATE INDEX IF NOT EXISTS idx_risk_reports_run ON public.risk_reports (run_at);
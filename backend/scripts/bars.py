@@ -0,0 +1,103 @@
+import os
+from typing import List, Optional
+
+# -------------------------
+# OHLC bar aggregation
+# -------------------------
+# No interval below the fetcher's ~2.5s publish throttle: such bars would hold one tick each
+INTERVALS = {"10s": 10, "1m": 60}
+BAR_INTERVAL = os.environ.get("BAR_INTERVAL", "10s")
+BAR_BATCH = 20  # completed bars buffered before a flush
+BAR_FLUSH_SECONDS = 30  # ...or the oldest buffered bar is this old
+BAR_BUFFER_MAX = int(os.environ.get("BAR_BUFFER_MAX", "20000"))  # bars kept across failed flushes
+
+
+class Bar:
+    __slots__ = ("symbol", "crypto_id", "start", "open", "high", "low", "close", "ticks")
+
+    def __init__(self, symbol: str, crypto_id: int, start: float, price: float):
+        self.symbol = symbol
+        self.crypto_id = crypto_id
+        self.start = start
+        self.open = self.high = self.low = self.close = price
+        self.ticks = 1
+
+    def add(self, price: float) -> None:
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.close = price
+        self.ticks += 1
+
+
+class BarBuilder:
+    """Aggregates ticks for one symbol into bars aligned to `interval` seconds."""
+
+    def __init__(self, symbol: str, crypto_id: int, interval: str = BAR_INTERVAL):
+        if interval not in INTERVALS:
+            raise ValueError(f"Unsupported bar interval {interval!r}, expected one of {list(INTERVALS)}")
+        self.symbol = symbol
+        self.crypto_id = crypto_id
+        self.seconds = INTERVALS[interval]
+        self.current: Optional[Bar] = None
+
+    def add_tick(self, price: float, ts: float) -> Optional[Bar]:
+        """Feed one tick; returns the bar it completed, if any."""
+        start = ts - ts % self.seconds
+        bar = self.current
+        if bar is not None and start == bar.start:
+            bar.add(price)
+            return None
+        self.current = Bar(self.symbol, self.crypto_id, start, price)
+        return bar
+
+    def take_current(self) -> Optional[Bar]:
+        """Detach the in-progress bar (used on shutdown so it still gets written)."""
+        bar, self.current = self.current, None
+        return bar
+
+
+class BarBuffer:
+    """Completed bars waiting to be written in one batch."""
+
+    def __init__(self, batch: int = BAR_BATCH, max_age: float = BAR_FLUSH_SECONDS,
+                 max_bars: int = BAR_BUFFER_MAX):
+        self.batch = batch
+        self.max_age = max_age
+        self.max_bars = max_bars
+        self.bars: List[Bar] = []
+        self.first_added: Optional[float] = None
+        self.dropped = 0
+
+    def add(self, bar: Bar, now: float) -> None:
+        if not self.bars:
+            self.first_added = now
+        self.bars.append(bar)
+
+    def due(self, now: float) -> bool:
+        if not self.bars:
+            return False
+        return len(self.bars) >= self.batch or now - self.first_added >= self.max_age
+
+    def requeue(self, bars: List[Bar], now: float) -> int:
+        """
+        Put back bars whose write failed, ahead of any added since. While the DB stays down
+        the oldest bars beyond max_bars are dropped; returns how many this call dropped.
+        """
+        if not bars:
+            return 0
+        if not self.bars:
+            self.first_added = now
+        self.bars = bars + self.bars
+        excess = len(self.bars) - self.max_bars
+        if excess <= 0:
+            return 0
+        del self.bars[:excess]
+        self.dropped += excess
+        return excess
+
+    def drain(self) -> List[Bar]:
+        bars, self.bars = self.bars, []
+        self.first_added = None
+        return bars
@@ -0,0 +1,94 @@
+from typing import Dict
+
+import numpy as np
+from scipy.special import ndtr
+
+# -------------------------
+# Vectorised Black-Scholes
+# -------------------------
+# Every function takes NumPy arrays (or scalars that broadcast) so a whole portfolio or
+# chain is one pass. is_call is a boolean array; T is in years; sigma annualised.
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+MIN_T = 1e-8  # expiring contracts keep finite greeks
+
+
+def _npdf(x):
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def _d1_d2(S, K, T, r, sigma):
+    T = np.maximum(T, MIN_T)
+    sigma = np.maximum(sigma, 1e-12)
+    vol_t = sigma * np.sqrt(T)
+    d1 = (np.log(S / K) + (r + 0.5 * sigma * sigma) * T) / vol_t
+    return d1, d1 - vol_t, T
+
+
+def bs_price(S, K, T, r, sigma, is_call):
+    d1, d2, T = _d1_d2(S, K, T, r, sigma)
+    df = np.exp(-r * T)
+    call = S * ndtr(d1) - K * df * ndtr(d2)
+    put = K * df * ndtr(-d2) - S * ndtr(-d1)
+    return np.where(is_call, call, put)
+
+
+def bs_greeks(S, K, T, r, sigma, is_call) -> Dict[str, np.ndarray]:
+    """Per-unit delta, gamma, vega (per 1.00 of vol), theta (per year) and rho."""
+    d1, d2, T = _d1_d2(S, K, T, r, sigma)
+    df = np.exp(-r * T)
+    pdf = _npdf(d1)
+    sqrt_t = np.sqrt(T)
+    gamma = pdf / (S * sigma * sqrt_t)
+    vega = S * pdf * sqrt_t
+    decay = -S * pdf * sigma / (2.0 * sqrt_t)
+    return {
+        "delta": np.where(is_call, ndtr(d1), ndtr(d1) - 1.0),
+        "gamma": gamma,
+        "vega": vega,
+        "theta": np.where(is_call, decay - r * K * df * ndtr(d2), decay + r * K * df * ndtr(-d2)),
+        "rho": np.where(is_call, K * T * df * ndtr(d2), -K * T * df * ndtr(-d2)),
+    }
+
+
+IV_MIN, IV_MAX = 1e-4, 10.0
+IV_MIN_TIME_VALUE = 1e-9  # fraction of spot
+
+
+def implied_vol(price, S, K, T, r, is_call, tol=1e-10, max_iter=50):
+    """
+    Black-Scholes implied vol for arrays of prices. Each price is mapped by parity to the
+    out-of-the-money side (best conditioned), Corrado-Miller gives the starting point and
+    safeguarded Newton steps (bisection whenever a step leaves the bracket) finish it.
+    Prices outside the no-arbitrage bounds, or with no resolvable time value, come back as NaN.
+    """
+    price, S, K, T, is_call = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, S, K, T)),
+                                                  np.asarray(is_call, dtype=bool))
+    T = np.maximum(T, MIN_T)
+    disc_k = K * np.exp(-r * T)
+    call = np.where(is_call, price, price + S - disc_k)
+    valid = (call > np.maximum(S - disc_k, 0.0)) & (call < S)
+    otm_call = disc_k >= S
+    target = np.where(otm_call, call, call - S + disc_k)
+    valid &= target > IV_MIN_TIME_VALUE * S  # below this the time value is rounding noise
+
+    # Corrado-Miller (1996), Brenner-Subrahmanyam where its square root goes negative
+    half = call - 0.5 * (S - disc_k)
+    root = np.sqrt(np.maximum(half * half - (S - disc_k) ** 2 / np.pi, 0.0))
+    sigma = np.sqrt(2.0 * np.pi / T) / (S + disc_k) * (half + root)
+    sigma = np.where(np.isfinite(sigma) & (sigma > IV_MIN), sigma, np.sqrt(2.0 * np.pi / T) * call / S)
+    sigma = np.clip(np.nan_to_num(sigma, nan=IV_MIN), IV_MIN, IV_MAX)
+
+    lo = np.full(sigma.shape, IV_MIN)
+    hi = np.full(sigma.shape, IV_MAX)
+    for _ in range(max_iter):
+        diff = bs_price(S, K, T, r, sigma, otm_call) - target
+        lo = np.where(diff < 0, sigma, lo)
+        hi = np.where(diff > 0, sigma, hi)
+        if np.all(~valid | (np.abs(diff) <= tol * target) | (hi - lo < tol)):
+            break
+        d1, _, _ = _d1_d2(S, K, T, r, sigma)
+        vega = S * _npdf(d1) * np.sqrt(T)
+        step = np.divide(diff, vega, out=np.full(sigma.shape, np.inf), where=vega > 0)
+        newton = sigma - step
+        sigma = np.where((newton > lo) & (newton < hi), newton, 0.5 * (lo + hi))
+    return np.where(valid, sigma, np.nan)
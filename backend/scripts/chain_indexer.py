@@ -0,0 +1,553 @@
+"""
+Chain-event indexer: OptionEngine / OptionHook / OptionNFT / OrderMixin logs -> Postgres.
+
+Logs are read in block-range batches and stored verbatim-ish in `chain_events`; orders
+(status, remaining amount), `option_positions` and `holdings` are then recomputed from
+those events for the ids a batch touched. Because derived state is always a function
+of the stored events, a reorg is handled by deleting events above the fork block and
+recomputing the same way.
+
+    python scripts/chain_indexer.py --rpc http://127.0.0.1:8545          # anvil, follow head
+    python scripts/chain_indexer.py --recorded ../contracts/broadcast/Interaction.s.sol/31337/run-latest.json
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import requests
+from eth_hash.auto import keccak
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from db import get_engine
+from instruments import option_instrument_name
+from order_signing import LIMIT_ORDER_PROTOCOL
+
+# -------------------------
+# Configuration
+# -------------------------
+INDEXER_RPC_URL = os.environ.get("INDEXER_RPC_URL")
+OPTION_ENGINE_ADDRESS = os.environ.get("OPTION_ENGINE_ADDRESS")
+OPTION_HOOK_ADDRESS = os.environ.get("OPTION_HOOK_ADDRESS")
+OPTION_NFT_ADDRESS = os.environ.get("OPTION_NFT_ADDRESS")
+INDEXER_START_BLOCK = int(os.environ.get("INDEXER_START_BLOCK", "0"))
+INDEXER_BATCH_BLOCKS = int(os.environ.get("INDEXER_BATCH_BLOCKS", "2000"))
+INDEXER_CONFIRMATIONS = int(os.environ.get("INDEXER_CONFIRMATIONS", "2"))
+INDEXER_KEEP_BLOCKS = 256  # block hashes kept for fork detection
+INDEXER_INTERVAL = float(os.environ.get("INDEXER_INTERVAL", "4"))
+# "0xTOKEN:SYMBOL,..." -> instrument names for holdings
+TOKEN_SYMBOLS = {
+    addr.strip().lower(): sym.strip()
+    for addr, sym in (pair.split(":") for pair in os.environ.get("TOKEN_SYMBOLS", "").split(",") if ":" in pair)
+}
+CHECKPOINT = "main"
+ZERO_ADDRESS = "0x" + "00" * 20
+WAD = 10 ** 18
+
+
+def topic(signature: str) -> str:
+    return "0x" + keccak(signature.encode()).hex()
+
+
+# topic0 -> (event name, decoder(topics, data words) -> columns)
+def _addr(word: str) -> str:
+    return "0x" + word[-40:].lower()
+
+
+def _uint(word: str) -> int:
+    return int(word, 16)
+
+
+EVENTS = {
+    topic("OptionCreated(uint256,address)"): ("OptionCreated", lambda t, d: {
+        "option_id": _uint(t[1]), "account": _addr(t[2])}),
+    topic("OptionTransferred(uint256,address)"): ("OptionTransferred", lambda t, d: {
+        "option_id": _uint(t[1]), "account": _addr(t[2])}),
+    topic("OptionExercised(uint256,address)"): ("OptionExercised", lambda t, d: {
+        "option_id": _uint(t[1]), "account": _addr(t[2])}),
+    topic("PreInterCalled(address,uint256,uint8,uint256)"): ("PreInterCalled", lambda t, d: {
+        "account": _addr(d[0]), "option_id": _uint(d[1]), "amount": _uint(d[3])}),
+    topic("PostInterCalled(address,uint256,uint8,address)"): ("PostInterCalled", lambda t, d: {
+        "counterparty": _addr(d[0]), "option_id": _uint(d[1]), "account": _addr(d[3])}),
+    # ERC-721 Transfer: tokenId is indexed (4 topics), unlike ERC-20
+    topic("Transfer(address,address,uint256)"): ("Transfer", lambda t, d: {
+        "counterparty": _addr(t[1]), "account": _addr(t[2]), "option_id": _uint(t[3])}),
+    topic("OrderFilled(bytes32,uint256)"): ("OrderFilled", lambda t, d: {
+        "order_hash": "0x" + d[0], "amount": _uint(d[1])}),
+    topic("OrderCancelled(bytes32)"): ("OrderCancelled", lambda t, d: {
+        "order_hash": "0x" + d[0]}),
+}
+
+# OptionEngine.options(uint256) getter
+OPTIONS_SELECTOR = "0x" + keccak(b"options(uint256)")[:4].hex()
+
+
+def decode_log(log: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    topics = log.get("topics") or []
+    if not topics or topics[0] not in EVENTS:
+        return None
+    name, decoder = EVENTS[topics[0]]
+    raw = (log.get("data") or "0x")[2:]
+    words = [raw[i:i + 64] for i in range(0, len(raw), 64)]
+    try:
+        columns = decoder(topics, words)
+    except (IndexError, ValueError):
+        return None  # same topic0 from an unrelated contract (e.g. ERC-20 Transfer)
+    event = {
+        "block_number": int(log["blockNumber"], 16) if isinstance(log["blockNumber"], str) else log["blockNumber"],
+        "log_index": int(log["logIndex"], 16) if isinstance(log["logIndex"], str) else log["logIndex"],
+        "block_hash": log.get("blockHash"),
+        "tx_hash": log.get("transactionHash"),
+        "contract": log["address"].lower(),
+        "event": name,
+        "option_id": None,
+        "order_hash": None,
+        "account": None,
+        "counterparty": None,
+        "amount": None,
+    }
+    event.update(columns)
+    return event
+
+
+# -------------------------
+# Log sources
+# -------------------------
+class RpcSource:
+    """JSON-RPC node (anvil, Base Sepolia...). With `record`, everything fetched is saved for replay."""
+
+    def __init__(self, url: str, record: Optional[str] = None):
+        self.url = url
+        self.session = requests.Session()
+        self.ids = 0
+        self.record = record
+        self.recorded: Dict[str, Any] = {"logs": [], "blocks": {}, "options": {}}
+
+    def _call(self, method: str, params: list) -> Any:
+        self.ids += 1
+        resp = self.session.post(self.url, json={"jsonrpc": "2.0", "id": self.ids, "method": method, "params": params},
+                                 timeout=30)
+        resp.raise_for_status()
+        body = resp.json()
+        if "error" in body:
+            raise RuntimeError(f"{method}: {body['error']}")
+        return body["result"]
+
+    def head(self) -> int:
+        return int(self._call("eth_blockNumber", []), 16)
+
+    def block_hash(self, number: int) -> Optional[str]:
+        block = self._call("eth_getBlockByNumber", [hex(number), False])
+        block_hash = block["hash"] if block else None
+        if self.record and block_hash:
+            self.recorded["blocks"][str(number)] = block_hash
+        return block_hash
+
+    def logs(self, from_block: int, to_block: int, addresses: Sequence[str]) -> List[Dict[str, Any]]:
+        query = {"fromBlock": hex(from_block), "toBlock": hex(to_block), "topics": [list(EVENTS)]}
+        if addresses:
+            query["address"] = list(addresses)
+        logs = self._call("eth_getLogs", [query])
+        if self.record:
+            self.recorded["logs"].extend(logs)
+        return logs
+
+    def option(self, engine_address: str, option_id: int) -> Optional[List[int]]:
+        data = OPTIONS_SELECTOR + format(option_id, "064x")
+        raw = self._call("eth_call", [{"to": engine_address, "data": data}, "latest"])[2:]
+        words = [int(raw[i:i + 64], 16) for i in range(0, len(raw), 64)]
+        if self.record:
+            self.recorded["options"][str(option_id)] = words
+        return words or None
+
+    def save(self) -> None:
+        if self.record:
+            with open(self.record, "w", encoding="utf-8") as fh:
+                json.dump(self.recorded, fh)
+
+
+class RecordedSource:
+    """
+    Replays logs from files written by RpcSource(record=...) or from foundry broadcast
+    runs (contracts/broadcast/*/<chain>/run-*.json, whose receipts carry the logs).
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        self.by_block: Dict[int, List[Dict[str, Any]]] = {}
+        self.hashes: Dict[int, str] = {}
+        self.options: Dict[int, List[int]] = {}
+        for path in paths:
+            with open(path, encoding="utf-8") as fh:
+                doc = json.load(fh)
+            logs = list(doc.get("logs", []))
+            for receipt in doc.get("receipts", []):
+                logs.extend(receipt.get("logs", []))
+            for number, block_hash in doc.get("blocks", {}).items():
+                self.hashes[int(number)] = block_hash
+            for option_id, words in doc.get("options", {}).items():
+                self.options[int(option_id)] = words
+            for log in logs:
+                self.by_block.setdefault(int(log["blockNumber"], 16), []).append(log)
+        for number, block_logs in self.by_block.items():
+            # overlapping files (run-latest.json repeats a run) describe the same block; the last file wins
+            unique = {int(l["logIndex"], 16): l for l in block_logs}
+            block_logs[:] = [unique[i] for i in sorted(unique)]
+            self.hashes[number] = block_logs[0].get("blockHash") or self.hashes.get(number)
+
+    def head(self) -> int:
+        return max(self.by_block, default=0)
+
+    def block_hash(self, number: int) -> Optional[str]:
+        return self.hashes.get(number)
+
+    def logs(self, from_block: int, to_block: int, addresses: Sequence[str]) -> List[Dict[str, Any]]:
+        wanted = {a.lower() for a in addresses}
+        out = []
+        for number in sorted(n for n in self.by_block if from_block <= n <= to_block):
+            out.extend(l for l in self.by_block[number] if not wanted or l["address"].lower() in wanted)
+        return out
+
+    def option(self, engine_address: str, option_id: int) -> Optional[List[int]]:
+        return self.options.get(option_id)
+
+    def save(self) -> None:
+        pass
+
+
+# -------------------------
+# SQL
+# -------------------------
+INSERT_EVENT_SQL = text("""
+    INSERT INTO chain_events (block_number, log_index, block_hash, tx_hash, contract, event,
+                              option_id, order_hash, account, counterparty, amount)
+    VALUES (:block_number, :log_index, :block_hash, :tx_hash, :contract, :event,
+            :option_id, :order_hash, :account, :counterparty, :amount)
+    ON CONFLICT (block_number, log_index) DO NOTHING
+""")
+
+# Positions are a pure function of the events for each option id
+REFRESH_POSITIONS_SQL = text("""
+    WITH ids AS (SELECT unnest(CAST(:option_ids AS NUMERIC[])) AS option_id),
+    state AS (
+        SELECT ids.option_id,
+            (SELECT e.account FROM chain_events e
+              WHERE e.option_id = ids.option_id AND e.event = 'OptionCreated'
+              ORDER BY e.block_number, e.log_index LIMIT 1) AS creator,
+            COALESCE(
+              (SELECT e.account FROM chain_events e
+                WHERE e.option_id = ids.option_id AND e.event = 'Transfer' AND e.contract = :nft
+                ORDER BY e.block_number DESC, e.log_index DESC LIMIT 1),
+              (SELECT e.account FROM chain_events e
+                WHERE e.option_id = ids.option_id AND e.event = 'OptionTransferred'
+                ORDER BY e.block_number DESC, e.log_index DESC LIMIT 1),
+              :engine) AS owner,
+            EXISTS (SELECT 1 FROM chain_events e
+                     WHERE e.option_id = ids.option_id AND e.event = 'OptionExercised') AS exercised,
+            -- hook flow within one fill: PreInterCalled, PostInterCalled, then OrderFilled
+            (SELECT f.order_hash FROM chain_events p
+               JOIN chain_events f ON f.tx_hash = p.tx_hash AND f.event = 'OrderFilled' AND f.log_index > p.log_index
+              WHERE p.option_id = ids.option_id AND p.event = 'PostInterCalled'
+              ORDER BY p.block_number DESC, f.log_index LIMIT 1) AS order_hash,
+            (SELECT e.amount FROM chain_events e
+              WHERE e.option_id = ids.option_id AND e.event = 'PreInterCalled'
+              ORDER BY e.block_number DESC, e.log_index DESC LIMIT 1) AS premium,
+            (SELECT max(e.block_number) FROM chain_events e WHERE e.option_id = ids.option_id) AS last_block
+        FROM ids
+    ),
+    gone AS (
+        DELETE FROM option_positions p USING state s
+        WHERE p.option_id = s.option_id AND s.last_block IS NULL
+        RETURNING p.owner
+    ),
+    upserted AS (
+        INSERT INTO option_positions (option_id, creator, owner, exercised, order_hash, premium, updated_block)
+        SELECT option_id, creator, owner, exercised, order_hash, premium, last_block
+        FROM state WHERE last_block IS NOT NULL
+        ON CONFLICT (option_id) DO UPDATE
+        SET creator = EXCLUDED.creator, owner = EXCLUDED.owner, exercised = EXCLUDED.exercised,
+            order_hash = EXCLUDED.order_hash, premium = EXCLUDED.premium,
+            updated_block = EXCLUDED.updated_block, updated_at = CURRENT_TIMESTAMP
+        RETURNING owner
+    )
+    SELECT owner FROM gone UNION SELECT owner FROM upserted
+""")
+
+POSITION_DETAILS_SQL = text("""
+    UPDATE option_positions
+    SET underlying_token = :underlying_token, quote_token = :quote_token, strike = :strike, size = :size,
+        expiry = :expiry, is_call = :is_call, instrument_name = :instrument_name
+    WHERE option_id = :option_id
+""")
+
+REFRESH_HOLDINGS_SQL = text("""
+    WITH agg AS (
+        SELECT owner AS user_address, instrument_name, SUM(size) AS quantity,
+               MIN(expiry) AS expiry_date, MIN(strike) AS strike_price,
+               MIN(CASE WHEN is_call THEN 'call' ELSE 'put' END) AS option_type
+        FROM option_positions
+        WHERE owner = ANY(:users) AND NOT exercised AND instrument_name IS NOT NULL
+        GROUP BY owner, instrument_name
+    ),
+    gone AS (
+        DELETE FROM holdings h
+        WHERE h.user_address = ANY(:users)
+          AND NOT EXISTS (SELECT 1 FROM agg WHERE agg.user_address = h.user_address
+                                              AND agg.instrument_name = h.instrument_name)
+    )
+    INSERT INTO holdings (user_address, instrument_name, quantity, expiry_date, strike_price, option_type)
+    SELECT user_address, instrument_name, quantity, expiry_date, strike_price, option_type FROM agg
+    ON CONFLICT (user_address, instrument_name) DO UPDATE
+    SET quantity = EXCLUDED.quantity, expiry_date = EXCLUDED.expiry_date, strike_price = EXCLUDED.strike_price,
+        option_type = EXCLUDED.option_type, updated_at = CURRENT_TIMESTAMP
+""")
+
+# OrderFilled/OrderCancelled carry the EIP-712 hash, which the frontend does not post as
+# orderHash, hence the match on chain_order_hash as well
+REFRESH_ORDERS_SQL = text("""
+    WITH h AS (SELECT unnest(CAST(:hashes AS TEXT[])) AS hash),
+    last_fill AS (
+        SELECT DISTINCT ON (order_hash) order_hash AS hash, amount
+        FROM chain_events WHERE event = 'OrderFilled' AND order_hash = ANY(:hashes)
+        ORDER BY order_hash, block_number DESC, log_index DESC
+    ),
+    cancelled AS (
+        SELECT DISTINCT order_hash AS hash FROM chain_events
+        WHERE event = 'OrderCancelled' AND order_hash = ANY(:hashes)
+    ),
+    target AS (
+        SELECT o.id, lf.amount, c.hash IS NOT NULL AS is_cancelled,
+               COALESCE(o.remaining_amount, o.making_amount)::NUMERIC - lf.amount AS landed
+        FROM h
+        JOIN orders o ON o.chain_order_hash = h.hash OR o.order_hash = h.hash
+        LEFT JOIN last_fill lf ON lf.hash = h.hash
+        LEFT JOIN cancelled c ON c.hash = h.hash
+    )
+    UPDATE orders o
+    SET remaining_amount = t.amount::TEXT,
+        status = CASE WHEN t.is_cancelled THEN 'cancelled'
+                      WHEN t.amount = 0 THEN 'filled'
+                      WHEN o.status IN ('filled', 'cancelled') THEN 'open'
+                      ELSE o.status END,
+        updated_at = CURRENT_TIMESTAMP
+    FROM target t
+    WHERE o.id = t.id
+    RETURNING o.*, t.landed
+""")
+
+# Fills that landed settle the oldest off-chain match reservations on the order first
+RELEASE_LANDED_SQL = text("""
+    WITH landed AS (
+        SELECT unnest(CAST(:hashes AS TEXT[])) AS order_hash, unnest(CAST(:amounts AS NUMERIC[])) AS amount
+    ),
+    ranked AS (
+        SELECT r.request_id, r.order_hash, r.amount, l.amount AS landed,
+               SUM(r.amount) OVER (PARTITION BY r.order_hash ORDER BY r.created_at, r.request_id) AS upto
+        FROM order_reservations r JOIN landed l ON l.order_hash = r.order_hash
+    ),
+    settled AS (
+        DELETE FROM order_reservations r USING ranked k
+        WHERE r.request_id = k.request_id AND r.order_hash = k.order_hash AND k.upto <= k.landed
+    )
+    UPDATE order_reservations r
+    SET amount = k.upto - k.landed
+    FROM ranked k
+    WHERE r.request_id = k.request_id AND r.order_hash = k.order_hash
+      AND k.upto > k.landed AND k.upto - k.amount < k.landed
+""")
+
+
+class SyncResult:
+    def __init__(self):
+        self.from_block: Optional[int] = None
+        self.to_block: Optional[int] = None
+        self.events = 0
+        self.rolled_back_to: Optional[int] = None
+        self.orders: List[Dict[str, Any]] = []  # updated orders rows
+        self.holders: Set[str] = set()
+
+    def __repr__(self) -> str:
+        return (f"SyncResult(blocks={self.from_block}..{self.to_block}, events={self.events}, "
+                f"orders={len(self.orders)}, holders={len(self.holders)}, rollback={self.rolled_back_to})")
+
+
+class ChainIndexer:
+    def __init__(self, source, engine: Optional[Engine] = None, engine_address: Optional[str] = OPTION_ENGINE_ADDRESS,
+                 hook_address: Optional[str] = OPTION_HOOK_ADDRESS, nft_address: Optional[str] = OPTION_NFT_ADDRESS,
+                 lop_address: Optional[str] = LIMIT_ORDER_PROTOCOL, start_block: int = INDEXER_START_BLOCK,
+                 batch_blocks: int = INDEXER_BATCH_BLOCKS, confirmations: int = INDEXER_CONFIRMATIONS):
+        self.source = source
+        self.engine = engine or get_engine()
+        self.engine_address = (engine_address or "").lower()
+        self.nft_address = (nft_address or "").lower()
+        self.addresses = [a.lower() for a in (engine_address, hook_address, nft_address, lop_address) if a]
+        self.start_block = start_block
+        self.batch_blocks = batch_blocks
+        self.confirmations = confirmations
+
+    # ---- checkpoint ----
+    def _checkpoint(self, conn: Connection) -> Tuple[Optional[int], Optional[str]]:
+        conn.execute(text("""
+            INSERT INTO chain_sync (name, block_number, block_hash) VALUES (:name, NULL, NULL)
+            ON CONFLICT (name) DO NOTHING
+        """), {"name": CHECKPOINT})
+        # row lock: a standalone indexer and the API's job never sync the same range twice
+        row = conn.execute(text("SELECT block_number, block_hash FROM chain_sync WHERE name = :name FOR UPDATE"),
+                           {"name": CHECKPOINT}).first()
+        return row[0], row[1]
+
+    def _find_fork(self, conn: Connection) -> int:
+        """Highest stored block whose hash the chain still agrees with."""
+        rows = conn.execute(text("SELECT block_number, block_hash FROM chain_blocks ORDER BY block_number DESC")).all()
+        for number, block_hash in rows:
+            if self.source.block_hash(number) == block_hash:
+                return number
+        return (rows[-1][0] - 1) if rows else self.start_block - 1
+
+    # ---- sync ----
+    def sync_once(self) -> SyncResult:
+        result = SyncResult()
+        target = self.source.head() - self.confirmations
+        with self.engine.begin() as conn:
+            number, block_hash = self._checkpoint(conn)
+            if number is not None and block_hash and self.source.block_hash(number) not in (None, block_hash):
+                fork = self._find_fork(conn)
+                self._rollback(conn, fork, result)
+                number = fork
+
+            from_block = self.start_block if number is None else number + 1
+            to_block = min(from_block + self.batch_blocks - 1, target)
+            if to_block < from_block:
+                return result
+            result.from_block, result.to_block = from_block, to_block
+
+            events = [e for e in (decode_log(l) for l in self.source.logs(from_block, to_block, self.addresses)) if e]
+            # ERC-20 Transfer shares topic0 with ERC-721 Transfer; only the option NFT's count
+            events = [e for e in events if e["event"] != "Transfer" or not self.nft_address
+                      or e["contract"] == self.nft_address]
+            if events:
+                conn.execute(INSERT_EVENT_SQL, events)
+            result.events = len(events)
+
+            hashes = {e["block_number"]: e["block_hash"] for e in events if e["block_hash"]}
+            hashes[to_block] = self.source.block_hash(to_block)
+            rows = [{"n": n, "h": h} for n, h in hashes.items() if h]
+            if rows:
+                conn.execute(text("""
+                    INSERT INTO chain_blocks (block_number, block_hash) VALUES (:n, :h)
+                    ON CONFLICT (block_number) DO UPDATE SET block_hash = EXCLUDED.block_hash
+                """), rows)
+
+            self._refresh(conn, {e["option_id"] for e in events if e["option_id"] is not None},
+                          {e["order_hash"] for e in events if e["order_hash"]}, result)
+
+            conn.execute(text("""
+                UPDATE chain_sync SET block_number = :n, block_hash = :h, updated_at = CURRENT_TIMESTAMP
+                WHERE name = :name
+            """), {"n": to_block, "h": hashes[to_block], "name": CHECKPOINT})
+            conn.execute(text("DELETE FROM chain_blocks WHERE block_number < :keep"),
+                         {"keep": to_block - INDEXER_KEEP_BLOCKS})
+        return result
+
+    def _rollback(self, conn: Connection, fork: int, result: SyncResult) -> None:
+        affected = conn.execute(text("""
+            DELETE FROM chain_events WHERE block_number > :fork RETURNING option_id, order_hash
+        """), {"fork": fork}).all()
+        conn.execute(text("DELETE FROM chain_blocks WHERE block_number > :fork"), {"fork": fork})
+        self._refresh(conn, {r[0] for r in affected if r[0] is not None}, {r[1] for r in affected if r[1]}, result)
+        result.rolled_back_to = fork
+        print(f"⚠️ reorg: rolled back to block {fork} ({len(affected)} events)")
+
+    def _refresh(self, conn: Connection, option_ids: Set[int], order_hashes: Set[str], result: SyncResult) -> None:
+        if option_ids:
+            ids = sorted(option_ids)
+            before = {r[0] for r in conn.execute(text(
+                "SELECT owner FROM option_positions WHERE option_id = ANY(CAST(:ids AS NUMERIC[]))"), {"ids": ids})}
+            after = {r[0] for r in conn.execute(REFRESH_POSITIONS_SQL, {
+                "option_ids": ids, "engine": self.engine_address or ZERO_ADDRESS, "nft": self.nft_address})}
+            # strike/size/expiry never change, so each option is looked up once (retried until it succeeds)
+            missing = [int(r[0]) for r in conn.execute(text("""
+                SELECT option_id FROM option_positions
+                WHERE option_id = ANY(CAST(:ids AS NUMERIC[])) AND instrument_name IS NULL
+            """), {"ids": ids})]
+            details = [d for d in (self._details(option_id) for option_id in missing) if d]
+            if details:
+                conn.execute(POSITION_DETAILS_SQL, details)
+            users = (before | after) - {None, ZERO_ADDRESS, self.engine_address}
+            if users:
+                conn.execute(REFRESH_HOLDINGS_SQL, {"users": sorted(users)})
+                result.holders |= users
+        if order_hashes:
+            rows = [dict(r) for r in conn.execute(REFRESH_ORDERS_SQL, {"hashes": sorted(order_hashes)}).mappings()]
+            landed = [(row["order_hash"], row.pop("landed")) for row in rows]
+            landed = [(order_hash, amount) for order_hash, amount in landed if amount is not None and amount > 0]
+            if landed:
+                conn.execute(RELEASE_LANDED_SQL, {"hashes": [h for h, _ in landed], "amounts": [a for _, a in landed]})
+            result.orders.extend(rows)
+
+    def _details(self, option_id: int) -> Optional[Dict[str, Any]]:
+        if not self.engine_address:
+            return None
+        try:
+            words = self.source.option(self.engine_address, option_id)
+        except Exception as e:
+            print(f"❌ options({option_id}) call failed: {e}")
+            return None
+        if not words or len(words) < 9:
+            return None
+        _, _, underlying, quote, strike, size, expiry, is_call = words[:8]
+        underlying = "0x" + format(underlying, "040x")
+        symbol = TOKEN_SYMBOLS.get(underlying, underlying[:8])
+        return {
+            "option_id": option_id,
+            "underlying_token": underlying,
+            "quote_token": "0x" + format(quote, "040x"),
+            "strike": strike / WAD,
+            "size": size / WAD,
+            "expiry": expiry,
+            "is_call": bool(is_call),
+            "instrument_name": option_instrument_name(symbol, strike / WAD, expiry, bool(is_call)),
+        }
+
+    def run(self, interval: float = INDEXER_INTERVAL, once: bool = False) -> None:
+        while True:
+            try:
+                result = self.sync_once()
+                if result.from_block is not None:
+                    print(f"✅ indexed {result}")
+                caught_up = result.to_block is None or result.to_block >= self.source.head() - self.confirmations
+            except Exception as e:
+                print(f"❌ indexer error: {e}")
+                caught_up = True
+            if once and caught_up:
+                return
+            if caught_up:
+                time.sleep(interval)
+
+
+def main(args) -> None:
+    if args.recorded:
+        paths = [p for pattern in args.recorded for p in sorted(glob.glob(pattern))]
+        source = RecordedSource(paths)
+        confirmations = 0
+    else:
+        source = RpcSource(args.rpc, record=args.record)
+        confirmations = args.confirmations
+    indexer = ChainIndexer(source, start_block=args.from_block, confirmations=confirmations)
+    try:
+        indexer.run(once=args.once or bool(args.recorded))
+    finally:
+        source.save()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpc", default=INDEXER_RPC_URL or "http://127.0.0.1:8545")
+    parser.add_argument("--recorded", nargs="+", help="replay recorded logs / foundry broadcast files instead of RPC")
+    parser.add_argument("--record", help="save fetched logs, block hashes and option calls for later replay")
+    parser.add_argument("--from-block", type=int, default=INDEXER_START_BLOCK)
+    parser.add_argument("--confirmations", type=int, default=INDEXER_CONFIRMATIONS)
+    parser.add_argument("--once", action="store_true", help="stop when caught up with head")
+    main(parser.parse_args())
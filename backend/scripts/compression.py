@@ -0,0 +1,101 @@
+import gzip
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# -------------------------
+# Response compression
+# -------------------------
+# Negotiated from Accept-Encoding (br preferred when the brotli module is installed, then
+# gzip). Buffered bodies below COMPRESSION_MIN_SIZE go out as-is; streamed bodies are
+# compressed chunk by chunk with a sync flush so the client can parse as they arrive.
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """"br", "gzip" or None for an Accept-Encoding header (q=0 excludes a coding)."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+class StreamEncoder:
+    """Incremental gzip/brotli encoder; every chunk is flushed so it can be decoded on arrival."""
+
+    def __init__(self, coding: str):
+        self.coding = coding
+        if coding == "br":
+            self.encoder = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.encoder = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.coding == "br":
+            return self.encoder.process(data) + self.encoder.flush()
+        return self.encoder.compress(data) + self.encoder.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.encoder.finish() if self.coding == "br" else self.encoder.flush()
+
+
+def _encode_stream(chunks: Iterable[bytes], coding: str) -> Iterator[bytes]:
+    encoder = StreamEncoder(coding)
+    try:
+        for data in chunks:
+            if data:
+                yield encoder.chunk(data.encode() if isinstance(data, str) else data)
+        yield encoder.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def compress_response(response: Response, accept_encoding: Optional[str]) -> Response:
+    """Compress `response` in place when the client accepts it and the body is worth it."""
+    if response.status_code < 200 or response.status_code in (204, 304) \
+            or "Content-Encoding" in response.headers \
+            or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return response
+    coding = negotiate(accept_encoding)
+    response.vary.add("Accept-Encoding")
+    if coding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _encode_stream(response.response, coding)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESSION_MIN_SIZE:
+            return response
+        body = brotli.compress(body, quality=BROTLI_QUALITY) if coding == "br" \
+            else gzip.compress(body, GZIP_LEVEL)
+        response.set_data(body)
+    response.headers["Content-Encoding"] = coding
+    return response
@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# -------------------------
+# Connection settings (env overrides the docker-compose defaults)
+# -------------------------
+DB_NAME = os.environ.get("DB_NAME", "crypto_info")
+DB_USER = os.environ.get("DB_USER", "postgres")
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "mypassword")
+DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_PORT = os.environ.get("DB_PORT", "5433")
+
+DATABASE_URL = os.environ.get("DATABASE_URL", f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+# Optional streaming replica for read-only endpoints; unset means reads go to the primary
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+# Green threads (gevent/eventlet) share one process, so cooperative servers default to a larger pool
+COOPERATIVE_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))
+COOPERATIVE_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "40"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") != "0"
+# SQLAlchemy's compiled-statement cache; text() queries are cached by their SQL string
+QUERY_CACHE_SIZE = int(os.environ.get("DB_QUERY_CACHE_SIZE", "500"))
+
+
+# -------------------------
+# Pool metrics
+# -------------------------
+class PoolMetrics:
+    """Counters fed by pool events plus checkout wait times measured by TimedQueuePool."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_conn, record):
+        with self.lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        with self.lock:
+            self.checkouts += 1
+
+    def _on_invalidate(self, dbapi_conn, record, exc):
+        with self.lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self.lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self.engine.pool
+        with self.lock:
+            return {
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.waits,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that reports how long every checkout waited to its PoolMetrics, whether it
+    came through connect(), engine.connect() or engine.begin().
+    """
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.perf_counter() - started)
+        return record
+
+    def recreate(self) -> "TimedQueuePool":
+        # engine.dispose() swaps in a fresh pool; keep reporting to the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+# -------------------------
+# Engines
+# -------------------------
+_engines: Dict[str, Engine] = {}
+_metrics: Dict[str, PoolMetrics] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(role: str = "primary", pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> Engine:
+    """
+    Process-wide engine for `role` ("primary" or "replica"). Pool sizing passed on the
+    first call wins; later calls return the same engine.
+    """
+    role = _resolve(role)
+    engine = _engines.get(role)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if role not in _engines:
+            url = DATABASE_REPLICA_URL if role == "replica" else DATABASE_URL
+            engine = create_engine(
+                url,
+                future=True,
+                poolclass=TimedQueuePool,
+                pool_size=POOL_SIZE if pool_size is None else pool_size,
+                max_overflow=MAX_OVERFLOW if max_overflow is None else max_overflow,
+                pool_timeout=POOL_TIMEOUT,
+                pool_recycle=POOL_RECYCLE,
+                pool_pre_ping=POOL_PRE_PING,
+                query_cache_size=QUERY_CACHE_SIZE,
+            )
+            _metrics[role] = engine.pool.metrics = PoolMetrics(engine)
+            _engines[role] = engine
+        return _engines[role]
+
+
+def connect(role: str = "primary") -> Connection:
+    """Check a connection out of `role`'s pool; the pool itself records the wait."""
+    return get_engine(role).connect()
+
+
+def _resolve(role: str) -> str:
+    if role == "replica" and not DATABASE_REPLICA_URL:
+        return "primary"
+    return role
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {role: metrics.snapshot() for role, metrics in _metrics.items()}
@@ -1,17 +1,18 @@
 import asyncio
 import httpx
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from datetime import datetime, timezone
 import time
+import atexit
+import signal
+import sys
 import requests
 
-DB_NAME = "crypto_info"
-DB_USER = "postgres"
-DB_PASSWORD = "mypassword"
-DB_HOST = "localhost"
-DB_PORT = "5433"
+from bars import BAR_INTERVAL, BarBuffer, BarBuilder
+from db import get_engine
+from price_state import SEED_SECONDS, WINDOW, PriceState, SharedPriceState
 
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+engine = get_engine()
 
 FEED_MAP = {
     "1INCH": "63f341689d98a12ef60a5cff1d7f85c70a9e17bf1575f0e7c0b2512d48b1c8b3",
@@ -22,6 +23,96 @@ BASE_URL_HIST = "https://benchmarks.pyth.network/v1/updates/price"
 BASE_URL_LIVE = "https://hermes.pyth.network/v2/updates/price/latest"
 THROTTLE = 2.5
 
+# Rolling spot/variance state per symbol, published to the pricer via shared memory
+price_states = {}
+shared_states = {}
+
+# Ticks are aggregated into BAR_INTERVAL bars; completed bars are written in batches
+bar_builders = {}
+bar_buffer = BarBuffer()
+
+UPSERT_BAR_SQL = text("""
+    INSERT INTO crypto_prices (crypto_id, timestamp, open, high, low, close, volume, symbol)
+    VALUES (:crypto_id, :ts, :open, :high, :low, :close, :volume, :symbol)
+    ON CONFLICT (crypto_id, timestamp) DO UPDATE
+    SET high=GREATEST(crypto_prices.high, EXCLUDED.high),
+        low=LEAST(crypto_prices.low, EXCLUDED.low),
+        close=EXCLUDED.close,
+        volume=EXCLUDED.volume
+""")
+
+
+def init_price_states(symbols):
+    """
+    Replay the last SEED_SECONDS of bars (at least WINDOW of them) through each symbol's
+    estimators and open its shared segment
+    """
+    with engine.connect() as conn:
+        for symbol in symbols:
+            crypto_id = conn.execute(
+                text("SELECT crypto_id FROM cryptocurrencies WHERE symbol=:symbol"),
+                {"symbol": symbol}
+            ).scalar()
+            rows = conn.execute(text("""
+                SELECT high, low, close, timestamp FROM crypto_prices
+                WHERE crypto_id = :crypto_id
+                AND timestamp >= NOW() - make_interval(secs => :seconds)
+                ORDER BY timestamp ASC
+            """), {"crypto_id": crypto_id, "seconds": SEED_SECONDS}).all()
+            if len(rows) < WINDOW:
+                rows = conn.execute(text("""
+                    SELECT high, low, close, timestamp FROM crypto_prices
+                    WHERE crypto_id = :crypto_id
+                    ORDER BY timestamp DESC
+                    LIMIT :limit
+                """), {"crypto_id": crypto_id, "limit": WINDOW}).all()[::-1]
+
+            state = PriceState(symbol, crypto_id)
+            for high, low, close, ts in rows:
+                # high/low feed the range estimator; rows written before bars had them fall back to the close
+                close = float(close)
+                state.update_bar(float(high or close), float(low or close), close, ts.timestamp())
+            price_states[symbol] = state
+            bar_builders[symbol] = BarBuilder(symbol, crypto_id)
+            shared_states[symbol] = SharedPriceState.create(symbol)
+            if state.spot is not None:
+                shared_states[symbol].publish(state)
+            print(f"✅ Seeded {symbol} price state with {len(rows)} samples")
+
+
+def close_price_states():
+    for shared in shared_states.values():
+        shared.close()
+    shared_states.clear()
+
+
+def flush_bars(include_current=False):
+    """Write buffered bars in one statement; on shutdown also write the in-progress bars"""
+    bars = bar_buffer.drain()
+    if include_current:
+        bars += [bar for bar in (b.take_current() for b in bar_builders.values()) if bar is not None]
+    if not bars:
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(UPSERT_BAR_SQL, [{
+                "crypto_id": bar.crypto_id,
+                "ts": datetime.fromtimestamp(bar.start, tz=timezone.utc),
+                "open": bar.open,
+                "high": bar.high,
+                "low": bar.low,
+                "close": bar.close,
+                "volume": 0,  # Pyth publishes no traded volume
+                "symbol": bar.symbol
+            } for bar in bars])
+        print(f"✅ Flushed {len(bars)} {BAR_INTERVAL} bars")
+    except Exception as e:
+        print(f"❌ Failed to flush {len(bars)} bars: {e}")
+        dropped = bar_buffer.requeue(bars, time.time())
+        if dropped:
+            print(f"⚠️ Bar buffer full, dropped {dropped} oldest bars ({bar_buffer.dropped} since start)")
+
+
 def fetch_historical_backfill(symbols):
     """Fetch historical data per symbol separately"""
     now = int(time.time())
@@ -90,26 +181,14 @@ async def fetch_and_store_price(symbol: str, client: httpx.AsyncClient):
         if price_info:
             price_val = int(price_info["price"]) * (10 ** (price_info["expo"]))
             ts_dt = datetime.fromtimestamp(int(price_info["publish_time"]), tz=timezone.utc)
-            with engine.begin() as conn:
-                crypto_id = conn.execute(
-                    text("SELECT crypto_id FROM cryptocurrencies WHERE symbol=:symbol"),
-                    {"symbol": symbol}
-                ).scalar()
-                conn.execute(text("""
-                    INSERT INTO crypto_prices (crypto_id, timestamp, open, high, low, close, volume, symbol)
-                    VALUES (:crypto_id, :ts, :open, :high, :low, :close, :volume, :symbol)
-                    ON CONFLICT (crypto_id, timestamp) DO UPDATE
-                    SET close=EXCLUDED.close, open=EXCLUDED.open, high=EXCLUDED.high, low=EXCLUDED.low, volume=EXCLUDED.volume
-                """), {
-                    "crypto_id": crypto_id,
-                    "ts": ts_dt,
-                    "open": price_val,
-                    "high": price_val,
-                    "low": price_val,
-                    "close": price_val,
-                    "volume": 0,
-                    "symbol": symbol
-                })
+            state = price_states[symbol]
+            if not state.update(price_val, ts_dt.timestamp()):
+                return  # Pyth hasn't published a new price since the last poll
+            builder = bar_builders[symbol]
+            completed = builder.add_tick(price_val, ts_dt.timestamp())
+            if completed is not None:
+                bar_buffer.add(completed, time.time())
+            shared_states[symbol].publish(state, builder.current)
             print(f"✅ Updated {symbol} price: {price_val}")
     except Exception as e:
         print(e)
@@ -121,11 +200,17 @@ async def live_polling(symbols):
         while True:
             tasks = [fetch_and_store_price(symbol, client) for symbol in symbols]
             await asyncio.gather(*tasks)
+            if bar_buffer.due(time.time()):
+                flush_bars()
             await asyncio.sleep(THROTTLE)
 
 if __name__ == "__main__":
     symbols_to_track = list(FEED_MAP.keys())
     print("⏳ Starting historical backfill...")
     # fetch_historical_backfill(symbols_to_track)
+    init_price_states(symbols_to_track)
+    atexit.register(close_price_states)
+    atexit.register(flush_bars, include_current=True)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # run the atexit hooks when app.py stops us
     print("🚀 Starting live async polling...")
     asyncio.run(live_polling(symbols_to_track))
@@ -0,0 +1,182 @@
+import argparse
+import math
+from typing import Any, Dict, Optional
+
+import numpy as np
+from numba import njit, prange
+
+# -------------------------
+# Monte Carlo Heston
+# -------------------------
+# Path simulation for payoffs heston_price cannot handle (Asian, barrier). Variance steps
+# use Andersen's QE scheme (or full-truncation Euler); each normal draw also drives its
+# antithetic path, and the discounted underlying is a control variate with known mean.
+# Paths are simulated in chunks and only their running statistics (terminal, average,
+# min, max) are kept, so memory is bounded by MC_CHUNK_PATHS x steps regardless of n_paths.
+MC_CHUNK_PATHS = 16384
+MC_STEPS_PER_YEAR = 365  # daily monitoring by default
+QE_PSI_CRIT = 1.5
+PAYOFFS = ("european", "asian", "barrier")
+BARRIERS = ("up-and-out", "down-and-out", "up-and-in", "down-and-in")
+
+
+@njit(parallel=True, cache=True)
+def _simulate(S0, v0, dt, r, kappa, theta, sigma, rho, Z, qe, sign):
+    """Per-path (S_T, mean S, min S, max S) for normals Z[2, steps, paths], scaled by `sign`."""
+    n_steps, n_paths = Z.shape[1], Z.shape[2]
+    out = np.empty((4, n_paths))
+    ekt = math.exp(-kappa * dt)
+    # QE log-price coefficients (central discretisation, gamma1 = gamma2 = 0.5)
+    k0 = -rho * kappa * theta / sigma * dt
+    k1 = 0.5 * dt * (kappa * rho / sigma - 0.5) - rho / sigma
+    k2 = 0.5 * dt * (kappa * rho / sigma - 0.5) + rho / sigma
+    k3 = 0.5 * dt * (1.0 - rho * rho)
+    rho_perp = math.sqrt(1.0 - rho * rho)
+    for p in prange(n_paths):
+        x = math.log(S0)
+        v = v0
+        total = 0.0
+        lo = S0
+        hi = S0
+        for t in range(n_steps):
+            zv = sign * Z[0, t, p]
+            zs = sign * Z[1, t, p]
+            if qe:
+                m = theta + (v - theta) * ekt
+                s2 = v * sigma * sigma * ekt / kappa * (1.0 - ekt) \
+                    + theta * sigma * sigma / (2.0 * kappa) * (1.0 - ekt) ** 2
+                psi = s2 / (m * m)
+                if psi <= QE_PSI_CRIT:
+                    b2 = 2.0 / psi - 1.0 + math.sqrt(2.0 / psi) * math.sqrt(2.0 / psi - 1.0)
+                    a = m / (1.0 + b2)
+                    v_next = a * (math.sqrt(b2) + zv) ** 2
+                else:
+                    prob = (psi - 1.0) / (psi + 1.0)
+                    beta = (1.0 - prob) / m
+                    u = 0.5 * (1.0 + math.erf(zv / math.sqrt(2.0)))
+                    v_next = 0.0 if u <= prob else math.log((1.0 - prob) / (1.0 - u)) / beta
+                x += r * dt + k0 + k1 * v + k2 * v_next + math.sqrt(max(k3 * (v + v_next), 0.0)) * zs
+                v = v_next
+            else:
+                vp = max(v, 0.0)
+                sq = math.sqrt(vp * dt)
+                x += (r - 0.5 * vp) * dt + sq * (rho * zv + rho_perp * zs)
+                v += kappa * (theta - vp) * dt + sigma * sq * zv
+            s = math.exp(x)
+            total += s
+            lo = min(lo, s)
+            hi = max(hi, s)
+        out[0, p] = math.exp(x)
+        out[1, p] = total / n_steps
+        out[2, p] = lo
+        out[3, p] = hi
+    return out
+
+
+def _payoff(stats: np.ndarray, K: float, is_call: bool, payoff: str,
+            barrier: Optional[float], barrier_type: Optional[str]) -> np.ndarray:
+    underlying = stats[1] if payoff == "asian" else stats[0]
+    value = np.maximum(underlying - K, 0.0) if is_call else np.maximum(K - underlying, 0.0)
+    if payoff == "barrier":
+        if barrier_type.startswith("up"):
+            hit = stats[3] >= barrier
+        else:
+            hit = stats[2] <= barrier
+        value = np.where(hit, value, 0.0) if barrier_type.endswith("-in") else np.where(hit, 0.0, value)
+    return value
+
+
+def heston_mc_price(S, K, T, r, kappa, theta, sigma, rho, v0, option_type="call", payoff="european",
+                    barrier=None, barrier_type=None, n_paths=100_000, n_steps=None, scheme="qe",
+                    antithetic=True, control_variate=True, seed=None,
+                    chunk_paths=MC_CHUNK_PATHS) -> Dict[str, Any]:
+    """
+    Monte Carlo price with a 95% confidence interval: {"price", "stderr", "ci", "paths", "steps"}.
+    Asian options average the monitored closes (arithmetic, fixed strike); barriers are
+    monitored at every step.
+    """
+    if payoff not in PAYOFFS:
+        raise ValueError(f"Unknown payoff {payoff!r}")
+    if option_type not in ("call", "put"):
+        raise ValueError(f"Unknown option type {option_type!r}")
+    if payoff == "barrier" and (barrier is None or barrier_type not in BARRIERS):
+        raise ValueError("barrier payoffs need a barrier level and barrier_type")
+    if scheme not in ("qe", "euler"):
+        raise ValueError(f"Unknown scheme {scheme!r}")
+    n_steps = n_steps or max(int(math.ceil(T * MC_STEPS_PER_YEAR)), 1)
+    dt = T / n_steps
+    disc = math.exp(-r * T)
+    # known mean of the control: discounted S_T, or discounted average of the monitored closes
+    if payoff == "asian":
+        times = dt * np.arange(1, n_steps + 1)
+        control_mean = disc * S * float(np.exp(r * times).mean())
+    else:
+        control_mean = S
+
+    rng = np.random.default_rng(seed)
+    draws = n_paths // 2 if antithetic else n_paths
+    sums = np.zeros(5)  # sum y, sum x, sum y^2, sum x^2, sum xy over (antithetic-averaged) samples
+    count = 0
+    done = 0
+    while done < draws:
+        m = min(chunk_paths, draws - done)
+        Z = rng.standard_normal((2, n_steps, m))
+        stats = _simulate(float(S), float(v0), dt, r, kappa, theta, sigma, rho, Z, scheme == "qe", 1.0)
+        y = disc * _payoff(stats, K, option_type == "call", payoff, barrier, barrier_type)
+        x = disc * (stats[1] if payoff == "asian" else stats[0])
+        if antithetic:
+            stats = _simulate(float(S), float(v0), dt, r, kappa, theta, sigma, rho, Z, scheme == "qe", -1.0)
+            y = 0.5 * (y + disc * _payoff(stats, K, option_type == "call", payoff, barrier, barrier_type))
+            x = 0.5 * (x + disc * (stats[1] if payoff == "asian" else stats[0]))
+        sums += (y.sum(), x.sum(), (y * y).sum(), (x * x).sum(), (x * y).sum())
+        count += m
+        done += m
+
+    mean_y, mean_x = sums[0] / count, sums[1] / count
+    var_y = sums[2] / count - mean_y ** 2
+    var_x = sums[3] / count - mean_x ** 2
+    cov = sums[4] / count - mean_x * mean_y
+    if control_variate and var_x > 0:
+        b = cov / var_x
+        price = mean_y - b * (mean_x - control_mean)
+        variance = var_y - cov * cov / var_x
+    else:
+        price, variance = mean_y, var_y
+    stderr = math.sqrt(max(variance, 0.0) / count)
+    return {
+        "price": float(price),
+        "stderr": stderr,
+        "ci": (float(price - 1.96 * stderr), float(price + 1.96 * stderr)),
+        "paths": count * (2 if antithetic else 1),
+        "steps": n_steps,
+    }
+
+
+def check_against_closed_form(n_paths: int = 200_000, seed: int = 7) -> bool:
+    """European MC prices against heston_price on a small strike/expiry grid."""
+    from heston_model import heston_price
+
+    params = {"r": 0.01, "kappa": 0.5, "theta": 0.04, "sigma": 0.8, "rho": -0.7}
+    S, v0 = 3000.0, 0.3
+    ok = True
+    for days in (7, 30, 90):
+        for K in (2700.0, 3000.0, 3300.0):
+            for option_type in ("call", "put"):
+                T = days / 365
+                exact = heston_price(S, K, T, v0=v0, option_type=option_type, **params)
+                mc = heston_mc_price(S, K, T, v0=v0, option_type=option_type, n_paths=n_paths, seed=seed, **params)
+                inside = mc["ci"][0] <= exact <= mc["ci"][1]
+                ok &= inside
+                print(f"{'✅' if inside else '❌'} {days:>3}d {K:>7.1f} {option_type:<4} "
+                      f"closed={exact:9.4f} mc={mc['price']:9.4f} ±{1.96 * mc['stderr']:.4f}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo Heston pricer")
+    parser.add_argument("--check", action="store_true", help="compare European prices against heston_price")
+    parser.add_argument("--paths", type=int, default=200_000)
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(0 if check_against_closed_form(args.paths) else 1)
+    parser.print_help()
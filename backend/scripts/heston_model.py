@@ -1,25 +1,29 @@
+import os
+import sys
+import json
 import numpy as np
-import pandas as pd
-from sqlalchemy import create_engine, text
-from scipy.integrate import quad
+from sqlalchemy import text
 from numba import jit
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+
+from db import get_engine
+from instruments import InstrumentCatalog
+from iv_surface import UPSERT_SURFACE_SQL, build_surface
+from price_state import SEED_SECONDS, WINDOW, read_price_state
+from quoting import SpreadModel, house_inventory, quote_chain
+from tracing import Trace, profiled, write_traces
+from volatility import DEFAULT_ESTIMATOR, ESTIMATORS, SECONDS_PER_YEAR, VolatilitySet
 
 # -------------------------
 # Database connection
 # -------------------------
-DB_NAME = "crypto_info"
-DB_USER = "postgres"
-DB_PASSWORD = "mypassword"
-DB_HOST = "localhost"
-DB_PORT = "5433"
-
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+engine = get_engine()
+catalog = InstrumentCatalog()
 
 # -------------------------
 # Heston model functions
 # -------------------------
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def heston_cf(phi, S, T, r, kappa, theta, sigma, rho, v0, j):
     i = 1j
     u = 0.5 if j == 1 else -0.5
@@ -30,16 +34,27 @@ def heston_cf(phi, S, T, r, kappa, theta, sigma, rho, v0, j):
     D = ((b - rho * sigma * i * phi + d) / sigma**2) * ((1 - np.exp(d * T)) / (1 - g * np.exp(d * T)))
     return np.exp(C + D * v0 + i * phi * np.log(S))
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def integrand(phi, S, K, T, r, kappa, theta, sigma, rho, v0, j):
     i = 1j
     return (np.exp(-i * phi * np.log(K)) * heston_cf(phi, S, T, r, kappa, theta, sigma, rho, v0, j) / (i * phi)).real if phi != 0 else 0.0
 
+# Integrand evaluations per method since process start (exported with each cycle's trace)
+INTEGRAND_EVALS = {"quad": 0, "quad_calls": 0, "gauss_legendre": 0}
+
+
+def _quad(*args):
+    # scipy.integrate is only needed by the scalar reference pricer; keep it off the cycle's import path
+    from scipy.integrate import quad
+    value, _, info = quad(integrand, 0, PHI_MAX, args=args, limit=300, epsabs=1e-6, epsrel=1e-6, full_output=1)[:3]
+    INTEGRAND_EVALS["quad"] += info["neval"]
+    INTEGRAND_EVALS["quad_calls"] += 1
+    return value
+
+
 def heston_price(S, K, T, r, kappa, theta, sigma, rho, v0, option_type):
-    phi_max = 85
-    quad_options = {'limit': 300, 'epsabs': 1e-6, 'epsrel': 1e-6}
-    P1 = 0.5 + (1/np.pi) * quad(integrand, 0, phi_max, args=(S, K, T, r, kappa, theta, sigma, rho, v0, 1), **quad_options)[0]
-    P2 = 0.5 + (1/np.pi) * quad(integrand, 0, phi_max, args=(S, K, T, r, kappa, theta, sigma, rho, v0, 2), **quad_options)[0]
+    P1 = 0.5 + (1/np.pi) * _quad(S, K, T, r, kappa, theta, sigma, rho, v0, 1)
+    P2 = 0.5 + (1/np.pi) * _quad(S, K, T, r, kappa, theta, sigma, rho, v0, 2)
     if option_type == "call":
         return max(S * P1 - K * np.exp(-r * T) * P2, 0)
     elif option_type == "put":
@@ -48,99 +63,221 @@ def heston_price(S, K, T, r, kappa, theta, sigma, rho, v0, option_type):
         return None
 
 # -------------------------
-# Strike generation
+# Vectorised pricing (risk / batch revaluation)
 # -------------------------
-def get_tick_size(spot):
-    if spot < 1: return 0.001
-    elif spot < 100: return 0.1
-    elif spot < 1000: return 1
-    else: return 10
-
-def generate_strikes(spot, pct_range=0.1, num_steps=5):
-    tick_size = get_tick_size(spot)
-    strikes = []
-    for step in range(-num_steps, num_steps + 1):
-        pct = step * (pct_range / num_steps)
-        strike = round(spot * (1 + pct) / tick_size) * tick_size
-        strikes.append(strike)
-    return sorted(list(set(strikes)))
-
-def build_instruments(spot, symbol, expiry_buckets=[7,30], option_types=["call","put"]):
-    strikes = generate_strikes(spot)
-    instruments = []
-    for strike in strikes:
-        for expiry in expiry_buckets:
-            for opt_type in option_types:
-                instruments.append({
-                    "symbol": symbol,
-                    "strike": strike,
-                    "expiry_days": expiry,
-                    "type": opt_type
-                })
-    return instruments
+# Same characteristic function and truncation as heston_price, but the two integrals use
+# a fixed Gauss-Legendre rule so many (S, K, T, v0) points price in one compiled loop
+# instead of two adaptive quad calls each.
+PHI_MAX = 85
+GL_NODES = 96  # matches quad to ~1e-8 across 1h-6m expiries
+_gl_x, _gl_w = np.polynomial.legendre.leggauss(GL_NODES)
+GL_PHI = 0.5 * PHI_MAX * (_gl_x + 1.0)
+GL_WEIGHTS = 0.5 * PHI_MAX * _gl_w
+
+
+@jit(nopython=True, cache=True)
+def _heston_probs(S, K, T, r, kappa, theta, sigma, rho, v0, nodes, weights):
+    n = S.shape[0]
+    P1 = np.empty(n)
+    P2 = np.empty(n)
+    for k in range(n):
+        s1 = 0.0
+        s2 = 0.0
+        for m in range(nodes.shape[0]):
+            s1 += weights[m] * integrand(nodes[m], S[k], K[k], T[k], r, kappa, theta, sigma, rho, v0[k], 1)
+            s2 += weights[m] * integrand(nodes[m], S[k], K[k], T[k], r, kappa, theta, sigma, rho, v0[k], 2)
+        P1[k] = 0.5 + s1 / np.pi
+        P2[k] = 0.5 + s2 / np.pi
+    return P1, P2
+
+
+def heston_price_vec(S, K, T, r, kappa, theta, sigma, rho, v0, is_call):
+    """heston_price over arrays: S, K, T, v0 and is_call broadcast to a common shape."""
+    S, K, T, v0, is_call = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (S, K, T, v0)),
+                                               np.asarray(is_call, dtype=bool))
+    shape = S.shape
+    S, K, T, v0 = (np.ascontiguousarray(a, dtype=np.float64).ravel() for a in (S, K, T, v0))
+    T = np.maximum(T, 1e-8)
+    P1, P2 = _heston_probs(S, K, T, r, kappa, theta, sigma, rho, v0, GL_PHI, GL_WEIGHTS)
+    INTEGRAND_EVALS["gauss_legendre"] += 2 * len(GL_PHI) * len(S)
+    disc_k = K * np.exp(-r * T)
+    call = np.maximum(S * P1 - disc_k * P2, 0.0)
+    put = np.maximum(disc_k * (1 - P2) - S * (1 - P1), 0.0)
+    return np.where(is_call.ravel(), call, put).reshape(shape)
 
 # -------------------------
 # Main generic method
 # -------------------------
-def run_heston_for_symbol(symbol, spreads=0.02, r=0.01, kappa=0.5, theta=0.04, sigma=0.8, rho=-0.7):
+# Variance estimator feeding v0, per symbol (see volatility.ESTIMATORS).
+# Override with VOL_ESTIMATOR_<SYMBOL>=ewma etc.
+VOL_ESTIMATORS = {
+    "ETH": DEFAULT_ESTIMATOR,
+    "1INCH": DEFAULT_ESTIMATOR,
+}
+
+
+def get_vol_estimator(symbol):
+    name = os.environ.get(f"VOL_ESTIMATOR_{symbol}", VOL_ESTIMATORS.get(symbol, DEFAULT_ESTIMATOR))
+    if name not in ESTIMATORS:
+        raise ValueError(f"Unknown volatility estimator {name!r} for {symbol}")
+    return name
+
+
+def load_market_state(symbol):
     """
-    Fetch latest spot for `symbol`, compute Heston option prices, store in DB.
-    Returns DataFrame of market data.
+    Latest spot, v0 and crypto_id for `symbol`. Reads the fetcher's shared rolling state
+    in O(1); only falls back to replaying the last SEED_SECONDS of bars (at least WINDOW of
+    them) from the DB through the selected estimator when it is unavailable, the same history
+    the fetcher seeds with, so horizon estimators see their full horizon.
     """
+    estimator = get_vol_estimator(symbol)
+    snap = read_price_state(symbol)
+    if snap is not None:
+        return snap["spot"], snap["variances"][estimator], int(snap["crypto_id"])
+
     query = """
-        SELECT p.close AS spot_price, cr.crypto_id
+        SELECT p.close AS spot_price, p.high, p.low, p.timestamp, cr.crypto_id
         FROM crypto_prices p
         JOIN cryptocurrencies cr ON p.crypto_id = cr.crypto_id
         WHERE cr.symbol = :symbol
+        AND p.timestamp >= NOW() - make_interval(secs => :seconds)
         ORDER BY p.timestamp DESC
-        LIMIT 50
     """
-    df_spot = pd.read_sql(text(query), engine, params={"symbol": symbol})
-    if df_spot.empty:
+    with engine.connect() as conn:
+        rows = conn.execute(text(query), {"symbol": symbol, "seconds": SEED_SECONDS}).all()
+        if len(rows) < WINDOW:
+            rows = conn.execute(text("""
+                SELECT p.close AS spot_price, p.high, p.low, p.timestamp, cr.crypto_id
+                FROM crypto_prices p
+                JOIN cryptocurrencies cr ON p.crypto_id = cr.crypto_id
+                WHERE cr.symbol = :symbol
+                ORDER BY p.timestamp DESC
+                LIMIT :limit
+            """), {"symbol": symbol, "limit": WINDOW}).all()
+    if not rows:
         raise ValueError(f"No spot prices found for {symbol}")
 
-    latest_spot = df_spot["spot_price"].iloc[0]
+    vol = VolatilitySet([estimator])
+    for row in reversed(rows):
+        close = float(row.spot_price)
+        vol.update_bar(float(row.high or close), float(row.low or close), close, row.timestamp.timestamp())
+    return float(rows[0].spot_price), vol.variance(estimator), int(rows[0].crypto_id)
+
+
+def run_heston_for_symbol(symbol, spreads=0.02, r=0.01, kappa=0.5, theta=0.04, sigma=0.8, rho=-0.7, trace=None):
+    """
+    Fetch latest spot for `symbol`, compute Heston option prices, store in DB.
+    Returns list of market data rows. Stage timings and counters go to `trace`.
+    """
+    trace = trace or Trace(symbol)
+    evals_before = dict(INTEGRAND_EVALS)
+    with trace.span("market_state"):
+        latest_spot, v0, crypto_id = load_market_state(symbol)
     print("LATEST: ",latest_spot)
-    crypto_id = int(df_spot["crypto_id"].iloc[0])
-    log_returns = np.log(df_spot["spot_price"] / df_spot["spot_price"].shift(1)).dropna()
-    v0 = np.var(log_returns)
 
-    instruments = build_instruments(latest_spot, symbol)
+    now = datetime.now(timezone.utc)
+    with trace.span("catalog"), engine.begin() as conn:
+        chain = catalog.chain(conn, symbol, crypto_id, latest_spot, now)
+
+    if catalog.rolled_off.get(symbol):
+        print(f"ℹ️ {symbol}: rolled off {len(catalog.rolled_off[symbol])} expired contracts")
+
+    # Time to expiry for the whole chain in one array; the catalog only returns contracts
+    # live at `now`, the mask just keeps a zero-T contract out of the pricer
+    T = (chain.expiries - now.timestamp()) / SECONDS_PER_YEAR
+    live = np.flatnonzero(T > 0)
+    if not _heston_probs.signatures:
+        # first call in this process loads the kernel from numba's on-disk cache (or compiles it
+        # on a cold cache); keep that out of the pricing span
+        with trace.span("numba_load"):
+            heston_price_vec(latest_spot, latest_spot, 0.1, r, kappa, theta, sigma, rho, v0, True)
+    with trace.span("price"):
+        prices = heston_price_vec(latest_spot, chain.strikes[live], T[live], r, kappa, theta, sigma, rho, v0,
+                                  chain.is_call[live])
+
     market_data = []
-    for inst in instruments:
-        T = inst["expiry_days"] / 365
-        mtm_price = heston_price(latest_spot, inst["strike"], T, r, kappa, theta, sigma, rho, v0, inst["type"])
+    for i, mtm_price in zip(live, prices):
         market_data.append({
-            "instrument": f"{symbol}-{inst['strike']}-{inst['expiry_days']}d-{inst['type']}",
-            "bid": mtm_price*(1-spreads/2),
-            "ask": mtm_price*(1+spreads/2),
+            "instrument": chain.names[i],
+            "instrument_id": int(chain.ids[i]),
+            "mid": float(mtm_price),
             "crypto_id": crypto_id,
-            "strike_price": inst['strike'],
-            "expiry_days": inst['expiry_days'],
-            "option_type": inst['type']
+            "strike_price": float(chain.strikes[i]),
+            "expiration_date": int(chain.expiries[i]),
+            "option_type": chain.option_types[i]
         })
 
-    df_market = pd.DataFrame(market_data)
-    with engine.begin() as conn:
-        for _, row in df_market.iterrows():
-            expiration_timestamp = int((datetime.now() + timedelta(days=row['expiry_days'])).timestamp())
+    # All quotes of the cycle inverted to vols at once, plus the strike x expiry grid
+    with trace.span("iv_surface"):
+        surface = build_surface(
+            symbol, latest_spot, r, now.timestamp(),
+            [row["strike_price"] for row in market_data],
+            [row["expiration_date"] for row in market_data],
+            [row["option_type"] for row in market_data],
+            [row["mid"] for row in market_data],
+        )
+    ivs = surface.pop("quotes")
+
+    # Two-sided quotes from vega, time to expiry and house inventory
+    with trace.span("inventory"), engine.connect() as conn:
+        inventory = house_inventory(conn, [row["instrument"] for row in market_data])
+    with trace.span("quote"):
+        bids, asks = quote_chain(
+            SpreadModel(base=spreads), latest_spot, chain.strikes[live], T[live], r, chain.is_call[live],
+            prices, ivs, [inventory.get(row["instrument"], 0.0) for row in market_data],
+        )
+    for row, iv, bid, ask in zip(market_data, ivs, bids, asks):
+        row["implied_vol"] = iv
+        row["bid"] = float(bid)
+        row["ask"] = float(ask)
+
+    with trace.span("insert"), engine.begin() as conn:
+        if market_data:
             conn.execute(text("""
                 INSERT INTO crypto_options (
-                    instrument_name, timestamp, crypto_id, heston_price, strike_price, expiration_date, option_type
-                ) VALUES (:instrument_name, NOW(), :crypto_id, :price, :strike_price, :expiration_date, :option_type)
+                    instrument_name, timestamp, crypto_id, heston_price, bid_price, ask_price, strike_price,
+                    expiration_date, option_type, implied_vol, instrument_id
+                ) VALUES (:instrument_name, NOW(), :crypto_id, :price, :bid, :ask, :strike_price,
+                          :expiration_date, :option_type, :implied_vol, :instrument_id)
                 ON CONFLICT (instrument_name, timestamp) DO UPDATE
-                SET heston_price = EXCLUDED.heston_price
-            """), {
+                SET heston_price = EXCLUDED.heston_price, bid_price = EXCLUDED.bid_price,
+                    ask_price = EXCLUDED.ask_price, implied_vol = EXCLUDED.implied_vol
+            """), [{
                 "instrument_name": row["instrument"],
                 "crypto_id": row["crypto_id"],
-                "price": (row["bid"] + row["ask"]) / 2,
+                "price": row["mid"],
+                "bid": row["bid"],
+                "ask": row["ask"],
                 "strike_price": row["strike_price"],
-                "expiration_date": expiration_timestamp,
-                "option_type": row["option_type"]
-            })
+                "expiration_date": row["expiration_date"],
+                "option_type": row["option_type"],
+                "implied_vol": row["implied_vol"],
+                "instrument_id": row["instrument_id"]
+            } for row in market_data])
+        conn.execute(UPSERT_SURFACE_SQL, {"symbol": symbol, "surface": json.dumps(surface)})
 
-    return df_market
+    trace.count("contracts", len(market_data))
+    for method, total in INTEGRAND_EVALS.items():
+        trace.count(f"integrand_evals_{method}", total - evals_before[method])
+    return market_data
 
 
-run_heston_for_symbol("ETH")
-run_heston_for_symbol("1INCH")
\ No newline at end of file
+if __name__ == "__main__":
+    traces = []
+    failed = []
+    with profiled("heston_cycle"):
+        for symbol in ("ETH", "1INCH"):
+            trace = Trace(symbol)
+            traces.append(trace)
+            try:
+                run_heston_for_symbol(symbol, trace=trace)
+            except Exception as e:
+                # one symbol failing must not cost the others their cycle
+                failed.append(symbol)
+                print(f"❌ {symbol} pricing failed: {e!r}")
+            finally:
+                print(f"⏱️ {trace.summary()}")
+                # rewritten after every symbol, so a run killed at the pricer timeout keeps what it finished
+                write_traces(traces)
+    if failed:
+        sys.exit(f"pricing failed for {', '.join(failed)}")
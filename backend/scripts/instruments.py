@@ -0,0 +1,184 @@
+import calendar
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# -------------------------
+# Instrument catalog
+# -------------------------
+# Listed contracts live in option_instruments with a stable id, a fixed expiry and the
+# time they were listed. Expiries follow a calendar (weekly and month-end Fridays at
+# 08:00 UTC) instead of rolling "7d" / "30d" buckets, and the strike ladder is only
+# re-centred when spot leaves RECENTER_BAND around the centre it was last built on.
+# Contracts stay listed until they expire, so a name always means the same contract;
+# at expiry they are rolled off the chain and stop accruing quote history.
+STRIKE_RANGE = 0.1  # ladder spans centre +/- 10%
+STRIKE_STEPS = 5  # strikes each side of the centre
+RECENTER_BAND = 0.05
+EXPIRY_HOUR_UTC = 8
+MIN_LISTING_TTE = timedelta(days=2)  # a new weekly is listed at least this far from expiry
+MONTHLY_MIN_TTE = timedelta(days=14)
+OPTION_TYPES = ("call", "put")
+EXPIRED_HISTORY_RETENTION = "30 days"
+
+
+def get_tick_size(spot):
+    if spot < 1: return 0.001
+    elif spot < 100: return 0.1
+    elif spot < 1000: return 1
+    else: return 10
+
+
+def generate_strikes(spot, pct_range=STRIKE_RANGE, num_steps=STRIKE_STEPS):
+    tick_size = get_tick_size(spot)
+    strikes = []
+    for step in range(-num_steps, num_steps + 1):
+        pct = step * (pct_range / num_steps)
+        strike = round(round(spot * (1 + pct) / tick_size) * tick_size, 8)
+        strikes.append(strike)
+    return sorted(list(set(strikes)))
+
+
+def option_instrument_name(symbol: str, strike: float, expiry: int, is_call: bool) -> str:
+    day = datetime.fromtimestamp(expiry, tz=timezone.utc).strftime("%Y%m%d")
+    return f"{symbol}-{strike:g}-{day}-{'call' if is_call else 'put'}"
+
+
+def _friday(day: datetime) -> datetime:
+    """First Friday expiry (08:00 UTC) at or after `day`."""
+    expiry = day.replace(hour=EXPIRY_HOUR_UTC, minute=0, second=0, microsecond=0)
+    expiry += timedelta(days=(4 - expiry.weekday()) % 7)
+    return expiry if expiry >= day else expiry + timedelta(days=7)
+
+
+def _last_friday(year: int, month: int) -> datetime:
+    last = datetime(year, month, calendar.monthrange(year, month)[1], EXPIRY_HOUR_UTC, tzinfo=timezone.utc)
+    return last - timedelta(days=(last.weekday() - 4) % 7)
+
+
+def scheduled_expiries(now: datetime) -> List[int]:
+    """Unix expiries that should be listed at `now`: the next weekly and the next month-end."""
+    weekly = _friday(now + MIN_LISTING_TTE)
+    year, month = now.year, now.month
+    monthly = _last_friday(year, month)
+    while monthly < now + MONTHLY_MIN_TTE:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        monthly = _last_friday(year, month)
+    return sorted({int(weekly.timestamp()), int(monthly.timestamp())})
+
+
+class Chain:
+    """The listed contracts of one symbol as parallel arrays, in instrument_id order."""
+
+    def __init__(self, rows):
+        self.ids = np.array([r.instrument_id for r in rows], dtype=np.int64)
+        self.names = [r.instrument_name for r in rows]
+        self.strikes = np.array([float(r.strike_price) for r in rows])
+        self.expiries = np.array([int(r.expiration_date) for r in rows], dtype=np.int64)
+        self.option_types = [r.option_type for r in rows]
+        self.is_call = np.array([t == "call" for t in self.option_types], dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+LADDER_SQL = text("SELECT center FROM strike_ladders WHERE symbol = :symbol")
+
+UPSERT_LADDER_SQL = text("""
+    INSERT INTO strike_ladders (symbol, center, updated_at)
+    VALUES (:symbol, :center, NOW())
+    ON CONFLICT (symbol) DO UPDATE SET center = EXCLUDED.center, updated_at = EXCLUDED.updated_at
+""")
+
+LIST_INSTRUMENTS_SQL = text("""
+    INSERT INTO option_instruments (instrument_name, symbol, crypto_id, strike_price, expiration_date, option_type)
+    SELECT i.instrument_name, i.symbol, i.crypto_id, i.strike_price, i.expiration_date, i.option_type
+    FROM jsonb_to_recordset(CAST(:instruments AS jsonb)) AS i(
+        instrument_name TEXT, symbol TEXT, crypto_id INTEGER, strike_price NUMERIC, expiration_date BIGINT,
+        option_type TEXT
+    )
+    ON CONFLICT (instrument_name) DO NOTHING
+""")
+
+# Includes contracts past expiry that have not been rolled off yet, so one read tells
+# whether a roll-off is due
+ACTIVE_INSTRUMENTS_SQL = text("""
+    SELECT instrument_id, instrument_name, strike_price, expiration_date, option_type
+    FROM option_instruments
+    WHERE symbol = :symbol AND expired_at IS NULL
+    ORDER BY instrument_id
+""")
+
+# Contracts past expiry leave the chain with the spot they settled against
+ROLL_OFF_SQL = text("""
+    UPDATE option_instruments
+    SET expired_at = NOW(), settlement_spot = :spot
+    WHERE symbol = :symbol AND expired_at IS NULL AND expiration_date <= :now
+    RETURNING instrument_name
+""")
+
+# Per-tick quote history of long-expired contracts is dropped; the catalog row stays
+PRUNE_HISTORY_SQL = text(f"""
+    DELETE FROM crypto_options o
+    USING option_instruments i
+    WHERE o.instrument_id = i.instrument_id
+      AND i.symbol = :symbol
+      AND i.expired_at < NOW() - INTERVAL '{EXPIRED_HISTORY_RETENTION}'
+""")
+
+
+class InstrumentCatalog:
+    """
+    Builds the listed chain of a symbol from option_instruments. The pricer runs as a
+    fresh process every cycle, so nothing is cached between calls; instead a steady-state
+    cycle is two indexed reads (ladder centre, live contracts). Writes only happen when
+    the ladder needs re-centring, a scheduled expiry is not listed yet, or a listed
+    contract has passed its expiry and has to be rolled off.
+    """
+
+    def __init__(self):
+        self.rolled_off: Dict[str, List[str]] = {}  # names expired by the last call, per symbol
+
+    def chain(self, conn: Connection, symbol: str, crypto_id: int, spot: float,
+              now: Optional[datetime] = None) -> Chain:
+        now = now or datetime.now(timezone.utc)
+        params = {"symbol": symbol, "now": int(now.timestamp())}
+        center = conn.execute(LADDER_SQL, {"symbol": symbol}).scalar()
+        center = float(center) if center is not None else None
+        if center is None or abs(spot / center - 1.0) > RECENTER_BAND:
+            center = spot
+            conn.execute(UPSERT_LADDER_SQL, {"symbol": symbol, "center": center})
+
+        rows = conn.execute(ACTIVE_INSTRUMENTS_SQL, params).all()
+        rolled = []
+        if any(int(r.expiration_date) <= params["now"] for r in rows):
+            rolled = [r[0] for r in conn.execute(ROLL_OFF_SQL, {**params, "spot": spot})]
+            conn.execute(PRUNE_HISTORY_SQL, {"symbol": symbol})
+            rows = [r for r in rows if int(r.expiration_date) > params["now"]]
+        self.rolled_off[symbol] = rolled
+
+        listed = {r.instrument_name for r in rows}
+        missing = [
+            {
+                "instrument_name": name,
+                "symbol": symbol,
+                "crypto_id": crypto_id,
+                "strike_price": strike,
+                "expiration_date": expiry,
+                "option_type": option_type,
+            }
+            for expiry in scheduled_expiries(now)
+            for strike in generate_strikes(center)
+            for option_type in OPTION_TYPES
+            for name in [option_instrument_name(symbol, strike, expiry, option_type == "call")]
+            if name not in listed
+        ]
+        if missing:
+            conn.execute(LIST_INSTRUMENTS_SQL, {"instruments": json.dumps(missing)})
+            rows = [r for r in conn.execute(ACTIVE_INSTRUMENTS_SQL, params).all()
+                    if int(r.expiration_date) > params["now"]]
+        return Chain(rows)
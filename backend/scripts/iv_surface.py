@@ -0,0 +1,112 @@
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+from black_scholes import implied_vol
+from volatility import SECONDS_PER_YEAR
+
+# -------------------------
+# Implied-vol surfaces
+# -------------------------
+# After each pricing cycle the Heston quotes of a symbol are inverted in one vectorised
+# pass and stored as a strike x expiry grid. Calls and puts carry the same vol by
+# parity; the grid keeps the out-of-the-money side of each strike.
+UPSERT_SURFACE_SQL = text("""
+    INSERT INTO iv_surfaces (symbol, updated_at, surface)
+    VALUES (:symbol, NOW(), CAST(:surface AS jsonb))
+    ON CONFLICT (symbol) DO UPDATE
+    SET updated_at = EXCLUDED.updated_at, surface = EXCLUDED.surface
+""")
+
+SURFACE_SQL = text("SELECT surface FROM iv_surfaces WHERE symbol = :symbol")
+
+
+def _clean(values: np.ndarray) -> list:
+    return [None if not np.isfinite(v) else float(v) for v in values]
+
+
+def build_surface(symbol: str, spot: float, r: float, as_of: float, strikes, expiries, option_types,
+                  prices) -> Dict[str, Any]:
+    """
+    IV grid from flat per-quote arrays (strike, unix expiry, "call"/"put", price).
+    Also returns "quotes": the implied vol of every input quote, in input order.
+    """
+    strikes = np.asarray(strikes, dtype=float)
+    expiries = np.asarray(expiries, dtype=float)
+    is_call = np.asarray([t == "call" for t in option_types], dtype=bool)
+    T = np.maximum(expiries - as_of, 0.0) / SECONDS_PER_YEAR
+    quote_iv = implied_vol(np.asarray(prices, dtype=float), spot, strikes, T, r, is_call)
+
+    grid_strikes = np.unique(strikes)
+    grid_expiries = np.unique(expiries)
+    grid = np.full((len(grid_expiries), len(grid_strikes)), np.nan)
+    row = np.searchsorted(grid_expiries, expiries)
+    col = np.searchsorted(grid_strikes, strikes)
+    otm = np.where(is_call, strikes * np.exp(-r * T) >= spot, strikes * np.exp(-r * T) < spot)
+    # OTM quote wins; the other side only fills strikes it does not cover
+    for mask in (~otm, otm):
+        keep = mask & np.isfinite(quote_iv)
+        grid[row[keep], col[keep]] = quote_iv[keep]
+
+    return {
+        "symbol": symbol,
+        "spot": float(spot),
+        "asOf": float(as_of),
+        "strikes": grid_strikes.tolist(),
+        "expiries": [int(e) for e in grid_expiries],
+        "tenors": (np.maximum(grid_expiries - as_of, 0.0) / SECONDS_PER_YEAR).tolist(),
+        "iv": [_clean(r) for r in grid],
+        "quotes": _clean(quote_iv),
+    }
+
+
+def interpolate_surface(surface: Dict[str, Any], strikes: Optional[Sequence[float]] = None,
+                        expiries: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """
+    Resample a stored surface onto other strikes (linear in log-moneyness, flat beyond the
+    wings) and/or expiries (linear in total variance, flat vol beyond the ends).
+    """
+    grid_strikes = np.asarray(surface["strikes"], dtype=float)
+    grid_tenors = np.asarray(surface["tenors"], dtype=float)
+    grid = np.array([[np.nan if v is None else v for v in row] for row in surface["iv"]], dtype=float)
+    spot = surface["spot"]
+    out_strikes = grid_strikes if strikes is None else np.asarray(strikes, dtype=float)
+
+    # strikes, per stored expiry
+    by_strike = np.full((len(grid_tenors), len(out_strikes)), np.nan)
+    x_out = np.log(out_strikes / spot)
+    for i, row in enumerate(grid):
+        ok = np.isfinite(row)
+        if ok.any():
+            by_strike[i] = np.interp(x_out, np.log(grid_strikes[ok] / spot), row[ok])
+
+    if expiries is None:
+        out_expiries = np.asarray(surface["expiries"], dtype=float)
+        result = by_strike
+    else:
+        out_expiries = np.asarray(expiries, dtype=float)
+        out_tenors = np.maximum(out_expiries - surface["asOf"], 0.0) / SECONDS_PER_YEAR
+        result = np.full((len(out_tenors), len(out_strikes)), np.nan)
+        for j in range(len(out_strikes)):
+            ok = np.isfinite(by_strike[:, j]) & (grid_tenors > 0)
+            if not ok.any():
+                continue
+            tenors, vols = grid_tenors[ok], by_strike[ok, j]
+            variance = np.interp(out_tenors, tenors, vols * vols * tenors)
+            # flat vol outside the stored expiries rather than flat total variance
+            vol = np.sqrt(np.divide(variance, out_tenors, out=np.full(len(out_tenors), np.nan),
+                                    where=out_tenors > 0))
+            vol = np.where(out_tenors <= tenors[0], vols[0], vol)
+            vol = np.where(out_tenors >= tenors[-1], vols[-1], vol)
+            result[:, j] = vol
+
+    return {
+        "symbol": surface["symbol"],
+        "spot": spot,
+        "asOf": surface["asOf"],
+        "strikes": out_strikes.tolist(),
+        "expiries": [int(e) for e in out_expiries],
+        "iv": [_clean(r) for r in result],
+        "interpolated": strikes is not None or expiries is not None,
+    }
@@ -0,0 +1,507 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from order_book import ASK, BID, BookOrder, OrderBook, book_key, to_decimal
+
+# -------------------------
+# Off-chain matching of option orders
+# -------------------------
+# Taker requests cross resting maker asks at premium <= limit, best premium first and
+# FIFO within a level (price-time priority). Unfilled GTC remainders rest on the bid side
+# and are crossed again whenever a new maker order arrives. Every match produces a
+# FillBundle carrying the fillOrderArgs calls a taker submits to the LimitOrderProtocol.
+# Every fill reserves the matched maker amount (order_reservations) until the fill lands on
+# chain, the taker cancels the request, or MATCH_RESERVATION_SECONDS pass, whichever is first;
+# a fill whose reservation cannot be recorded is not made.
+
+# TakerTraits bits, see TakerTraitsLib.sol
+MAKER_AMOUNT_FLAG = 1 << 255
+ARGS_HAS_TARGET = 1 << 251
+ARGS_EXTENSION_LENGTH_OFFSET = 224
+
+# Interaction target passed in args (the frontend uses the OptionEngine)
+OPTION_ENGINE_ADDRESS = os.environ.get("OPTION_ENGINE_ADDRESS")
+MATCH_LOG_PATH = os.environ.get("MATCH_LOG_PATH")
+MATCH_RESERVATION_SECONDS = float(os.environ.get("MATCH_RESERVATION_SECONDS", "300"))
+
+GTC = "gtc"
+IOC = "ioc"
+
+
+class TakerRequest:
+    __slots__ = ("request_id", "taker", "key", "limit", "amount", "remaining", "tif", "created_at")
+
+    def __init__(self, request_id: str, taker: str, key, limit: Decimal, amount: int, tif: str = GTC,
+                 created_at: Optional[float] = None):
+        self.request_id = request_id
+        self.taker = taker.lower()
+        self.key = key
+        self.limit = limit
+        self.amount = amount
+        self.remaining = amount
+        self.tif = tif
+        self.created_at = created_at if created_at is not None else time.time()
+
+    def as_row(self) -> Dict[str, Any]:
+        """Bid-side entry for the order book."""
+        return {
+            "order_hash": self.request_id,
+            "maker": self.taker,
+            "maker_asset": self.key[0],
+            "taker_asset": self.key[1],
+            "option_type": self.key[2],
+            "option_strike": self.key[3],
+            "option_expiry": self.key[4],
+            "option_premium": self.limit,
+            "making_amount": str(self.remaining),
+        }
+
+
+def split_signature(signature: Optional[str]):
+    """65-byte r|s|v (or 64-byte compact r|vs) hex signature -> (r, vs) as 0x-hex."""
+    if not isinstance(signature, str) or not signature.startswith("0x"):
+        return None, None
+    raw = signature[2:]
+    if len(raw) == 128:
+        return "0x" + raw[:64], "0x" + raw[64:]
+    if len(raw) != 130:
+        return None, None
+    s = int(raw[64:128], 16)
+    v = int(raw[128:130], 16)
+    if v < 27:
+        v += 27
+    vs = s | ((v - 27) << 255)
+    return "0x" + raw[:64], "0x" + format(vs, "064x")
+
+
+class Fill:
+    __slots__ = ("order", "making_amount", "taking_amount", "reserved_until")
+
+    def __init__(self, order: BookOrder, making_amount: int, taking_amount: int, reserved_until: float):
+        self.order = order
+        self.making_amount = making_amount
+        self.taking_amount = taking_amount
+        self.reserved_until = reserved_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        row = self.order.row
+        extension = row.get("extension_data") or "0x"
+        ext_len = (len(extension) - 2) // 2
+        traits = MAKER_AMOUNT_FLAG | (ext_len << ARGS_EXTENSION_LENGTH_OFFSET)
+        args = "0x"
+        if OPTION_ENGINE_ADDRESS:
+            traits |= ARGS_HAS_TARGET
+            args += OPTION_ENGINE_ADDRESS[2:].lower()
+        args += extension[2:]
+        r, vs = split_signature(row.get("signature"))
+        return {
+            "orderHash": self.order.order_hash,
+            "maker": row.get("maker"),
+            "premium": float(self.order.premium),
+            "makingAmount": str(self.making_amount),
+            "takingAmount": str(self.taking_amount),
+            "reservedUntil": int(self.reserved_until),
+            "call": {
+                "method": "fillOrderArgs",
+                "order": [
+                    row.get("salt"), row.get("maker"), row.get("receiver") or row.get("maker"), row.get("maker_asset"),
+                    row.get("taker_asset"), row.get("making_amount"), row.get("taking_amount"), row.get("maker_traits"),
+                ],
+                "r": r,
+                "vs": vs,
+                "amount": str(self.making_amount),
+                "takerTraits": str(traits),
+                "args": args,
+            },
+        }
+
+
+class FillBundle:
+    def __init__(self, request: TakerRequest, fills: List[Fill]):
+        self.request = request
+        self.fills = fills
+        self.created_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        req = self.request
+        return {
+            "requestId": req.request_id,
+            "taker": req.taker,
+            "makerAsset": req.key[0],
+            "takerAsset": req.key[1],
+            "optionType": req.key[2],
+            "optionStrike": float(req.key[3]) if req.key[3] is not None else None,
+            "optionExpiry": req.key[4],
+            "requested": str(req.amount),
+            "filled": str(sum(f.making_amount for f in self.fills)),
+            "remaining": str(req.remaining),
+            "resting": req.remaining > 0 and req.tif == GTC,
+            "fills": [f.to_dict() for f in self.fills],
+            "createdAt": self.created_at,
+        }
+
+
+class EventLog:
+    """Append-only JSONL log of engine inputs (and fills, for verification) that replay() consumes."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.fh = open(path, "a", encoding="utf-8") if path else None
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def append(self, kind: str, **payload) -> None:
+        if self.fh is None:
+            return
+        with self.lock:
+            self.seq += 1
+            self.fh.write(json.dumps({"seq": self.seq, "ts": time.time(), "type": kind, **payload}, default=str) + "\n")
+            self.fh.flush()
+
+    @staticmethod
+    def read(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# (request_id, order_hash, amount) of one released reservation
+Released = Tuple[str, str, int]
+
+
+class _FillRecorder(EventLog):
+    """Log for replay(): keeps the fills the replayed engine makes instead of writing a file."""
+
+    def __init__(self):
+        super().__init__(None)
+        self.fills = []
+
+    def append(self, kind: str, **payload) -> None:
+        if kind == "fill":
+            self.fills.append((payload["request_id"], payload["order_hash"], int(payload["making_amount"])))
+
+
+class ReservationError(Exception):
+    """A fill could not be reserved, so it was not made."""
+
+
+class ReservationStore:
+    """
+    Live reservations per (request_id, order_hash): (amount, reserved_until, taker). Kept
+    in memory, which is enough for replay(); the API process uses DbReservationStore.
+    """
+
+    def __init__(self):
+        self.entries: Dict[Tuple[str, str], Tuple[int, float, str]] = {}
+
+    def reserve(self, request_id: str, taker: str, order_hash: str, amount: int, until: float) -> None:
+        held = self.entries.get((request_id, order_hash), (0,))[0]
+        self.entries[(request_id, order_hash)] = (held + amount, until, taker)
+
+    def release_request(self, request_id: str, taker: str) -> List[Released]:
+        """Drop every reservation `taker` holds under one request; returns what was released."""
+        return self.release([key for key, entry in self.entries.items() if key[0] == request_id and entry[2] == taker])
+
+    def release_expired(self, now: float) -> List[Released]:
+        return self.release([key for key, entry in self.entries.items() if entry[1] <= now])
+
+    def release(self, keys: List[Tuple[str, str]]) -> List[Released]:
+        return [(key[0], key[1], self.entries.pop(key)[0]) for key in keys if key in self.entries]
+
+
+class DbReservationStore(ReservationStore):
+    """Reservations in the order_reservations table, so they survive restarts and reach the indexer."""
+
+    RESERVE_SQL = text("""
+        INSERT INTO order_reservations (request_id, order_hash, taker, amount, reserved_until)
+        VALUES (:request_id, :order_hash, :taker, :amount, :until)
+        ON CONFLICT (request_id, order_hash) DO UPDATE
+        SET amount = order_reservations.amount + EXCLUDED.amount, reserved_until = EXCLUDED.reserved_until
+    """)
+    RELEASE_REQUEST_SQL = text("""
+        DELETE FROM order_reservations WHERE request_id = :request_id AND taker = :taker
+        RETURNING request_id, order_hash, amount
+    """)
+    RELEASE_EXPIRED_SQL = text("""
+        DELETE FROM order_reservations WHERE reserved_until <= :now
+        RETURNING request_id, order_hash, amount
+    """)
+    RESERVED_SQL = text("""
+        SELECT order_hash, SUM(amount) FROM order_reservations
+        WHERE order_hash = ANY(:hashes) AND reserved_until > :now
+        GROUP BY order_hash
+    """)
+
+    def __init__(self, connect: Callable[[], Connection]):
+        super().__init__()
+        self.connect = connect
+
+    def reserve(self, request_id, taker, order_hash, amount, until):
+        with self.connect() as conn:
+            conn.execute(self.RESERVE_SQL, {"request_id": request_id, "order_hash": order_hash, "taker": taker,
+                                            "amount": amount, "until": int(until)})
+            conn.commit()
+
+    def release_request(self, request_id, taker):
+        return self._delete(self.RELEASE_REQUEST_SQL, {"request_id": request_id, "taker": taker})
+
+    def release_expired(self, now):
+        return self._delete(self.RELEASE_EXPIRED_SQL, {"now": int(now)})
+
+    def _delete(self, sql, params: Dict[str, Any]) -> List[Released]:
+        with self.connect() as conn:
+            rows = conn.execute(sql, params).all()
+            conn.commit()
+        return [(request_id, order_hash, int(amount)) for request_id, order_hash, amount in rows]
+
+    def reserved(self, order_hashes: List[str], now: float) -> Dict[str, int]:
+        """Live reserved amount per order hash (orders without one are absent)."""
+        if not order_hashes:
+            return {}
+        with self.connect() as conn:
+            rows = conn.execute(self.RESERVED_SQL, {"hashes": order_hashes, "now": int(now)}).all()
+        return {order_hash: int(amount) for order_hash, amount in rows}
+
+
+class MatchingEngine:
+    def __init__(self, book: OrderBook, log: Optional[EventLog] = None,
+                 reservations: Optional[ReservationStore] = None,
+                 reservation_seconds: float = MATCH_RESERVATION_SECONDS):
+        self.book = book
+        self.log = log or EventLog(None)
+        self.reservations = reservations or ReservationStore()
+        self.reservation_seconds = reservation_seconds
+        self.clock: Callable[[], float] = time.time  # replay() substitutes the logged event times
+        self.requests: Dict[str, TakerRequest] = {}
+        self.bundles: deque = deque(maxlen=10000)
+        self.matched = 0  # number of fills produced
+
+    # ---- maker side ----
+    def on_maker_added(self, order: BookOrder) -> List[FillBundle]:
+        """Cross a newly booked maker ask against resting taker bids."""
+        with self.book.lock:
+            self.log.append("maker_added", row=order.row)
+            return self._cross_bids(order)
+
+    def on_maker_removed(self, order_hash: str) -> None:
+        with self.book.lock:
+            self.log.append("maker_removed", order_hash=order_hash)
+            self.book.remove(order_hash)
+
+    # ---- taker side ----
+    def submit(self, taker: str, maker_asset: str, taker_asset: str, option_type: Optional[str], strike: Any,
+               expiry: Any, max_premium: Any, amount: int, tif: str = GTC,
+               request_id: Optional[str] = None) -> FillBundle:
+        """
+        Raises ReservationError when not even the first fill could be reserved; a failure
+        after that ends crossing early and the request keeps its remainder.
+        """
+        limit = to_decimal(max_premium)
+        if limit is None or amount <= 0:
+            raise ValueError("max premium and a positive amount are required")
+        if tif not in (GTC, IOC):
+            raise ValueError(f"bad time in force {tif!r}")
+        key = book_key(maker_asset, taker_asset, option_type, strike, expiry)
+        with self.book.lock:
+            # ids outlive the process in order_reservations, so they must not repeat after a restart
+            request = TakerRequest(request_id or f"req-{uuid.uuid4().hex}", taker, key, limit, amount, tif)
+            self.log.append("taker_submitted", request_id=request.request_id, taker=request.taker,
+                            key=[str(k) if k is not None else None for k in key], limit=str(limit),
+                            amount=amount, tif=tif)
+            fills = self._cross(request)
+            if request.remaining > 0 and tif == GTC:
+                self.requests[request.request_id] = request
+                self.book.add(request.as_row(), side=BID)
+            return self._emit(request, fills)
+
+    def cancel(self, request_id: str, taker: str) -> bool:
+        """
+        Withdraw `taker`'s resting request and release what its fills reserved, for a taker
+        who will not settle them. False when there was neither.
+        """
+        taker = taker.lower()
+        with self.book.lock:
+            request = self.requests.get(request_id)
+            if request is not None and request.taker == taker:
+                del self.requests[request_id]
+                self.book.remove(request_id)
+            else:
+                request = None
+            released = self.reservations.release_request(request_id, taker)
+            if request is None and not released:
+                return False
+            self.log.append("taker_cancelled", request_id=request_id, taker=taker)
+            self._release(released)
+            return True
+
+    def release_expired(self, now: Optional[float] = None) -> int:
+        """Release reservations whose settlement deadline has passed; returns how many."""
+        now = self.clock() if now is None else now
+        with self.book.lock:
+            released = self.reservations.release_expired(now)
+            if released:
+                self.log.append("reservations_expired", released=released)
+                self._release(released)
+            return len(released)
+
+    # ---- internals ----
+    def _cross(self, request: TakerRequest) -> List[Fill]:
+        asks = self.book.sides.get((request.key, ASK))
+        fills: List[Fill] = []
+        if asks is None:
+            return fills
+        for premium in list(asks.prices):
+            if premium > request.limit or request.remaining == 0:
+                break
+            for order in list(asks.levels.get(premium, {}).values()):
+                if order.amount == 0 or (order.row.get("maker") or "").lower() == request.taker:
+                    continue  # fully reserved, or a self-trade
+                try:
+                    fills.append(self._fill(order, request))
+                except ReservationError as e:
+                    if not fills:
+                        raise
+                    print(f"⚠️ {request.request_id}: crossing stopped after {len(fills)} fills: {e}")
+                    return fills
+                if request.remaining == 0:
+                    break
+        return fills
+
+    def _cross_bids(self, order: BookOrder) -> List[FillBundle]:
+        """Cross maker ask `order` against resting taker bids, best limit first."""
+        bids = self.book.sides.get((order.key, BID))
+        if bids is None or order.premium is None or order.amount == 0:
+            return []
+        bundles = []
+        for limit in list(bids.best_prices()):
+            if limit < order.premium or order.amount == 0:
+                break
+            current = self.book.sides.get((order.key, BID))
+            level = current.levels.get(limit) if current else None
+            if not level:
+                continue
+            for resting in list(level.values()):
+                request = self.requests[resting.order_hash]
+                if request.taker == (order.row.get("maker") or "").lower():
+                    continue
+                try:
+                    fill = self._fill(order, request)
+                except ReservationError as e:
+                    print(f"⚠️ {order.order_hash}: crossing resting bids stopped: {e}")
+                    return bundles
+                self._update_resting(request)
+                bundles.append(self._emit(request, [fill]))
+                if order.amount == 0:
+                    break
+        return bundles
+
+    def _fill(self, order: BookOrder, request: TakerRequest) -> Fill:
+        qty = min(order.amount, request.remaining)
+        making_total = int(order.row.get("making_amount") or 0)
+        taking_total = int(order.row.get("taking_amount") or 0)
+        # AmountCalculatorLib.getTakingAmount rounds up
+        taking = -(-qty * taking_total // making_total) if making_total else 0
+        until = self.clock() + self.reservation_seconds
+        # recorded before the book changes: a fill that cannot be reserved is not made
+        try:
+            self.reservations.reserve(request.request_id, request.taker, order.order_hash, qty, until)
+        except Exception as e:
+            raise ReservationError(f"could not reserve {qty} of {order.order_hash}: {e}") from e
+        order.amount -= qty
+        order.row["reserved_amount"] = str(int(order.row.get("reserved_amount") or 0) + qty)
+        request.remaining -= qty
+        # a fully reserved ask stays booked (and listed) at amount 0 until its fill lands or the
+        # reservation is released
+        self.matched += 1
+        self.log.append("fill", request_id=request.request_id, order_hash=order.order_hash,
+                        making_amount=qty, taking_amount=taking)
+        return Fill(order, qty, taking, until)
+
+    def _release(self, released: List[Released]) -> None:
+        """Give released amounts back to their asks, which may then cross resting bids."""
+        touched = {}
+        for _, order_hash, amount in released:
+            order = self.book.get(order_hash)
+            if order is None or order.side != ASK:
+                continue  # closed or expired meanwhile
+            order.amount += amount
+            order.row["reserved_amount"] = str(max(int(order.row.get("reserved_amount") or 0) - amount, 0))
+            touched[order_hash] = order
+        for order in touched.values():
+            self._cross_bids(order)
+
+    def _update_resting(self, request: TakerRequest) -> None:
+        """Shrink a partially filled bid in place so it keeps its time priority."""
+        if request.remaining > 0:
+            resting = self.book.get(request.request_id)
+            resting.amount = request.remaining
+            resting.row["making_amount"] = str(request.remaining)
+        else:
+            self.requests.pop(request.request_id, None)
+            self.book.remove(request.request_id)
+
+    def _emit(self, request: TakerRequest, fills: List[Fill]) -> FillBundle:
+        bundle = FillBundle(request, fills)
+        if fills:
+            self.bundles.append(bundle)
+        return bundle
+
+    def recent_bundles(self, taker: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        with self.book.lock:
+            out = []
+            for bundle in reversed(self.bundles):
+                if taker and bundle.request.taker != taker.lower():
+                    continue
+                out.append(bundle.to_dict())
+                if len(out) >= limit:
+                    break
+            return out
+
+    # ---- replay ----
+    @classmethod
+    def replay(cls, events) -> "MatchingEngine":
+        """
+        Rebuild engine state from logged inputs on a fresh book, at the logged times (so
+        reservation deadlines come out the same). Raises if the fills the replay produces
+        differ from the fills that were logged.
+        """
+        engine = cls(OrderBook(), _FillRecorder())
+        engine.book.loaded = True
+        expected = []
+        for event in events:
+            kind = event["type"]
+            engine.clock = lambda ts=event["ts"]: ts
+            if kind == "maker_added":
+                engine.on_maker_added(engine.book.add(event["row"]))
+            elif kind == "maker_removed":
+                engine.on_maker_removed(event["order_hash"])
+            elif kind == "taker_submitted":
+                key = event["key"]
+                engine.submit(event["taker"], key[0], key[1], key[2], key[3],
+                              int(key[4]) if key[4] is not None else None,
+                              event["limit"], int(event["amount"]), event["tif"], event["request_id"])
+            elif kind == "taker_cancelled":
+                # logs written before cancels carried the taker only ever cancelled resting requests
+                resting = engine.requests.get(event["request_id"])
+                engine.cancel(event["request_id"], event.get("taker") or (resting.taker if resting else ""))
+            elif kind == "reservations_expired":
+                # released by deadline, which depends on the original process's settings
+                keys = [(request_id, order_hash) for request_id, order_hash, _ in event["released"]]
+                with engine.book.lock:
+                    engine._release(engine.reservations.release(keys))
+            elif kind == "fill":
+                expected.append((event["request_id"], event["order_hash"], int(event["making_amount"])))
+        produced = engine.log.fills
+        if expected and sorted(expected) != sorted(produced):
+            raise RuntimeError(f"replay diverged: {len(produced)} fills produced, {len(expected)} logged")
+        return engine
@@ -0,0 +1,400 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# -------------------------
+# In-memory book of open option orders
+# -------------------------
+# Orders are grouped per instrument key (maker_asset, taker_asset, option_type, strike, expiry)
+# into premium-sorted price levels, FIFO within a level. Maker orders posted through
+# /api/orders sell options, so they rest on the ask side; the bid side holds buy interest.
+BookKey = Tuple[str, str, Optional[str], Optional[Decimal], Optional[int]]
+# Listing position, the same (created_at, id) pair /api/orders pages on
+SortKey = Tuple[datetime, int]
+
+ASK = "ask"
+BID = "bid"
+
+# MakerTraitsLib: expiration timestamp is a uint40 at bit 80 (0 = no expiration)
+MAKER_TRAITS_EXPIRATION_OFFSET = 80
+MAKER_TRAITS_EXPIRATION_MASK = (1 << 40) - 1
+
+
+def to_decimal(value: Any) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    try:
+        return Decimal(str(value)).normalize()
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def sort_key(row: Dict[str, Any]) -> Optional[SortKey]:
+    created_at, row_id = row.get("created_at"), row.get("id")
+    if created_at is None or row_id is None:
+        return None
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return created_at, int(row_id)
+
+
+def _maker(order: "BookOrder") -> str:
+    return (order.row.get("maker") or "").lower()
+
+
+def in_range(value: Any, low: Any, high: Any) -> bool:
+    if low is None and high is None:
+        return True
+    if value is None:
+        return False
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def order_deadline(row: Dict[str, Any]) -> Optional[int]:
+    """Unix time an order stops being fillable: option expiry or makerTraits expiration, whichever is first."""
+    deadlines = []
+    if row.get("option_expiry") is not None:
+        deadlines.append(int(row["option_expiry"]))
+    try:
+        traits = int(str(row.get("maker_traits") or 0), 0)
+    except ValueError:
+        traits = 0
+    expiration = (traits >> MAKER_TRAITS_EXPIRATION_OFFSET) & MAKER_TRAITS_EXPIRATION_MASK
+    if expiration:
+        deadlines.append(expiration)
+    return min(deadlines) if deadlines else None
+
+
+def available_amount(row: Dict[str, Any]) -> int:
+    """
+    Maker amount still open to matching: the on-chain remaining (making_amount until the
+    first fill lands) less what has been matched off-chain and not yet settled.
+    """
+    try:
+        remaining = int(row.get("remaining_amount") or row.get("making_amount") or 0)
+        reserved = int(row.get("reserved_amount") or 0)
+    except ValueError:
+        return 0
+    return max(remaining - reserved, 0)
+
+
+def book_key(maker_asset: str, taker_asset: str, option_type: Optional[str], strike: Any, expiry: Any) -> BookKey:
+    return (
+        maker_asset.lower(),
+        taker_asset.lower(),
+        option_type,
+        to_decimal(strike),
+        int(expiry) if expiry is not None else None,
+    )
+
+
+class BookOrder:
+    __slots__ = ("order_hash", "key", "side", "premium", "amount", "row", "sort_key")
+
+    def __init__(self, order_hash: str, key: BookKey, side: str, premium: Optional[Decimal], amount: int,
+                 row: Dict[str, Any]):
+        self.order_hash = order_hash
+        self.key = key
+        self.side = side
+        self.premium = premium
+        self.amount = amount
+        self.row = row  # serialized exactly as GET /api/orders returns it
+        self.sort_key = sort_key(row)
+
+
+class ExpiryQueue:
+    """Min-heap of (deadline, order_hash) with lazy deletion; `deadlines` holds the live entries."""
+
+    def __init__(self):
+        self.heap: List[Tuple[int, str]] = []
+        self.deadlines: Dict[str, int] = {}
+
+    def push(self, order_hash: str, deadline: int) -> None:
+        self.deadlines[order_hash] = deadline
+        heapq.heappush(self.heap, (deadline, order_hash))
+
+    def discard(self, order_hash: str) -> None:
+        if self.deadlines.pop(order_hash, None) is not None and len(self.heap) > 2 * len(self.deadlines) + 64:
+            # mostly stale entries (orders closed or filled before expiry), rebuild
+            self.heap = [(d, h) for h, d in self.deadlines.items()]
+            heapq.heapify(self.heap)
+
+    def pop_due(self, now: float) -> List[Tuple[str, int]]:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, order_hash = heapq.heappop(self.heap)
+            if self.deadlines.get(order_hash) == deadline:
+                del self.deadlines[order_hash]
+                due.append((order_hash, deadline))
+        return due
+
+    def next_deadline(self) -> Optional[int]:
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def clear(self) -> None:
+        self.heap.clear()
+        self.deadlines.clear()
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+
+class SortedIndex:
+    """
+    (sort_key, order_hash) of booked asks in listing order. A cursor is one bisect away,
+    so every page starts where the previous one stopped rather than rescanning from the newest.
+    """
+
+    def __init__(self):
+        self.entries: List[Tuple[SortKey, str]] = []
+
+    def add(self, order: "BookOrder") -> None:
+        entry = (order.sort_key, order.order_hash)
+        if not self.entries or self.entries[-1] < entry:
+            self.entries.append(entry)  # the usual case: inserts arrive in id order
+        else:
+            insort(self.entries, entry)
+
+    def remove(self, order: "BookOrder") -> None:
+        entry = (order.sort_key, order.order_hash)
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def newest_first(self, before: Optional[SortKey] = None) -> Iterable[str]:
+        """Order hashes newest first, starting strictly before the `before` cursor."""
+        end = len(self.entries) if before is None else bisect_left(self.entries, (before,))
+        for i in range(end - 1, -1, -1):
+            yield self.entries[i][1]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class BookSide:
+    """Premium-sorted price levels; asks best = lowest, bids best = highest."""
+
+    def __init__(self, side: str):
+        self.side = side
+        self.prices: List[Decimal] = []
+        self.levels: Dict[Decimal, "OrderedDict[str, BookOrder]"] = {}
+
+    def add(self, order: BookOrder) -> None:
+        level = self.levels.get(order.premium)
+        if level is None:
+            level = self.levels[order.premium] = OrderedDict()
+            insort(self.prices, order.premium)
+        level[order.order_hash] = order
+
+    def remove(self, order: BookOrder) -> None:
+        level = self.levels.get(order.premium)
+        if level is None or level.pop(order.order_hash, None) is None:
+            return
+        if not level:
+            del self.levels[order.premium]
+            del self.prices[bisect_left(self.prices, order.premium)]
+
+    def best_prices(self) -> Iterable[Decimal]:
+        return reversed(self.prices) if self.side == BID else iter(self.prices)
+
+    def best(self) -> Optional[Decimal]:
+        return next(iter(self.best_prices()), None)
+
+    def depth(self, levels: int) -> List[Dict[str, Any]]:
+        out = []
+        for premium in self.best_prices():
+            if len(out) >= levels:
+                break
+            orders = self.levels[premium]
+            out.append({
+                "premium": float(premium),
+                "amount": str(sum(o.amount for o in orders.values())),
+                "orders": len(orders),
+            })
+        return out
+
+    def __len__(self) -> int:
+        return sum(len(level) for level in self.levels.values())
+
+
+class OrderBook:
+    """
+    Open orders by hash and by instrument key, plus listing indexes of the asks in
+    (created_at, id) order: all of them, per asset pair and per maker (lowercased, like
+    the lower(maker) index the DB listing uses).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.orders: Dict[str, BookOrder] = {}
+        self.listed = SortedIndex()
+        self.by_pair: Dict[Tuple[str, str], SortedIndex] = {}
+        self.by_maker: Dict[str, SortedIndex] = {}
+        self.sides: Dict[Tuple[BookKey, str], BookSide] = {}
+        self.expiries = ExpiryQueue()
+
+    # ---- maintenance ----
+    def add(self, row: Dict[str, Any], side: str = ASK) -> BookOrder:
+        key = book_key(row["maker_asset"], row["taker_asset"], row.get("option_type"),
+                       row.get("option_strike"), row.get("option_expiry"))
+        order = BookOrder(row["order_hash"], key, side, to_decimal(row.get("option_premium")),
+                          available_amount(row), row)
+        with self.lock:
+            self.remove(order.order_hash)
+            self.orders[order.order_hash] = order
+            if side == ASK and order.sort_key is not None:
+                for index in self._indexes(order, create=True):
+                    index.add(order)
+            if order.premium is not None:
+                book_side = self.sides.get((key, side))
+                if book_side is None:
+                    book_side = self.sides[(key, side)] = BookSide(side)
+                book_side.add(order)
+            if side == ASK:
+                deadline = order_deadline(row)
+                if deadline is not None:
+                    self.expiries.push(order.order_hash, deadline)
+        return order
+
+    def remove(self, order_hash: str) -> Optional[BookOrder]:
+        with self.lock:
+            order = self.orders.pop(order_hash, None)
+            if order is None:
+                return None
+            self.expiries.discard(order_hash)
+            if order.side == ASK and order.sort_key is not None:
+                for index in self._indexes(order):
+                    index.remove(order)
+                for indexes, name in ((self.by_pair, order.key[:2]), (self.by_maker, _maker(order))):
+                    if name in indexes and not indexes[name]:
+                        del indexes[name]
+            book_side = self.sides.get((order.key, order.side))
+            if book_side is not None:
+                book_side.remove(order)
+                if not book_side.levels:
+                    del self.sides[(order.key, order.side)]
+            return order
+
+    def _indexes(self, order: BookOrder, create: bool = False) -> List[SortedIndex]:
+        pair, maker = order.key[:2], _maker(order)
+        if create:
+            return [self.listed, self.by_pair.setdefault(pair, SortedIndex()),
+                    self.by_maker.setdefault(maker, SortedIndex())]
+        return [index for index in (self.listed, self.by_pair.get(pair), self.by_maker.get(maker))
+                if index is not None]
+
+    def load(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Replace the book with `rows` (open orders, oldest first)."""
+        with self.lock:
+            self.orders.clear()
+            self.listed = SortedIndex()
+            self.by_pair.clear()
+            self.by_maker.clear()
+            self.sides.clear()
+            self.expiries.clear()
+            for row in rows:
+                self.add(row)
+            self.loaded = True
+            return len(self.orders)
+
+    def pop_expired(self, now: float) -> List[Tuple[str, int]]:
+        """(order_hash, deadline) of booked asks whose deadline is <= now; they stay booked until removed."""
+        with self.lock:
+            return self.expiries.pop_due(now)
+
+    def requeue_expired(self, due: List[Tuple[str, int]]) -> None:
+        """Put back entries from pop_expired() that could not be closed (e.g. DB unavailable)."""
+        with self.lock:
+            for order_hash, deadline in due:
+                if order_hash in self.orders:
+                    self.expiries.push(order_hash, deadline)
+
+    # ---- queries ----
+    def get(self, order_hash: str) -> Optional[BookOrder]:
+        return self.orders.get(order_hash)
+
+    def list(self, maker_asset: Optional[str] = None, taker_asset: Optional[str] = None,
+             option_type: Optional[str] = None, strike: Any = None, expiry: Any = None,
+             limit: int = 50, maker: Optional[str] = None,
+             min_strike: Any = None, max_strike: Any = None,
+             min_expiry: Optional[int] = None, max_expiry: Optional[int] = None,
+             min_premium: Any = None, max_premium: Any = None,
+             before: Optional[SortKey] = None) -> List[Dict[str, Any]]:
+        """
+        Newest-first listing of posted (ask) orders, same ordering as
+        ORDER BY created_at DESC, id DESC. `before` resumes after a (created_at, id) cursor.
+        """
+        strike = to_decimal(strike)
+        expiry = int(expiry) if expiry is not None else None
+        min_strike, max_strike = to_decimal(min_strike), to_decimal(max_strike)
+        min_premium, max_premium = to_decimal(min_premium), to_decimal(max_premium)
+        maker = maker.lower() if maker else None
+        with self.lock:
+            # narrowest index the filters allow; the remaining filters apply to its entries
+            if maker:
+                candidates = self.by_maker.get(maker)
+            elif maker_asset and taker_asset:
+                candidates = self.by_pair.get((maker_asset.lower(), taker_asset.lower()))
+            else:
+                candidates = self.listed
+            out = []
+            for order_hash in candidates.newest_first(before) if candidates is not None else ():
+                order = self.orders[order_hash]
+                key = order.key
+                if maker_asset and key[0] != maker_asset.lower():
+                    continue
+                if taker_asset and key[1] != taker_asset.lower():
+                    continue
+                if option_type and key[2] != option_type:
+                    continue
+                if strike is not None and key[3] != strike:
+                    continue
+                if expiry is not None and key[4] != expiry:
+                    continue
+                if not (in_range(key[3], min_strike, max_strike) and in_range(key[4], min_expiry, max_expiry)
+                        and in_range(order.premium, min_premium, max_premium)):
+                    continue
+                out.append(order.row)
+                if len(out) >= limit:
+                    break
+            return out
+
+    def books(self, maker_asset: Optional[str] = None, taker_asset: Optional[str] = None,
+              option_type: Optional[str] = None, strike: Any = None, expiry: Any = None,
+              levels: int = 10) -> List[Dict[str, Any]]:
+        """Best bid/ask and depth for every instrument key matching the filters."""
+        wanted = (
+            maker_asset.lower() if maker_asset else None,
+            taker_asset.lower() if taker_asset else None,
+            option_type,
+            to_decimal(strike),
+            int(expiry) if expiry is not None else None,
+        )
+        with self.lock:
+            keys = sorted({key for key, _ in self.sides
+                           if all(w is None or w == k for w, k in zip(wanted, key))},
+                          key=lambda k: (k[0], k[1], k[2] or "", k[3] or 0, k[4] or 0))
+            out = []
+            for key in keys:
+                asks = self.sides.get((key, ASK)) or BookSide(ASK)
+                bids = self.sides.get((key, BID)) or BookSide(BID)
+                best_ask, best_bid = asks.best(), bids.best()
+                out.append({
+                    "makerAsset": key[0],
+                    "takerAsset": key[1],
+                    "optionType": key[2],
+                    "optionStrike": float(key[3]) if key[3] is not None else None,
+                    "optionExpiry": key[4],
+                    "bestBid": float(best_bid) if best_bid is not None else None,
+                    "bestAsk": float(best_ask) if best_ask is not None else None,
+                    "bids": bids.depth(levels),
+                    "asks": asks.depth(levels),
+                })
+            return out
@@ -0,0 +1,333 @@
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from eth_hash.auto import keccak
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature
+
+# -------------------------
+# Order hash / signature verification (LimitOrderProtocol v4, OrderLib.sol)
+# -------------------------
+# The maker signs the EIP-712 typed hash of the Order struct; the LimitOrderProtocol
+# recovers the signer from it and requires it to be the maker. Orders whose hash or
+# signature would not survive that check are rejected before they reach the book.
+LOP_NAME = "1inch Limit Order Protocol"
+LOP_VERSION = "4"
+CHAIN_ID = int(os.environ.get("CHAIN_ID", "84532"))
+LIMIT_ORDER_PROTOCOL = os.environ.get("LIMIT_ORDER_PROTOCOL", "0xEA4C65C75debD5Ce0F87BdDE8d55a0a57aC43088")
+
+# "enforce" rejects bad orders, "warn" only logs them, "off" skips verification
+ORDER_VERIFICATION = os.environ.get("ORDER_VERIFICATION", "enforce")
+VERIFY_WORKERS = int(os.environ.get("ORDER_VERIFY_WORKERS", str(min(4, os.cpu_count() or 1))))
+VERIFY_CACHE_SIZE = int(os.environ.get("ORDER_VERIFY_CACHE_SIZE", "100000"))
+VERIFY_CHUNK = 32  # orders per worker task
+
+ORDER_TYPEHASH = keccak(
+    b"Order(uint256 salt,address maker,address receiver,address makerAsset,address takerAsset,"
+    b"uint256 makingAmount,uint256 takingAmount,uint256 makerTraits)"
+)
+DOMAIN_TYPEHASH = keccak(
+    b"EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+)
+
+# secp256k1n / 2, ECDSA.recover rejects malleable high-s signatures
+S_UPPER_BOUND = 0x7FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF5D576E7357A4501DDFE92F46681B20A0
+
+# (salt, maker, receiver, makerAsset, takerAsset, makingAmount, takingAmount, makerTraits)
+OrderTuple = Tuple[int, str, str, str, str, int, int, int]
+
+
+def _uint(value: Any) -> int:
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    number = int(value, 16) if value.lower().startswith("0x") else int(value)
+    if number < 0 or number >= 1 << 256:
+        raise ValueError("out of uint256 range")
+    return number
+
+
+def _address(value: Any) -> bytes:
+    if not isinstance(value, str) or not value.startswith("0x") or len(value) != 42:
+        raise ValueError("not a hex address")
+    return bytes.fromhex(value[2:])
+
+
+def _word(value: int) -> bytes:
+    return value.to_bytes(32, "big")
+
+
+def encode_order(order: OrderTuple) -> bytes:
+    """abi.encode of the Order struct (eight static 32-byte words)."""
+    salt, maker, receiver, maker_asset, taker_asset, making, taking, traits = order
+    return b"".join((
+        _word(salt),
+        _address(maker).rjust(32, b"\0"),
+        _address(receiver).rjust(32, b"\0"),
+        _address(maker_asset).rjust(32, b"\0"),
+        _address(taker_asset).rjust(32, b"\0"),
+        _word(making),
+        _word(taking),
+        _word(traits),
+    ))
+
+
+def domain_separator(chain_id: int = CHAIN_ID, verifying_contract: str = LIMIT_ORDER_PROTOCOL) -> bytes:
+    return keccak(
+        DOMAIN_TYPEHASH
+        + keccak(LOP_NAME.encode())
+        + keccak(LOP_VERSION.encode())
+        + _word(chain_id)
+        + _address(verifying_contract).rjust(32, b"\0")
+    )
+
+
+def order_hash(order: OrderTuple, domain: bytes) -> bytes:
+    """OrderLib.hash: the EIP-712 digest the maker signs."""
+    return keccak(b"\x19\x01" + domain + keccak(ORDER_TYPEHASH + encode_order(order)))
+
+
+def abi_order_hash(order: OrderTuple) -> bytes:
+    """keccak256(abi.encode(order)), the id the frontend posts as orderHash."""
+    return keccak(encode_order(order))
+
+
+def recover_signer(digest: bytes, signature: str) -> Optional[str]:
+    """Signer of `digest` from a 65-byte r|s|v or 64-byte r|vs (EIP-2098) hex signature."""
+    raw = bytes.fromhex(signature[2:] if signature.startswith("0x") else signature)
+    if len(raw) == 65:
+        r, s, v = int.from_bytes(raw[:32], "big"), int.from_bytes(raw[32:64], "big"), raw[64]
+    elif len(raw) == 64:
+        r, vs = int.from_bytes(raw[:32], "big"), int.from_bytes(raw[32:], "big")
+        s, v = vs & ((1 << 255) - 1), 27 + (vs >> 255)
+    else:
+        return None
+    if v >= 27:
+        v -= 27
+    if v not in (0, 1) or s > S_UPPER_BOUND:
+        return None
+    try:
+        public_key = keys.Signature(vrs=(v, r, s)).recover_public_key_from_msg_hash(digest)
+    except (BadSignature, ValueError):
+        return None
+    return public_key.to_canonical_address().hex()
+
+
+def order_tuple(row: Dict[str, Any], receiver: Optional[str] = None) -> OrderTuple:
+    """Order struct from an orders row; without a stored receiver the frontend signs receiver = maker."""
+    return (
+        _uint(row["salt"]),
+        row["maker"],
+        receiver or row.get("receiver") or row["maker"],
+        row["maker_asset"],
+        row["taker_asset"],
+        _uint(row["making_amount"]),
+        _uint(row["taking_amount"]),
+        _uint(row["maker_traits"]),
+    )
+
+
+def verify_one(row: Dict[str, Any], receiver: Optional[str], domain: bytes) -> Optional[str]:
+    """None if the order checks out, otherwise the reason it does not."""
+    try:
+        order = order_tuple(row, receiver)
+        digest = order_hash(order, domain)
+    except (KeyError, ValueError, TypeError) as e:
+        return f"Unsignable order: {e}"
+
+    claimed = str(row.get("order_hash") or "").lower()
+    if claimed not in ("0x" + digest.hex(), "0x" + abi_order_hash(order).hex()):
+        return "orderHash does not match order fields"
+
+    signature = row.get("signature")
+    if not isinstance(signature, str) or not signature:
+        return "Missing signature"
+    try:
+        signer = recover_signer(digest, signature)
+    except ValueError:
+        return "Malformed signature"
+    if signer is None:
+        return "Invalid signature"
+    if signer != row["maker"][2:].lower():
+        return "Signature is not from maker"
+    return None
+
+
+def verify_chunk(items: Sequence[Tuple[Dict[str, Any], Optional[str]]], domain: bytes) -> List[Optional[str]]:
+    """Worker entry point (module level so process pools can pickle it)."""
+    return [verify_one(row, receiver, domain) for row, receiver in items]
+
+
+# -------------------------
+# Taker requests (POST /api/match and its cancel)
+# -------------------------
+# A match reserves maker liquidity, so the taker signs the request: an EIP-191 personal
+# message with one "name: value" line per field (strings as sent, other JSON values
+# re-encoded, missing ones empty) under an "OpEx <action>" header, ending in a deadline.
+MATCH_FIELDS = ("taker", "makerAsset", "takerAsset", "optionType", "optionStrike", "optionExpiry",
+                "maxPremium", "amount", "timeInForce", "deadline")
+CANCEL_FIELDS = ("taker", "requestId", "deadline")
+
+
+def taker_message(action: str, body: Dict[str, Any], fields: Sequence[str]) -> bytes:
+    def render(value: Any) -> str:
+        if value is None:
+            return ""
+        return value if isinstance(value, str) else json.dumps(value)
+    return "\n".join([f"OpEx {action}"] + [f"{name}: {render(body.get(name))}" for name in fields]).encode()
+
+
+def personal_digest(message: bytes) -> bytes:
+    """Digest eth_sign / personal_sign produce for `message`."""
+    return keccak(b"\x19Ethereum Signed Message:\n" + str(len(message)).encode() + message)
+
+
+def verify_taker_message(message: bytes, signature: Any, taker: str) -> Optional[str]:
+    """None if `taker` signed `message`, otherwise the reason (worker entry point)."""
+    if not isinstance(signature, str) or not signature:
+        return "Missing signature"
+    try:
+        signer = recover_signer(personal_digest(message), signature)
+    except ValueError:
+        return "Malformed signature"
+    if signer is None:
+        return "Invalid signature"
+    if signer != taker[2:].lower():
+        return "Signature is not from taker"
+    return None
+
+
+class OrderVerifier:
+    """
+    Verifies orders on a worker pool with an LRU of results keyed by (orderHash, signature).
+    Use a process pool under threaded serving (pure-Python ECDSA holds the GIL) and a
+    thread pool under gevent/eventlet, where extra processes do not mix with the hub.
+    """
+
+    def __init__(self, mode: str = ORDER_VERIFICATION, workers: int = VERIFY_WORKERS,
+                 cache_size: int = VERIFY_CACHE_SIZE, pool: str = "process",
+                 chain_id: int = CHAIN_ID, verifying_contract: str = LIMIT_ORDER_PROTOCOL):
+        if mode not in ("enforce", "warn", "off"):
+            raise ValueError(f"bad ORDER_VERIFICATION {mode!r}")
+        self.mode = mode
+        self.workers = workers
+        self.pool = pool
+        self.domain = domain_separator(chain_id, verifying_contract)
+        self.cache: "OrderedDict[Tuple[str, str], Optional[str]]" = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.executor: Optional[Executor] = None
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def _executor(self) -> Executor:
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    if self.pool == "process":
+                        # the server is threaded (scheduler, socket.io, request threads); forking it
+                        # can copy a lock some other thread holds, so workers start fresh
+                        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                            mp_context=multiprocessing.get_context("spawn"))
+                    else:
+                        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    def chain_hash(self, row: Dict[str, Any], receiver: Optional[str] = None) -> Optional[str]:
+        """EIP-712 hash the protocol emits for this order, or None if it cannot be encoded."""
+        try:
+            return "0x" + order_hash(order_tuple(row, receiver), self.domain).hex()
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    def verify(self, row: Dict[str, Any], receiver: Optional[str] = None) -> Optional[str]:
+        return self.verify_many([(row, receiver)])[0]
+
+    def verify_many(self, items: Sequence[Tuple[Dict[str, Any], Optional[str]]]) -> List[Optional[str]]:
+        """
+        Reasons per item (None = accepted, or always None in "warn"/"off" mode).
+        Cache misses are verified in VERIFY_CHUNK-sized tasks across the pool.
+        """
+        if self.mode == "off":
+            return [None] * len(items)
+        results: List[Optional[str]] = [None] * len(items)
+        pending: List[int] = []
+        with self.lock:
+            for i, (row, receiver) in enumerate(items):
+                key = self._key(row, receiver)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    results[i] = self.cache[key]
+                    self.hits += 1
+                else:
+                    pending.append(i)
+            self.misses += len(pending)
+
+        if pending:
+            chunks = [pending[i:i + VERIFY_CHUNK] for i in range(0, len(pending), VERIFY_CHUNK)]
+            # single orders go through the pool too: inline they would hold the GIL, and concurrent
+            # posts would verify one after another instead of in parallel
+            executor = self._executor()
+            futures = [executor.submit(verify_chunk, [items[i] for i in chunk], self.domain) for chunk in chunks]
+            outcomes = [f.result() for f in futures]
+            with self.lock:
+                for chunk, reasons in zip(chunks, outcomes):
+                    for i, reason in zip(chunk, reasons):
+                        results[i] = reason
+                        self.cache[self._key(*items[i])] = reason
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        rejected = [r for r in results if r]
+        if rejected:
+            with self.lock:
+                self.rejected += len(rejected)
+        if self.mode == "warn":
+            for (row, _), reason in zip(items, results):
+                if reason:
+                    print(f"⚠️ order {row.get('order_hash')} failed verification: {reason}")
+            return [None] * len(items)
+        return results
+
+    def verify_taker(self, message: bytes, signature: Any, taker: str) -> Optional[str]:
+        """Taker request signature check on the pool; same modes as orders."""
+        if self.mode == "off":
+            return None
+        reason = self._executor().submit(verify_taker_message, message, signature, taker).result()
+        if reason:
+            with self.lock:
+                self.rejected += 1
+            if self.mode == "warn":
+                print(f"⚠️ taker request from {taker} failed verification: {reason}")
+                return None
+        return reason
+
+    @staticmethod
+    def _key(row: Dict[str, Any], receiver: Optional[str]) -> Tuple[str, str]:
+        # every signed field is part of the key, so a cached verdict cannot vouch for altered amounts
+        fields = (row.get("signature"), receiver, row.get("salt"), row.get("maker"), row.get("maker_asset"),
+                  row.get("taker_asset"), row.get("making_amount"), row.get("taking_amount"), row.get("maker_traits"))
+        return str(row.get("order_hash") or "").lower(), "|".join(str(f or "").lower() for f in fields)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "pool": self.pool,
+                "workers": self.workers,
+                "cached": len(self.cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+            }
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
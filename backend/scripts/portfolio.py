@@ -0,0 +1,202 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from black_scholes import bs_greeks, bs_price
+from price_state import read_price_state
+from volatility import SECONDS_PER_YEAR
+
+# -------------------------
+# Holdings valuation
+# -------------------------
+# Positions are marked against the newest Heston quote for the same symbol, option type
+# and strike (exact instrument name first, then nearest expiry), all in one query.
+# Positions with no live quote fall back to a Black-Scholes mark at the realised vol.
+RISK_FREE_RATE = 0.01  # same r the pricer uses
+GREEKS_ESTIMATOR = "rv_24h"  # annualised, see volatility.ESTIMATORS
+DEFAULT_VOL = 0.8
+QUOTE_MAX_AGE = "10 minutes"
+PORTFOLIO_CACHE_TTL = 60.0  # upper bound; new quotes invalidate sooner
+
+_LATEST_QUOTES = f"""
+    quotes AS (
+        SELECT DISTINCT ON (instrument_name)
+            instrument_name, heston_price, strike_price, expiration_date, option_type, timestamp,
+            split_part(instrument_name, '-', 1) AS symbol
+        FROM crypto_options
+        WHERE timestamp > NOW() - INTERVAL '{QUOTE_MAX_AGE}'
+        ORDER BY instrument_name, timestamp DESC
+    )
+"""
+
+_MATCH_QUOTE = """
+    LEFT JOIN LATERAL (
+        SELECT q.heston_price, q.timestamp
+        FROM quotes q
+        WHERE q.symbol = split_part(h.instrument_name, '-', 1)
+          AND q.option_type = h.option_type
+          AND q.strike_price = h.strike_price
+        ORDER BY (q.instrument_name = h.instrument_name) DESC, abs(q.expiration_date - h.expiry_date)
+        LIMIT 1
+    ) q ON TRUE
+"""
+
+HOLDINGS_SQL = text(f"""
+    WITH {_LATEST_QUOTES}
+    SELECT h.id, h.user_address, h.instrument_name, h.quantity, h.expiry_date, h.strike_price, h.option_type,
+           split_part(h.instrument_name, '-', 1) AS symbol,
+           q.heston_price AS mark, q.timestamp AS quoted_at, cost.avg_premium
+    FROM holdings h
+    {_MATCH_QUOTE}
+    LEFT JOIN LATERAL (
+        SELECT AVG(o.option_premium) AS avg_premium
+        FROM option_positions p
+        JOIN orders o ON o.chain_order_hash = p.order_hash
+        WHERE p.owner = h.user_address AND p.instrument_name = h.instrument_name AND NOT p.exercised
+    ) cost ON TRUE
+    WHERE h.user_address = :user
+    ORDER BY h.expiry_date, h.instrument_name
+""")
+
+# Refreshes holdings.current_price for every position after a pricing cycle
+UPDATE_MARKS_SQL = text(f"""
+    WITH {_LATEST_QUOTES},
+    marks AS (
+        SELECT h.id, q.heston_price
+        FROM holdings h
+        {_MATCH_QUOTE}
+        WHERE q.heston_price IS NOT NULL
+    )
+    UPDATE holdings h
+    SET current_price = m.heston_price, updated_at = CURRENT_TIMESTAMP
+    FROM marks m
+    WHERE h.id = m.id AND h.current_price IS DISTINCT FROM m.heston_price
+""")
+
+
+def market_inputs(conn: Connection, symbols: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+    """(spot, annualised vol) per symbol from the fetcher's shared state, else the last DB close."""
+    out = {}
+    for symbol in set(symbols):
+        snap = read_price_state(symbol)
+        if snap is not None:
+            variance = snap["variances"].get(GREEKS_ESTIMATOR) or 0.0
+            out[symbol] = (snap["spot"], float(np.sqrt(variance)) if variance > 0 else DEFAULT_VOL)
+            continue
+        row = conn.execute(text("""
+            SELECT p.close FROM crypto_prices p
+            JOIN cryptocurrencies c ON c.crypto_id = p.crypto_id
+            WHERE c.symbol = :symbol
+            ORDER BY p.timestamp DESC LIMIT 1
+        """), {"symbol": symbol}).first()
+        if row is not None:
+            out[symbol] = (float(row[0]), DEFAULT_VOL)
+    return out
+
+
+def value_portfolio(rows: List[Any], market: Dict[str, Tuple[float, float]],
+                    now: Optional[float] = None) -> Dict[str, Any]:
+    """Marks, P&L and Greeks for all positions at once; returns {"holdings": [...], "summary": {...}}."""
+    now = time.time() if now is None else now
+    n = len(rows)
+    qty = np.array([float(r.quantity) for r in rows])
+    strike = np.array([float(r.strike_price) for r in rows])
+    expiry = np.array([float(r.expiry_date) for r in rows])
+    is_call = np.array([r.option_type == "call" for r in rows], dtype=bool)
+    quoted = np.array([r.mark is not None for r in rows], dtype=bool)
+    mark = np.array([float(r.mark) if r.mark is not None else np.nan for r in rows])
+    cost = np.array([float(r.avg_premium) if r.avg_premium is not None else np.nan for r in rows])
+    spot = np.array([market.get(r.symbol, (np.nan, DEFAULT_VOL))[0] for r in rows])
+    vol = np.array([market.get(r.symbol, (np.nan, DEFAULT_VOL))[1] for r in rows])
+    T = np.maximum(expiry - now, 0.0) / SECONDS_PER_YEAR
+
+    if n:
+        model = bs_price(spot, strike, T, RISK_FREE_RATE, vol, is_call)
+        mark = np.where(quoted, mark, model)
+        greeks = bs_greeks(spot, strike, T, RISK_FREE_RATE, vol, is_call)
+    else:
+        greeks = {k: np.zeros(0) for k in ("delta", "gamma", "vega", "theta", "rho")}
+    mark = np.nan_to_num(mark)
+    has_cost = ~np.isnan(cost)
+    basis = np.where(has_cost, cost, mark)
+    value = qty * mark
+    pnl = qty * (mark - basis)
+    pnl_pct = np.divide(mark - basis, basis, out=np.zeros(n), where=basis != 0) * 100.0
+    position_greeks = {k: np.nan_to_num(v) * qty for k, v in greeks.items()}
+
+    holdings = []
+    for i, r in enumerate(rows):
+        holdings.append({
+            "id": str(r.id),
+            "instrumentName": r.instrument_name,
+            "quantity": qty[i],
+            "expiryDate": datetime.fromtimestamp(expiry[i], tz=timezone.utc).isoformat(),
+            "strikePrice": strike[i],
+            "type": r.option_type,
+            "averagePrice": basis[i],
+            "currentPrice": mark[i],
+            "markSource": "heston" if quoted[i] else "model",
+            "pnl": pnl[i],
+            "pnlPercentage": pnl_pct[i],
+            "greeks": {k: v[i] for k, v in position_greeks.items()},
+        })
+
+    total_value = float(value.sum())
+    total_cost = float((qty * basis).sum())
+    total_pnl = float(pnl.sum())
+    return {
+        "holdings": holdings,
+        "summary": {
+            "netWorth": total_value,
+            "totalHoldings": n,
+            "totalPnl": total_pnl,
+            "totalPnlPercentage": total_pnl / total_cost * 100.0 if total_cost else 0.0,
+            "greeks": {k: float(v.sum()) for k, v in position_greeks.items()},
+            "unquoted": int(n - quoted.sum()),
+        },
+    }
+
+
+class PortfolioCache:
+    """
+    Valued portfolios per user. bump() after every pricing cycle invalidates all entries
+    at once (version check); invalidate() drops users whose holdings changed.
+    """
+
+    def __init__(self, ttl: float = PORTFOLIO_CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.entries: Dict[str, Tuple[int, float, Dict[str, Any]]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self) -> None:
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+
+    def invalidate(self, users: Iterable[str]) -> None:
+        with self.lock:
+            for user in users:
+                self.entries.pop(user.lower(), None)
+
+    def get(self, user: str) -> Tuple[Optional[Dict[str, Any]], int]:
+        """(cached payload or None, version to store a freshly computed payload under)."""
+        with self.lock:
+            entry = self.entries.get(user)
+            if entry is not None and entry[0] == self.version and time.time() - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[2], self.version
+            self.misses += 1
+            return None, self.version
+
+    def put(self, user: str, version: int, payload: Dict[str, Any]) -> None:
+        with self.lock:
+            if version == self.version:  # quotes did not move while we were computing
+                self.entries[user] = (version, time.time(), payload)
@@ -0,0 +1,162 @@
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+from volatility import DEFAULT_ESTIMATOR, ESTIMATOR_NAMES, LEGACY_WINDOW, VolatilitySet
+
+WINDOW = LEGACY_WINDOW
+STALE_AFTER = 30  # seconds without a tick before readers fall back to the DB
+SEED_SECONDS = 24 * 60 * 60  # history replayed at fetcher startup, covers the longest estimator horizon
+
+
+class PriceState:
+    """Latest spot plus every streaming variance estimate for one symbol."""
+
+    def __init__(self, symbol: str, crypto_id: int):
+        self.symbol = symbol
+        self.crypto_id = crypto_id
+        self.vol = VolatilitySet()
+        self.spot: Optional[float] = None
+        self.ts: float = 0.0
+        self.samples = 0
+
+    def update(self, price: float, ts: float) -> bool:
+        """Feed one tick. Returns False for repeated/out-of-order publish times."""
+        if ts <= self.ts:
+            return False
+        self.vol.update(price, ts)
+        if self.spot is not None:
+            self.samples += 1
+        self.spot = price
+        self.ts = ts
+        return True
+
+    def update_bar(self, high: float, low: float, close: float, ts: float) -> bool:
+        """Feed one stored bar (seeding from crypto_prices); same ordering rule as update()."""
+        if ts <= self.ts:
+            return False
+        self.vol.update_bar(high, low, close, ts)
+        if self.spot is not None:
+            self.samples += 1
+        self.spot = close
+        self.ts = ts
+        return True
+
+    def v0(self, estimator: str = DEFAULT_ESTIMATOR) -> float:
+        return self.vol.variance(estimator)
+
+
+# -------------------------
+# Shared-memory publication
+# -------------------------
+# Layout: seq (u64) | crypto_id (i64) | spot | ts | samples (u64)
+#         | bar start | bar open | bar high | bar low | one double per ESTIMATOR_NAMES
+# seq is a seqlock: odd while the writer is mid-update, readers retry until stable.
+SHM_PREFIX = "opex_price_"
+_HEADER = struct.Struct("<Q")
+_PAYLOAD = struct.Struct("<qddQdddd" + "d" * len(ESTIMATOR_NAMES))
+_SIZE = _HEADER.size + _PAYLOAD.size
+
+
+def _shm_name(symbol: str) -> str:
+    return f"{SHM_PREFIX}{symbol.lower()}"
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: stop the resource tracker from unlinking a segment we don't own
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedPriceState:
+    """Single-writer (fetch_price.py), many-reader view of a PriceState."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._seq = _HEADER.unpack_from(shm.buf, 0)[0]
+
+    @classmethod
+    def create(cls, symbol: str) -> "SharedPriceState":
+        name = _shm_name(symbol)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_SIZE)
+        except FileExistsError:
+            # left behind by a previous fetcher that died; take it over
+            stale = shared_memory.SharedMemory(name=name)
+            stale.unlink()
+            stale.close()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=_SIZE)
+        shm.buf[:_SIZE] = bytes(_SIZE)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, symbol: str) -> Optional["SharedPriceState"]:
+        try:
+            return cls(_attach(_shm_name(symbol)), owner=False)
+        except FileNotFoundError:
+            return None
+
+    def publish(self, state: PriceState, bar=None) -> None:
+        """Publish `state` and, optionally, the in-progress bars.Bar for the same symbol."""
+        buf = self.shm.buf
+        variances = state.vol.snapshot()
+        bar_fields = (bar.start, bar.open, bar.high, bar.low) if bar is not None else (0.0, 0.0, 0.0, 0.0)
+        self._seq += 1
+        _HEADER.pack_into(buf, 0, self._seq)
+        _PAYLOAD.pack_into(buf, _HEADER.size, state.crypto_id, state.spot or 0.0, state.ts, state.samples,
+                           *bar_fields, *(variances[name] for name in ESTIMATOR_NAMES))
+        self._seq += 1
+        _HEADER.pack_into(buf, 0, self._seq)
+
+    def read(self, retries: int = 100) -> Optional[Dict[str, Any]]:
+        buf = self.shm.buf
+        for _ in range(retries):
+            before = _HEADER.unpack_from(buf, 0)[0]
+            if before % 2:
+                continue
+            crypto_id, spot, ts, samples, bar_start, bar_open, bar_high, bar_low, *variances = \
+                _PAYLOAD.unpack_from(buf, _HEADER.size)
+            if _HEADER.unpack_from(buf, 0)[0] == before:
+                if before == 0:
+                    return None  # nothing published yet
+                bar = None
+                if bar_start:
+                    bar = {"start": bar_start, "open": bar_open, "high": bar_high, "low": bar_low, "close": spot}
+                return {
+                    "crypto_id": crypto_id,
+                    "spot": spot,
+                    "ts": ts,
+                    "samples": samples,
+                    "bar": bar,
+                    "variances": dict(zip(ESTIMATOR_NAMES, variances)),
+                }
+        return None
+
+    def close(self) -> None:
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def read_price_state(symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    O(1) snapshot of the fetcher's state for `symbol`, or None if the fetcher is not
+    running, has not warmed up, or has gone quiet for more than STALE_AFTER seconds.
+    """
+    shared = SharedPriceState.attach(symbol)
+    if shared is None:
+        return None
+    try:
+        snap = shared.read()
+    finally:
+        shared.close()
+    if not snap or snap["samples"] < 1 or time.time() - snap["ts"] > STALE_AFTER:
+        return None
+    return snap
@@ -0,0 +1,67 @@
+import os
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from black_scholes import bs_greeks
+
+# -------------------------
+# Quote publication
+# -------------------------
+# After pricing, every contract of the chain gets a two-sided quote in one vectorised
+# pass. The half-spread is a base fraction of mid plus a vol-point charge on vega, widened
+# into expiry; the midpoint is skewed against house inventory (the opposite of what users
+# hold), so a short house quotes higher to buy back and a long house quotes lower.
+QUOTE_BASE_SPREAD = float(os.environ.get("QUOTE_BASE_SPREAD", "0.02"))  # full spread as a fraction of mid
+QUOTE_VEGA_EDGE = float(os.environ.get("QUOTE_VEGA_EDGE", "0.005"))  # half-spread in vol points x vega
+QUOTE_TTE_WIDEN = float(os.environ.get("QUOTE_TTE_WIDEN", "1.0"))  # extra multiple at expiry
+QUOTE_TTE_DECAY_DAYS = float(os.environ.get("QUOTE_TTE_DECAY_DAYS", "2"))
+QUOTE_INVENTORY_SKEW = float(os.environ.get("QUOTE_INVENTORY_SKEW", "0.001"))  # vol points x vega per contract
+QUOTE_MAX_SKEW = 0.75  # of the half-spread
+QUOTE_MIN_HALF_SPREAD = 1e-8
+
+INVENTORY_SQL = text("""
+    SELECT instrument_name, -SUM(quantity) AS inventory
+    FROM holdings
+    WHERE instrument_name = ANY(:names)
+    GROUP BY instrument_name
+""")
+
+
+class SpreadModel:
+    def __init__(self, base: float = QUOTE_BASE_SPREAD, vega_edge: float = QUOTE_VEGA_EDGE,
+                 tte_widen: float = QUOTE_TTE_WIDEN, tte_decay_days: float = QUOTE_TTE_DECAY_DAYS,
+                 inventory_skew: float = QUOTE_INVENTORY_SKEW, max_skew: float = QUOTE_MAX_SKEW):
+        self.base = base
+        self.vega_edge = vega_edge
+        self.tte_widen = tte_widen
+        self.tte_decay = tte_decay_days / 365
+        self.inventory_skew = inventory_skew
+        self.max_skew = max_skew
+
+    def quote(self, mid, vega, T, inventory) -> Tuple[np.ndarray, np.ndarray]:
+        """Bid and ask arrays for per-contract mid, vega (per 1.00 vol), T in years and house inventory."""
+        mid, vega, T, inventory = (np.asarray(a, dtype=float) for a in (mid, vega, T, inventory))
+        vega = np.nan_to_num(vega)
+        half = 0.5 * self.base * mid + self.vega_edge * vega
+        half *= 1.0 + self.tte_widen * np.exp(-np.maximum(T, 0.0) / self.tte_decay)
+        half = np.maximum(half, QUOTE_MIN_HALF_SPREAD)
+        skew = np.clip(-self.inventory_skew * inventory * vega, -self.max_skew * half, self.max_skew * half)
+        bid = np.maximum(mid - half + skew, 0.0)
+        ask = mid + half + skew
+        return bid, ask
+
+
+def house_inventory(conn: Connection, names: Sequence[str]) -> Dict[str, float]:
+    return {r.instrument_name: float(r.inventory) for r in conn.execute(INVENTORY_SQL, {"names": list(names)})}
+
+
+def quote_chain(model: SpreadModel, spot: float, strikes, T, r: float, is_call, mids, ivs,
+                inventory) -> Tuple[np.ndarray, np.ndarray]:
+    """Vega from each quote's own implied vol, then bid/ask for the whole chain."""
+    ivs = np.array([np.nan if v is None else v for v in ivs], dtype=float)
+    known = np.isfinite(ivs)
+    vega = np.where(known, bs_greeks(spot, strikes, T, r, np.where(known, ivs, 1.0), is_call)["vega"], 0.0)
+    return model.quote(mids, vega, T, inventory)
@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import text
+
+from db import get_engine
+from volatility import SECONDS_PER_YEAR
+
+# -------------------------
+# Scenario risk
+# -------------------------
+# Every holdings position is revalued with the Heston pricer across a spot x vol shock
+# grid and across historical daily moves. Positions are collapsed to unique contracts
+# first, so the number of prices is contracts x scenarios, not positions x scenarios.
+HESTON_PARAMS = {"r": 0.01, "kappa": 0.5, "theta": 0.04, "sigma": 0.8, "rho": -0.7}  # run_heston_for_symbol defaults
+SPOT_SHOCKS = np.round(np.arange(-0.30, 0.301, 0.05), 2)  # relative spot moves
+VOL_SHOCKS = np.array([-0.5, -0.25, 0.0, 0.25, 0.5, 1.0])  # relative moves in vol; v0 scales by (1 + shock)^2
+VAR_LEVELS = (0.95, 0.99)
+VAR_LOOKBACK_DAYS = int(os.environ.get("RISK_VAR_LOOKBACK_DAYS", "365"))
+RISK_WORKERS = int(os.environ.get("RISK_WORKERS", str(min(4, os.cpu_count() or 1))))
+RISK_CHUNK = 20000  # prices per worker task
+RISK_INTERVAL = int(os.environ.get("RISK_INTERVAL", "300"))
+RISK_RETENTION = "7 days"
+HOUSE = "house"
+
+# heston_model (numba, scipy, its own engine) is imported where it is used, so the API
+# process can import the constants and SQL above without paying for the pricer.
+
+POSITIONS_SQL = text("""
+    SELECT user_address, instrument_name, split_part(instrument_name, '-', 1) AS symbol,
+           quantity, strike_price, expiry_date, option_type
+    FROM holdings
+    WHERE quantity <> 0
+""")
+
+# Last close per calendar day and symbol
+DAILY_CLOSES_SQL = text("""
+    SELECT DISTINCT ON (c.symbol, date_trunc('day', p.timestamp))
+        c.symbol, date_trunc('day', p.timestamp) AS day, p.close
+    FROM crypto_prices p
+    JOIN cryptocurrencies c ON c.crypto_id = p.crypto_id
+    WHERE c.symbol = ANY(:symbols)
+      AND p.timestamp > NOW() - make_interval(days => :days)
+    ORDER BY c.symbol, date_trunc('day', p.timestamp), p.timestamp DESC
+""")
+
+
+def _price_chunk(S, K, T, v0, is_call):
+    """Worker entry point (module level so the process pool can pickle it)."""
+    from heston_model import heston_price_vec
+    return heston_price_vec(S, K, T, v0=v0, is_call=is_call, **HESTON_PARAMS)
+
+
+def price_points(S, K, T, v0, is_call, executor: Optional[ProcessPoolExecutor] = None) -> np.ndarray:
+    """Heston prices for flat arrays of points, split into RISK_CHUNK-sized tasks across the pool."""
+    n = len(S)
+    if executor is None or n <= RISK_CHUNK:
+        return _price_chunk(S, K, T, v0, is_call)
+    bounds = range(0, n, RISK_CHUNK)
+    futures = [executor.submit(_price_chunk, S[i:i + RISK_CHUNK], K[i:i + RISK_CHUNK], T[i:i + RISK_CHUNK],
+                               v0[i:i + RISK_CHUNK], is_call[i:i + RISK_CHUNK]) for i in bounds]
+    return np.concatenate([f.result() for f in futures])
+
+
+def daily_returns(conn, symbols: Sequence[str], days: int = VAR_LOOKBACK_DAYS) -> np.ndarray:
+    """(scenarios x symbols) daily log returns; days where a symbol has no close contribute 0 for it."""
+    rows = conn.execute(DAILY_CLOSES_SQL, {"symbols": list(symbols), "days": days}).all()
+    dates = sorted({r.day for r in rows})
+    if len(dates) < 2:
+        return np.zeros((0, len(symbols)))
+    row_of = {d: i for i, d in enumerate(dates)}
+    col_of = {s: j for j, s in enumerate(symbols)}
+    closes = np.full((len(dates), len(symbols)), np.nan)
+    for r in rows:
+        closes[row_of[r.day], col_of[r.symbol]] = float(r.close)
+    returns = np.diff(np.log(closes), axis=0)
+    return np.nan_to_num(returns, nan=0.0)
+
+
+def var_es(pnl: np.ndarray, level: float) -> Dict[str, float]:
+    """Historical VaR and expected shortfall (both reported as positive losses)."""
+    if pnl.size == 0:
+        return {"var": 0.0, "es": 0.0}
+    cutoff = np.quantile(pnl, 1.0 - level)
+    tail = pnl[pnl <= cutoff]
+    return {"var": float(max(-cutoff, 0.0)), "es": float(max(-tail.mean(), 0.0))}
+
+
+def run_risk(conn, now: Optional[float] = None, workers: int = RISK_WORKERS) -> Dict[str, Dict[str, Any]]:
+    """Risk reports keyed by user address, plus HOUSE for the sum over every user's positions."""
+    now = datetime.now(timezone.utc).timestamp() if now is None else now
+    rows = conn.execute(POSITIONS_SQL).all()
+    if not rows:
+        return {}
+
+    # unique contracts and per-position index into them
+    contracts: Dict[tuple, int] = {}
+    contract_idx = np.empty(len(rows), dtype=np.int64)
+    users: Dict[str, int] = {}
+    user_idx = np.empty(len(rows), dtype=np.int64)
+    for i, r in enumerate(rows):
+        key = (r.symbol, float(r.strike_price), int(r.expiry_date), r.option_type == "call")
+        contract_idx[i] = contracts.setdefault(key, len(contracts))
+        user_idx[i] = users.setdefault(r.user_address.lower(), len(users))
+    qty = np.array([float(r.quantity) for r in rows])
+
+    from heston_model import load_market_state
+    symbols = sorted({k[0] for k in contracts})
+    market = {}
+    for symbol in symbols:
+        try:
+            spot, v0, _ = load_market_state(symbol)
+            market[symbol] = (spot, v0)
+        except ValueError as e:
+            print(f"⚠️ risk: {e}, positions skipped")
+    keys = list(contracts)
+    priced = np.array([k[0] in market for k in keys])
+    spot = np.array([market.get(k[0], (np.nan, 0.0))[0] for k in keys])
+    v0 = np.array([market.get(k[0], (np.nan, 0.0))[1] for k in keys])
+    strike = np.array([k[1] for k in keys])
+    T = np.maximum(np.array([k[2] for k in keys]) - now, 0.0) / SECONDS_PER_YEAR
+    is_call = np.array([k[3] for k in keys])
+
+    returns = daily_returns(conn, symbols)
+    sym_col = np.array([symbols.index(k[0]) for k in keys], dtype=np.int64)
+
+    # point layout: base | spot x vol grid | historical days, all for every contract
+    n_c, n_s, n_v, n_h = len(keys), len(SPOT_SHOCKS), len(VOL_SHOCKS), len(returns)
+    grid_s = spot[:, None, None] * (1.0 + SPOT_SHOCKS)[None, :, None]
+    grid_v = v0[:, None, None] * ((1.0 + VOL_SHOCKS) ** 2)[None, None, :]
+    hist_s = spot[:, None] * np.exp(returns[:, sym_col].T)
+    S = np.concatenate([spot, np.broadcast_to(grid_s, (n_c, n_s, n_v)).ravel(), hist_s.ravel()])
+    V = np.concatenate([v0, np.broadcast_to(grid_v, (n_c, n_s, n_v)).ravel(), np.repeat(v0, n_h)])
+    K = np.concatenate([strike, np.repeat(strike, n_s * n_v), np.repeat(strike, n_h)])
+    TT = np.concatenate([T, np.repeat(T, n_s * n_v), np.repeat(T, n_h)])
+    C = np.concatenate([is_call, np.repeat(is_call, n_s * n_v), np.repeat(is_call, n_h)])
+    ok = np.isfinite(S)
+
+    values = np.zeros(len(S))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and ok.sum() > RISK_CHUNK else None
+    try:
+        values[ok] = price_points(S[ok], K[ok], TT[ok], V[ok], C[ok], pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    base = values[:n_c]
+    grid = values[n_c:n_c * (1 + n_s * n_v)].reshape(n_c, n_s, n_v) - base[:, None, None]
+    hist = values[n_c * (1 + n_s * n_v):].reshape(n_c, n_h) - base[:, None]
+
+    # positions -> per-user sums
+    live = priced[contract_idx]
+    n_u = len(users)
+    value_u = np.zeros(n_u)
+    grid_u = np.zeros((n_u, n_s, n_v))
+    hist_u = np.zeros((n_u, n_h))
+    np.add.at(value_u, user_idx[live], qty[live] * base[contract_idx[live]])
+    np.add.at(grid_u, user_idx[live], qty[live, None, None] * grid[contract_idx[live]])
+    np.add.at(hist_u, user_idx[live], qty[live, None] * hist[contract_idx[live]])
+    positions_u = np.bincount(user_idx, minlength=n_u)
+    unpriced_u = np.bincount(user_idx[~live], minlength=n_u)
+
+    as_of = datetime.fromtimestamp(now, tz=timezone.utc).isoformat()
+
+    def report(scope, positions, unpriced, value, surface, scenario_pnl):
+        worst = np.unravel_index(np.argmin(surface), surface.shape)
+        return {
+            "scope": scope,
+            "asOf": as_of,
+            "positions": int(positions),
+            "unpriced": int(unpriced),
+            "value": float(value),
+            "spotShocks": SPOT_SHOCKS.tolist(),
+            "volShocks": VOL_SHOCKS.tolist(),
+            "pnl": surface.tolist(),  # [spot shock][vol shock]
+            "worst": {"spotShock": float(SPOT_SHOCKS[worst[0]]), "volShock": float(VOL_SHOCKS[worst[1]]),
+                      "pnl": float(surface[worst])},
+            "var": {f"{int(level * 100)}": var_es(scenario_pnl, level) for level in VAR_LEVELS},
+            "scenarios": int(n_h),
+        }
+
+    reports = {user: report(user, positions_u[j], unpriced_u[j], value_u[j], grid_u[j], hist_u[j])
+               for user, j in users.items()}
+    reports[HOUSE] = report(HOUSE, len(rows), unpriced_u.sum(), value_u.sum(), grid_u.sum(axis=0), hist_u.sum(axis=0))
+    return reports
+
+
+def store_reports(reports: Dict[str, Dict[str, Any]]) -> None:
+    with get_engine().begin() as conn:
+        if reports:
+            conn.execute(text("""
+                INSERT INTO risk_reports (scope, run_at, report)
+                SELECT r.scope, NOW(), r.report
+                FROM jsonb_to_recordset(CAST(:reports AS jsonb)) AS r(scope TEXT, report JSONB)
+            """), {"reports": json.dumps([{"scope": s, "report": r} for s, r in reports.items()])})
+        conn.execute(text(f"DELETE FROM risk_reports WHERE run_at < NOW() - INTERVAL '{RISK_RETENTION}'"))
+
+
+LATEST_REPORT_SQL = text("""
+    SELECT report FROM risk_reports
+    WHERE scope = :scope
+    ORDER BY run_at DESC
+    LIMIT 1
+""")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Revalue all holdings across shock and historical scenarios")
+    parser.add_argument("--workers", type=int, default=RISK_WORKERS)
+    parser.add_argument("--no-store", action="store_true", help="print the house report instead of saving")
+    args = parser.parse_args(argv)
+
+    started = datetime.now(timezone.utc)
+    with get_engine().connect() as conn:
+        reports = run_risk(conn, workers=args.workers)
+    elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+    if args.no_store:
+        print(json.dumps(reports.get(HOUSE), indent=2))
+    else:
+        store_reports(reports)
+    house = reports.get(HOUSE)
+    if house:
+        print(f"✅ risk: {house['positions']} positions, {len(reports) - 1} users, "
+              f"{house['scenarios']} historical scenarios in {elapsed:.1f}s")
+    else:
+        print("ℹ️ risk: no open holdings")
+
+
+if __name__ == "__main__":
+    main()
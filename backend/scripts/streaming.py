@@ -0,0 +1,186 @@
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from flask import Response, jsonify
+from sqlalchemy.engine import Connection
+
+from metrics import REGISTRY
+
+# -------------------------
+# Streaming query results
+# -------------------------
+# Large result sets are read from a server-side cursor in STREAM_BATCH_ROWS partitions
+# and written out as a chunked JSON array, so neither the rows nor the encoded body are
+# ever held in full. Results that fit in STREAM_MIN_ROWS are answered with a normal
+# buffered jsonify() (Content-Length, compressed as a whole).
+#
+# Every streamed query runs under a QueryBudget of rows and encoded bytes. Going over it
+# before the response has started is a 413; afterwards the stream is aborted, so the
+# client sees a failed transfer rather than a silently truncated array.
+STREAM_MIN_ROWS = int(os.environ.get("STREAM_MIN_ROWS", "5000"))
+STREAM_BATCH_ROWS = int(os.environ.get("STREAM_BATCH_ROWS", "1000"))
+STREAM_CHUNK_BYTES = 64 * 1024
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "2000000"))
+QUERY_MAX_BYTES = int(os.environ.get("QUERY_MAX_BYTES", str(512 * 1024 * 1024)))
+
+BUDGET_EXCEEDED = REGISTRY.counter("query_budget_exceeded_total", "Requests stopped by their row or byte budget",
+                                   ["kind"])
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, kind: str, limit: int):
+        super().__init__(f"Result exceeds the {limit} {kind} per-request limit")
+        self.kind = kind
+        self.limit = limit
+        BUDGET_EXCEEDED.inc(kind=kind)
+
+
+class QueryBudget:
+    """Rows and encoded bytes one request may produce."""
+
+    def __init__(self, max_rows: int = QUERY_MAX_ROWS, max_bytes: int = QUERY_MAX_BYTES):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+
+    def add_rows(self, n: int) -> None:
+        self.rows += n
+        if self.rows > self.max_rows:
+            raise BudgetExceeded("rows", self.max_rows)
+
+    def add_bytes(self, n: int) -> None:
+        self.bytes += n
+        if self.bytes > self.max_bytes:
+            raise BudgetExceeded("bytes", self.max_bytes)
+
+
+def stream_rows(connect: Callable[[], Connection], query, params: Optional[Dict[str, Any]] = None,
+                budget: Optional[QueryBudget] = None) -> Iterator[Mapping]:
+    """
+    Row mappings of `query` off a server-side cursor, STREAM_BATCH_ROWS at a time. The
+    connection is held until the generator is exhausted or closed.
+    """
+    with connect() as conn:
+        result = conn.execution_options(yield_per=STREAM_BATCH_ROWS).execute(query, params or {})
+        for partition in result.mappings().partitions():
+            if budget is not None:
+                budget.add_rows(len(partition))
+            yield from partition
+
+
+class RowStream:
+    """A streamed query with its first `head` rows fetched, to tell small results from large ones."""
+
+    def __init__(self, connect: Callable[[], Connection], query, params: Optional[Dict[str, Any]] = None,
+                 head: int = STREAM_MIN_ROWS, budget: Optional[QueryBudget] = None):
+        self.budget = budget or QueryBudget()
+        self.rows = stream_rows(connect, query, params, self.budget)
+        try:
+            self.head = list(islice(self.rows, head))
+        except BudgetExceeded:
+            self.rows.close()
+            raise
+        self.complete = len(self.head) < head
+        if self.complete:
+            self.rows.close()
+
+    def __bool__(self) -> bool:
+        return bool(self.head)
+
+    def __iter__(self) -> Iterator[Mapping]:
+        yield from self.head
+        if not self.complete:
+            yield from self.rows
+
+    def close(self) -> None:
+        self.rows.close()
+
+
+def batched(rows: Iterable, size: int) -> Iterator[List]:
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _default(obj: Any) -> Any:
+    # same conversions as app.convert_value, for rows passed through unconverted
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+_encode = json.JSONEncoder(separators=(",", ":"), default=_default).encode
+
+
+def json_array_chunks(items: Iterable[Any], envelope: Optional[Dict[str, Any]] = None, key: str = "data",
+                      count_key: Optional[str] = None, budget: Optional[QueryBudget] = None) -> Iterator[str]:
+    """
+    A JSON array (or `envelope` with the array under `key`, plus the item count under
+    `count_key`) encoded incrementally in ~STREAM_CHUNK_BYTES pieces.
+    """
+    if envelope:
+        head = _encode(envelope)[:-1] + f",{_encode(key)}:["
+    else:
+        head = "["
+    parts, size, count = [head], len(head), 0
+    # one encoder call per batch of rows rather than per row
+    for batch in batched(items, STREAM_BATCH_ROWS):
+        encoded = _encode(batch)[1:-1]
+        if count:
+            encoded = "," + encoded
+        parts.append(encoded)
+        size += len(encoded)
+        count += len(batch)
+        if size >= STREAM_CHUNK_BYTES:
+            if budget is not None:
+                budget.add_bytes(size)
+            yield "".join(parts)
+            parts, size = [], 0
+    if envelope:
+        tail = "]" + (f",{_encode(count_key)}:{count}" if count_key else "") + "}"
+    else:
+        tail = "]"
+    parts.append(tail)
+    if budget is not None:
+        budget.add_bytes(size + len(tail))
+    yield "".join(parts)
+
+
+def rows_response(stream: RowStream, convert: Callable[[Mapping], Dict[str, Any]] = dict,
+                  envelope: Optional[Dict[str, Any]] = None, key: str = "data",
+                  count_key: Optional[str] = None) -> Response:
+    """jsonify() for small results, a chunked JSON body straight off the cursor for large ones."""
+    if stream.complete:
+        data = [convert(r) for r in stream.head]
+        if envelope is None:
+            response = jsonify(data)
+        else:
+            body = {**envelope, key: data}
+            if count_key:
+                body[count_key] = len(data)
+            response = jsonify(body)
+        stream.budget.add_bytes(response.content_length or 0)
+        return response
+
+    def generate() -> Iterator[str]:
+        try:
+            yield from json_array_chunks((convert(r) for r in stream), envelope, key, count_key, stream.budget)
+        except BudgetExceeded as e:
+            print(f"⚠️ streamed response aborted: {e}")
+            raise
+        finally:
+            stream.close()
+
+    return Response(generate(), mimetype="application/json")
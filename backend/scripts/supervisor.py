@@ -0,0 +1,187 @@
+"""
+Background job supervision for the API process.
+
+SupervisedJob wraps a periodic APScheduler job: at most one run at a time, every run is
+checked against a deadline (its current interval), and the interval backs off when runs
+overrun and eases back to the base rate once they fit again. ProcessSupervisor keeps a
+long-running subprocess (the price fetcher) alive, restarting it with exponential
+backoff when it exits. Both report a health() dict for GET /jobs/health.
+"""
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from apscheduler.schedulers.base import BaseScheduler
+
+# -------------------------
+# Configuration
+# -------------------------
+JOB_BACKOFF = float(os.environ.get("JOB_BACKOFF", "1.5"))  # interval multiplier per overrun
+JOB_HEADROOM = 1.2  # an overrunning job is rescheduled to at least this x its last duration
+JOB_RECOVER = 0.5  # a run shorter than this fraction of the interval lets it shrink again
+JOB_STALE_INTERVALS = 5  # unhealthy when nothing finished for this many intervals
+FETCHER_CHECK_SECONDS = float(os.environ.get("FETCHER_CHECK_SECONDS", "2"))
+RESTART_BACKOFF_MIN = float(os.environ.get("RESTART_BACKOFF_MIN", "1"))
+RESTART_BACKOFF_MAX = float(os.environ.get("RESTART_BACKOFF_MAX", "60"))
+RESTART_STABLE_SECONDS = 60.0  # uptime after which the backoff resets
+
+
+class SupervisedJob:
+    """
+    A periodic job with an overlap guard, deadline accounting and an adaptive interval.
+    The interval only ever moves between `interval` and `max_interval`.
+    """
+
+    def __init__(self, scheduler: BaseScheduler, job_id: str, func: Callable[[], Any], interval: float,
+                 max_interval: Optional[float] = None):
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.func = func
+        self.base_interval = interval
+        self.max_interval = max_interval or interval * 10
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        scheduler.add_job(func=self.run, trigger="interval", seconds=interval, id=job_id,
+                          max_instances=1, coalesce=True)
+
+    def run(self) -> None:
+        if not self.lock.acquire(blocking=False):
+            self.skipped += 1
+            return
+        started = time.time()
+        try:
+            if self.last_started is not None:
+                # how late this run started relative to the schedule it was on
+                self.last_lag = max(0.0, started - self.last_started - self.interval)
+            self.last_started = started
+            self.func()
+            self.consecutive_failures = 0
+            self.last_error = None
+        except Exception as e:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = str(e)
+            print(f"❌ {self.job_id} failed: {e}")
+        finally:
+            self.last_finished = time.time()
+            self.last_duration = self.last_finished - started
+            self.runs += 1
+            self._adapt(self.last_duration)
+            self.lock.release()
+
+    def _adapt(self, duration: float) -> None:
+        interval = self.interval
+        if duration > interval:
+            self.overruns += 1
+            interval = min(self.max_interval, max(interval * JOB_BACKOFF, duration * JOB_HEADROOM))
+        elif duration < interval * JOB_RECOVER and interval > self.base_interval:
+            interval = max(self.base_interval, interval / JOB_BACKOFF)
+        if interval != self.interval:
+            print(f"ℹ️ {self.job_id}: interval {self.interval:.2f}s -> {interval:.2f}s "
+                  f"(last run {duration:.2f}s)")
+            self.interval = interval
+            self.scheduler.reschedule_job(self.job_id, trigger="interval", seconds=interval)
+
+    def missed(self) -> None:
+        """A run APScheduler dropped (misfire, or the previous run still going)."""
+        self.skipped += 1
+
+    def health(self) -> Dict[str, Any]:
+        now = time.time()
+        stale = self.last_finished is not None and now - self.last_finished > JOB_STALE_INTERVALS * self.interval
+        return {
+            "healthy": not stale and self.consecutive_failures < JOB_STALE_INTERVALS,
+            "interval": self.interval,
+            "baseInterval": self.base_interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "running": self.lock.locked(),
+            "lastStarted": self.last_started,
+            "lastDuration": self.last_duration,
+            "lastLag": self.last_lag,
+            "lastError": self.last_error,
+        }
+
+
+class ProcessSupervisor:
+    """Keeps one subprocess running; check() restarts it with exponential backoff after it exits."""
+
+    def __init__(self, name: str, args: List[str]):
+        self.name = name
+        self.args = args
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF_MIN
+        self.started_at: Optional[float] = None
+        self.next_start = 0.0
+        self.last_exit: Optional[int] = None
+
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        with self.lock:
+            if self.running():
+                print(f"ℹ️ {self.name} already running")
+                return
+            self._spawn()
+
+    def _spawn(self) -> None:
+        self.process = subprocess.Popen(self.args)
+        self.started_at = time.time()
+        print(f"✅ {self.name} started (pid {self.process.pid})")
+
+    def check(self) -> None:
+        with self.lock:
+            if self.process is None:
+                return
+            code = self.process.poll()
+            now = time.time()
+            if code is None:
+                if self.started_at is not None and now - self.started_at > RESTART_STABLE_SECONDS:
+                    self.backoff = RESTART_BACKOFF_MIN
+                return
+            if self.started_at is not None:
+                # first time we see this exit: schedule the restart
+                self.last_exit = code
+                self.started_at = None
+                self.next_start = now + self.backoff
+                print(f"❌ {self.name} exited with {code}, restarting in {self.backoff:.1f}s")
+                self.backoff = min(RESTART_BACKOFF_MAX, self.backoff * 2)
+            if now >= self.next_start:
+                self.restarts += 1
+                self._spawn()
+
+    def stop(self) -> None:
+        with self.lock:
+            if self.running():
+                self.process.terminate()
+            self.process = None
+
+    def health(self) -> Dict[str, Any]:
+        running = self.running()
+        return {
+            "healthy": running,
+            "running": running,
+            "pid": self.process.pid if running else None,
+            "uptime": time.time() - self.started_at if running and self.started_at else None,
+            "restarts": self.restarts,
+            "lastExit": self.last_exit,
+            "nextRestartIn": None if running or self.process is None else max(0.0, self.next_start - time.time()),
+        }
@@ -0,0 +1,138 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# -------------------------
+# Pricing-cycle traces
+# -------------------------
+# The pricer runs as a short-lived subprocess, so each cycle writes its per-stage spans and
+# counters to TRACE_PATH and the API process folds them into /metrics after the run.
+TRACE_PATH = os.environ.get("PRICER_TRACE_PATH", os.path.join(tempfile.gettempdir(), "opex_pricer_trace.json"))
+
+# Profiling: HESTON_PROFILE=cprofile dumps a pstats file (snakeviz / flameprof), =sample dumps
+# folded stacks for flamegraph.pl / speedscope. HESTON_PROFILE_RATE samples a fraction of cycles.
+PROFILE_MODE = os.environ.get("HESTON_PROFILE", "")
+PROFILE_RATE = float(os.environ.get("HESTON_PROFILE_RATE", "1"))
+PROFILE_DIR = os.environ.get("HESTON_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.environ.get("HESTON_PROFILE_INTERVAL", "0.005"))
+
+
+class Trace:
+    """Ordered stage timings and counters for one unit of work (one symbol's cycle)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append({"stage": stage, "seconds": time.perf_counter() - started})
+
+    def count(self, name: str, amount: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def total(self) -> float:
+        return sum(s["seconds"] for s in self.spans)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "started": self.started, "spans": self.spans, "counters": self.counters}
+
+    def summary(self) -> str:
+        stages = " ".join(f"{s['stage']}={s['seconds'] * 1000:.1f}ms" for s in self.spans)
+        return f"{self.name}: {self.total() * 1000:.1f}ms [{stages}]"
+
+
+def write_traces(traces: List[Trace], path: str = TRACE_PATH) -> None:
+    """Atomically replace the trace file so a reader never sees a partial write."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".trace-")
+    with os.fdopen(fd, "w") as f:
+        json.dump([t.to_dict() for t in traces], f)
+    os.replace(tmp, path)
+
+
+def read_traces(path: str = TRACE_PATH, newer_than: float = 0.0) -> List[Dict[str, Any]]:
+    """Traces written after `newer_than` (unix time), or [] if there are none."""
+    try:
+        if os.path.getmtime(path) < newer_than:
+            return []
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+# -------------------------
+# Profiling
+# -------------------------
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every `interval` seconds into folded-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profiled(name: str, mode: Optional[str] = None, rate: Optional[float] = None) -> Iterator[None]:
+    """Profile the enclosed block when profiling is switched on (and this cycle is sampled)."""
+    mode = PROFILE_MODE if mode is None else mode
+    rate = PROFILE_RATE if rate is None else rate
+    if mode not in ("cprofile", "sample") or random.random() >= rate:
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    if mode == "cprofile":
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            path = os.path.join(PROFILE_DIR, f"{name}-{stamp}.prof")
+            profile.dump_stats(path)
+            print(f"ℹ️ cProfile written to {path}")
+    else:
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stopped.set()
+            sampler.join()
+            path = os.path.join(PROFILE_DIR, f"{name}-{stamp}.folded")
+            with open(path, "w") as f:
+                f.write(sampler.folded())
+            print(f"ℹ️ folded stacks written to {path} ({sum(sampler.stacks.values())} samples)")
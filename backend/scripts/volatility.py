@@ -0,0 +1,246 @@
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# -------------------------
+# Streaming variance estimators
+# -------------------------
+# Every estimator consumes ticks one at a time through update(price, ts) in O(1)
+# (amortised for the time-based windows) and reports variance().
+# "window" keeps the legacy per-sample figure (np.var of the last 49 log returns), so its
+# scale follows the tick spacing; all other estimators, "window_annual" included, report
+# annualised variance, the same units as Heston's theta, whatever the spacing of the ticks
+# (live ~2.5s publishes or 10s bar closes replayed from the DB).
+SECONDS_PER_YEAR = 365 * 24 * 3600
+
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with a running mean / sum of squared deviations.
+    push() is O(1); variance() matches np.var (ddof=0) over the buffered values.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buf: List[float] = [0.0] * size
+        self.head = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self._since_resync = 0
+
+    def push(self, x: float) -> None:
+        if self.count < self.size:
+            self.buf[self.head] = x
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.buf[self.head]
+            self.buf[self.head] = x
+            old_mean = self.mean
+            self.mean += (x - old) / self.size
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+        self.head = (self.head + 1) % self.size
+
+        # Sliding updates accumulate rounding error; resync once per full turn (amortised O(1))
+        self._since_resync += 1
+        if self._since_resync >= self.size:
+            self._resync()
+
+    def _resync(self) -> None:
+        values = self.values()
+        n = len(values)
+        self.mean = sum(values) / n if n else 0.0
+        self.m2 = sum((v - self.mean) ** 2 for v in values)
+        self._since_resync = 0
+
+    def values(self) -> List[float]:
+        if self.count < self.size:
+            return self.buf[:self.count]
+        return self.buf[self.head:] + self.buf[:self.head]
+
+    def variance(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return max(self.m2, 0.0) / self.count
+
+
+class Estimator(ABC):
+    """Base class: tracks the previous tick and hands log returns to on_return()."""
+
+    def __init__(self):
+        self.last_price: Optional[float] = None
+        self.last_ts: Optional[float] = None
+
+    def update(self, price: float, ts: float) -> None:
+        if self.last_price and price > 0:
+            self.on_return(math.log(price / self.last_price), ts - self.last_ts, ts)
+        self.last_price = price
+        self.last_ts = ts
+
+    def on_return(self, r: float, dt: float, ts: float) -> None:
+        pass
+
+    def update_bar(self, high: float, low: float, close: float, ts: float) -> None:
+        """Feed a stored OHLC bar; close-to-close estimators only see its close."""
+        self.update(close, ts)
+
+    @abstractmethod
+    def variance(self) -> float:
+        """Current estimate; annualised except for the legacy per-sample "window"."""
+
+
+class WindowVariance(Estimator):
+    """
+    Population variance of the last `size` log returns (np.var, as the legacy query did),
+    per sample; with `annualise`, divided by their mean spacing and annualised instead.
+    """
+
+    def __init__(self, size: int, annualise: bool = False):
+        super().__init__()
+        self.annualise = annualise
+        self.window = RollingWindow(size)
+        self.dts = RollingWindow(size)
+
+    def on_return(self, r, dt, ts):
+        if self.annualise:
+            if dt <= 0:
+                return
+            self.dts.push(dt)
+        self.window.push(r)
+
+    def variance(self):
+        if not self.annualise:
+            return self.window.variance()
+        if self.dts.mean <= 0:
+            return 0.0
+        return self.window.variance() / self.dts.mean * SECONDS_PER_YEAR
+
+
+class EwmaVariance(Estimator):
+    """RiskMetrics-style EWMA of squared returns, scaled by the tick interval."""
+
+    def __init__(self, lam: float = 0.94):
+        super().__init__()
+        self.lam = lam
+        self.var_rate: Optional[float] = None  # variance per second
+
+    def on_return(self, r, dt, ts):
+        if dt <= 0:
+            return
+        rate = r * r / dt
+        if self.var_rate is None:
+            self.var_rate = rate
+        else:
+            self.var_rate = self.lam * self.var_rate + (1 - self.lam) * rate
+
+    def variance(self):
+        return (self.var_rate or 0.0) * SECONDS_PER_YEAR
+
+
+class RealizedVariance(Estimator):
+    """Sum of squared returns over a trailing time horizon, annualised by the time covered."""
+
+    def __init__(self, horizon: float):
+        super().__init__()
+        self.horizon = horizon
+        self.samples = deque()  # (ts, r^2, dt)
+        self.sum_r2 = 0.0
+        self.sum_dt = 0.0
+
+    def on_return(self, r, dt, ts):
+        r2 = r * r
+        self.samples.append((ts, r2, dt))
+        self.sum_r2 += r2
+        self.sum_dt += dt
+        cutoff = ts - self.horizon
+        while self.samples and self.samples[0][0] <= cutoff:
+            _, old_r2, old_dt = self.samples.popleft()
+            self.sum_r2 -= old_r2
+            self.sum_dt -= old_dt
+        if not self.samples:
+            self.sum_r2 = self.sum_dt = 0.0
+
+    def variance(self):
+        if self.sum_dt <= 0:
+            return 0.0
+        return max(self.sum_r2, 0.0) / self.sum_dt * SECONDS_PER_YEAR
+
+
+class ParkinsonVariance(Estimator):
+    """
+    Parkinson range estimator over fixed-length bars built from the tick stream (or from
+    shorter stored bars, merged by their high/low):
+    sigma^2 per bar = ln(H/L)^2 / (4 ln 2), averaged over the last `bars` completed bars.
+    """
+
+    def __init__(self, bar_seconds: float = 60, bars: int = 30):
+        super().__init__()
+        self.bar_seconds = bar_seconds
+        self.window = RollingWindow(bars)
+        self.bar_id: Optional[int] = None
+        self.high = self.low = 0.0
+
+    def update(self, price, ts):
+        self.update_bar(price, price, price, ts)
+
+    def update_bar(self, high, low, close, ts):
+        bar_id = int(ts // self.bar_seconds)
+        if bar_id != self.bar_id:
+            self.close_bar()
+            self.bar_id = bar_id
+            self.high, self.low = high, low
+        else:
+            self.high = max(self.high, high)
+            self.low = min(self.low, low)
+
+    def close_bar(self) -> None:
+        if self.bar_id is not None and self.low > 0:
+            self.window.push(math.log(self.high / self.low) ** 2 / (4 * math.log(2)))
+
+    def variance(self):
+        if self.window.count == 0:
+            return 0.0
+        return self.window.mean / self.bar_seconds * SECONDS_PER_YEAR
+
+
+# -------------------------
+# Registry
+# -------------------------
+LEGACY_WINDOW = 50  # spot samples, same depth as the old "LIMIT 50" query
+
+ESTIMATORS: Dict[str, Callable[[], Estimator]] = {
+    "window": lambda: WindowVariance(LEGACY_WINDOW - 1),
+    "window_annual": lambda: WindowVariance(LEGACY_WINDOW - 1, annualise=True),
+    "ewma": lambda: EwmaVariance(0.94),
+    "rv_5m": lambda: RealizedVariance(5 * 60),
+    "rv_1h": lambda: RealizedVariance(60 * 60),
+    "rv_24h": lambda: RealizedVariance(24 * 60 * 60),
+    "parkinson": lambda: ParkinsonVariance(bar_seconds=60, bars=30),
+}
+ESTIMATOR_NAMES = list(ESTIMATORS)
+DEFAULT_ESTIMATOR = "window"
+
+
+class VolatilitySet:
+    """All registered estimators for one symbol, fed from the same tick stream."""
+
+    def __init__(self, names: Optional[List[str]] = None):
+        self.estimators = {name: ESTIMATORS[name]() for name in (names or ESTIMATOR_NAMES)}
+
+    def update(self, price: float, ts: float) -> None:
+        for est in self.estimators.values():
+            est.update(price, ts)
+
+    def update_bar(self, high: float, low: float, close: float, ts: float) -> None:
+        for est in self.estimators.values():
+            est.update_bar(high, low, close, ts)
+
+    def variance(self, name: str) -> float:
+        return self.estimators[name].variance()
+
+    def snapshot(self) -> Dict[str, float]:
+        return {name: est.variance() for name, est in self.estimators.items()}
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# Same import layout as app.py: the backend modules live in scripts/ and import each other by name
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND, "scripts"))
+
+FIXTURES = os.path.join(BACKEND, "tests", "fixtures")
+SCHEMA = os.path.join(BACKEND, "database", "schema.sql")
+# A throwaway Postgres database; its public schema is dropped and recreated from schema.sql
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURES, name)
+
+
+@pytest.fixture
+def pg_engine():
+    """Engine on a fresh copy of database/schema.sql; skipped when TEST_DATABASE_URL is unset."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy import create_engine
+
+    engine = create_engine(TEST_DATABASE_URL, future=True)
+    with open(SCHEMA, encoding="utf-8") as fh:
+        schema = fh.read()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP SCHEMA public CASCADE")
+        conn.exec_driver_sql("CREATE SCHEMA public")
+        conn.exec_driver_sql(schema)
+    yield engine
+    engine.dispose()
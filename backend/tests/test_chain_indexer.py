@@ -0,0 +1,127 @@
+"""
+Chain indexer against recorded logs (tests/fixtures/chain_main.json, chain_fork.json, in the
+RpcSource(record=...) format). Decoding runs anywhere; the replay needs TEST_DATABASE_URL.
+"""
+from sqlalchemy import text
+
+from chain_indexer import ChainIndexer, RecordedSource, decode_log
+from conftest import fixture_path
+from instruments import option_instrument_name
+from order_signing import LIMIT_ORDER_PROTOCOL
+
+ENGINE = "0x5fbdb2315678afecb367f032d93f642f64180aa3"
+HOOK = "0xe7f1725e7734ce288f8367e1bb143e90bb3f0512"
+NFT = "0x9fe46736679d2d9a65f0992f0272de9f3c7fa6e0"
+MAKER = "0x70997970c51812dc3a010c7d01b50e0d17dc79c8"
+TAKER = "0x3c44cdddb6a900fa2b585dd299e03d12fa4293bc"
+ORDER_A = "0x" + "aa" * 32
+ORDER_B = "0x" + "bb" * 32
+INSTRUMENT = option_instrument_name("0x420000", 2500, 1767225600, True)
+
+
+def main_source():
+    return RecordedSource([fixture_path("chain_main.json")])
+
+
+def fork_source():
+    return RecordedSource([fixture_path("chain_main.json"), fixture_path("chain_fork.json")])
+
+
+def indexer(source, engine):
+    return ChainIndexer(source, engine, engine_address=ENGINE, hook_address=HOOK, nft_address=NFT,
+                        lop_address=LIMIT_ORDER_PROTOCOL, start_block=10, batch_blocks=2, confirmations=0)
+
+
+def test_decode_recorded_logs():
+    events = [decode_log(log) for log in main_source().logs(10, 12, [])]
+    names = [e["event"] if e else None for e in events]
+    # the ERC-20 Transfer (no indexed tokenId) at 10/5 does not decode
+    assert names == ["OptionCreated", "PreInterCalled", "PostInterCalled", "Transfer", "OrderFilled", None,
+                     "OrderCancelled", "OrderFilled"]
+    created, pre, post, transfer, filled = events[:5]
+    assert (created["option_id"], created["account"]) == (1, MAKER)
+    assert (pre["account"], pre["option_id"], pre["amount"]) == (TAKER, 1, 25)
+    assert (post["counterparty"], post["account"]) == (MAKER, TAKER)
+    assert (transfer["counterparty"], transfer["account"], transfer["contract"]) == (MAKER, TAKER, NFT)
+    assert (filled["order_hash"], filled["amount"], filled["block_number"], filled["log_index"]) == (ORDER_A, 600, 10, 4)
+    assert events[6]["order_hash"] == ORDER_B
+
+
+def test_recorded_source_later_file_wins():
+    source = fork_source()
+    assert source.head() == 13
+    assert source.block_hash(11) == main_source().block_hash(11)
+    assert source.block_hash(12) != main_source().block_hash(12)
+    assert [decode_log(log)["amount"] for log in source.logs(12, 12, [LIMIT_ORDER_PROTOCOL])] == [300]
+
+
+def _seed_orders(conn):
+    for order_hash, chain_hash in ((ORDER_A.replace("aa", "a1"), ORDER_A), (ORDER_B.replace("bb", "b1"), ORDER_B)):
+        conn.execute(text("""
+            INSERT INTO orders (order_hash, chain_order_hash, maker, maker_asset, taker_asset, making_amount,
+                                taking_amount, salt, maker_traits, order_data)
+            VALUES (:order_hash, :chain_hash, :maker, :asset, :asset, '1000', '100', '1', '0', '{}')
+        """), {"order_hash": order_hash, "chain_hash": chain_hash, "maker": MAKER, "asset": ENGINE})
+    # two matched reservations on order A, oldest first
+    conn.execute(text("""
+        INSERT INTO order_reservations (request_id, order_hash, taker, amount, reserved_until, created_at)
+        VALUES ('r1', :h, :taker, 300, 0, '2026-01-01T00:00:00Z'), ('r2', :h, :taker, 200, 0, '2026-01-01T00:00:01Z')
+    """), {"h": ORDER_A.replace("aa", "a1"), "taker": TAKER})
+
+
+def _orders(conn):
+    return {r.chain_order_hash: (r.status, r.remaining_amount) for r in conn.execute(text(
+        "SELECT chain_order_hash, status, remaining_amount FROM orders"))}
+
+
+def _holdings(conn):
+    return {(r.user_address, r.instrument_name): float(r.quantity) for r in conn.execute(text(
+        "SELECT user_address, instrument_name, quantity FROM holdings"))}
+
+
+def _checkpoint(conn):
+    return tuple(conn.execute(text("SELECT block_number, block_hash FROM chain_sync WHERE name = 'main'")).one())
+
+
+def _reservations(conn):
+    return {r.request_id: int(r.amount) for r in conn.execute(text("SELECT request_id, amount FROM order_reservations"))}
+
+
+def test_replay_fill_cancel_and_reorg(pg_engine):
+    with pg_engine.begin() as conn:
+        _seed_orders(conn)
+    main = main_source()
+    idx = indexer(main, pg_engine)
+
+    # blocks 10-11: option sold to the taker, order A filled 1000 -> 600, order B cancelled
+    result = idx.sync_once()
+    assert (result.from_block, result.to_block, result.events) == (10, 11, 6)
+    with pg_engine.connect() as conn:
+        assert _orders(conn) == {ORDER_A: ("open", "600"), ORDER_B: ("cancelled", None)}
+        assert _holdings(conn) == {(TAKER, INSTRUMENT): 1.0}
+        assert _checkpoint(conn) == (11, main.block_hash(11))
+        # the 400 that landed settles r1 (300) and 100 of r2
+        assert _reservations(conn) == {"r2": 100}
+
+    # block 12: order A filled out
+    result = idx.sync_once()
+    assert (result.from_block, result.to_block) == (12, 12)
+    with pg_engine.connect() as conn:
+        assert _orders(conn)[ORDER_A] == ("filled", "0")
+        assert _checkpoint(conn) == (12, main.block_hash(12))
+        assert _reservations(conn) == {}
+
+    # nothing new past the head
+    assert idx.sync_once().from_block is None
+
+    # block 12 is replaced: roll back to 11, then apply the fork's 12 (A down to 300) and 13 (exercise)
+    fork = fork_source()
+    idx.source = fork
+    result = idx.sync_once()
+    assert result.rolled_back_to == 11
+    assert (result.from_block, result.to_block) == (12, 13)
+    with pg_engine.connect() as conn:
+        assert _orders(conn) == {ORDER_A: ("open", "300"), ORDER_B: ("cancelled", None)}
+        assert _holdings(conn) == {}
+        assert _checkpoint(conn) == (13, fork.block_hash(13))
+        assert conn.execute(text("SELECT count(*) FROM chain_events WHERE block_number = 12")).scalar() == 1
@@ -0,0 +1,141 @@
+import pytest
+
+from matching_engine import EventLog, MatchingEngine, ReservationError, ReservationStore
+from order_book import OrderBook
+
+UNDERLYING = "0x" + "11" * 20
+QUOTE = "0x" + "22" * 20
+MAKER = "0x" + "a1" * 20
+OTHER_MAKER = "0x" + "a2" * 20
+TAKER = "0x" + "b1" * 20
+OTHER_TAKER = "0x" + "b2" * 20
+STRIKE, EXPIRY = 2500, 1767225600
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FailingStore(ReservationStore):
+    def reserve(self, *args):
+        raise OSError("database is down")
+
+
+def ask(order_hash, premium, amount, maker=MAKER):
+    return {
+        "order_hash": order_hash,
+        "maker": maker,
+        "maker_asset": UNDERLYING,
+        "taker_asset": QUOTE,
+        "making_amount": str(amount),
+        "taking_amount": str(premium * amount),
+        "salt": "1",
+        "maker_traits": "0",
+        "option_strike": STRIKE,
+        "option_expiry": EXPIRY,
+        "option_type": "call",
+        "option_premium": premium,
+        "signature": "0x" + "ab" * 65,
+        "extension_data": "0x",
+    }
+
+
+def make_engine(*rows, log=None, reservations=None):
+    engine = MatchingEngine(OrderBook(), log, reservations, reservation_seconds=60)
+    engine.clock = Clock()
+    engine.book.loaded = True
+    for row in rows:
+        engine.on_maker_added(engine.book.add(row))
+    return engine
+
+
+def submit(engine, amount, limit=40, taker=TAKER, tif="gtc", request_id=None):
+    return engine.submit(taker, UNDERLYING, QUOTE, "call", STRIKE, EXPIRY, limit, amount, tif, request_id)
+
+
+def fills(bundle):
+    return [(f.order.order_hash, f.making_amount, f.taking_amount) for f in bundle.fills]
+
+
+def test_price_time_priority():
+    engine = make_engine(ask("0xlate", 30, 100), ask("0xpricey", 35, 100), ask("0xlater", 30, 100))
+    bundle = submit(engine, 250)
+    # best premium first, FIFO within the level
+    assert fills(bundle) == [("0xlate", 100, 3000), ("0xlater", 100, 3000), ("0xpricey", 50, 1750)]
+    assert bundle.request.remaining == 0
+
+
+def test_limit_and_self_trade_are_skipped():
+    engine = make_engine(ask("0xown", 20, 100, maker=TAKER), ask("0xcheap", 30, 100), ask("0xdear", 50, 100))
+    bundle = submit(engine, 300, limit=40, tif="ioc")
+    assert fills(bundle) == [("0xcheap", 100, 3000)]
+    assert engine.book.get(bundle.request.request_id) is None  # IOC remainder does not rest
+
+
+def test_fill_reserves_until_released():
+    engine = make_engine(ask("0xa", 30, 100))
+    first = submit(engine, 100, request_id="r1")
+    assert first.fills[0].reserved_until == engine.clock.now + 60
+    assert engine.reservations.entries == {("r1", "0xa"): (100, engine.clock.now + 60, TAKER)}
+    # fully reserved: still booked, but nothing left to match
+    assert engine.book.get("0xa").amount == 0
+    second = submit(engine, 100, taker=OTHER_TAKER, request_id="r2")
+    assert second.fills == [] and engine.book.get("r2") is not None
+
+
+def test_cancel_releases_and_recrosses_resting_bids():
+    engine = make_engine(ask("0xa", 30, 100))
+    submit(engine, 100, request_id="r1")
+    submit(engine, 60, taker=OTHER_TAKER, request_id="r2")
+
+    assert not engine.cancel("r1", OTHER_TAKER)  # only the request's own taker may cancel
+    assert engine.cancel("r1", TAKER)
+    # the released 100 crossed the resting r2 at once
+    assert engine.reservations.entries.keys() == {("r2", "0xa")}
+    assert engine.book.get("0xa").amount == 40
+    assert engine.book.get("r2") is None
+    assert not engine.cancel("r1", TAKER)
+
+
+def test_expired_reservations_return_to_the_book():
+    engine = make_engine(ask("0xa", 30, 100))
+    submit(engine, 70, request_id="r1")
+    engine.clock.now += 59
+    assert engine.release_expired() == 0
+    engine.clock.now += 1
+    assert engine.release_expired() == 1
+    assert engine.reservations.entries == {}
+    assert engine.book.get("0xa").amount == 100
+
+
+def test_unreservable_fill_is_not_made():
+    engine = make_engine(ask("0xa", 30, 100), reservations=FailingStore())
+    with pytest.raises(ReservationError):
+        submit(engine, 50, request_id="r1")
+    assert engine.book.get("0xa").amount == 100
+    assert engine.book.get("r1") is None
+    assert engine.matched == 0
+
+
+def test_replay_reproduces_fills(tmp_path):
+    path = str(tmp_path / "match.jsonl")
+    log = EventLog(path)
+    engine = make_engine(ask("0xa", 30, 100), ask("0xb", 32, 100), log=log)
+    submit(engine, 150, request_id="r1")
+    submit(engine, 100, taker=OTHER_TAKER, request_id="r2")
+    engine.cancel("r1", TAKER)
+    engine.clock.now += 120
+    engine.release_expired()
+    engine.on_maker_added(engine.book.add(ask("0xc", 31, 100, maker=OTHER_MAKER)))
+    log.fh.close()
+
+    replayed = MatchingEngine.replay(EventLog.read(path))
+    assert replayed.matched == engine.matched
+    assert replayed.reservations.entries.keys() == engine.reservations.entries.keys()
+    for order_hash in ("0xa", "0xb", "0xc", "r2"):
+        live, again = engine.book.get(order_hash), replayed.book.get(order_hash)
+        assert (live and live.amount) == (again and again.amount)
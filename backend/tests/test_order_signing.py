@@ -0,0 +1,118 @@
+import pytest
+from eth_keys import keys
+
+from order_signing import (MATCH_FIELDS, S_UPPER_BOUND, OrderVerifier, abi_order_hash, domain_separator,
+                           order_hash, order_tuple, personal_digest, recover_signer, taker_message)
+
+MAKER_KEY = keys.PrivateKey(b"\x01" * 32)
+OTHER_KEY = keys.PrivateKey(b"\x02" * 32)
+MAKER = MAKER_KEY.public_key.to_checksum_address()
+DOMAIN = domain_separator()
+
+
+def sign(digest, key=MAKER_KEY):
+    sig = key.sign_msg_hash(digest)
+    return "0x" + sig.r.to_bytes(32, "big").hex() + sig.s.to_bytes(32, "big").hex() + format(sig.v + 27, "02x")
+
+
+def compact(signature):
+    """EIP-2098 r|vs form of a 65-byte signature."""
+    raw = bytes.fromhex(signature[2:])
+    vs = int.from_bytes(raw[32:64], "big") | ((raw[64] - 27) << 255)
+    return "0x" + raw[:32].hex() + format(vs, "064x")
+
+
+def signed_order(key=MAKER_KEY, **overrides):
+    row = {
+        "salt": "42",
+        "maker": MAKER,
+        "maker_asset": "0x" + "11" * 20,
+        "taker_asset": "0x" + "22" * 20,
+        "making_amount": "1000000000000000000",
+        "taking_amount": "25000000",
+        "maker_traits": "0",
+    }
+    row.update(overrides)
+    digest = order_hash(order_tuple(row), DOMAIN)
+    row.setdefault("order_hash", "0x" + digest.hex())
+    row.setdefault("signature", sign(digest, key))
+    return row
+
+
+@pytest.fixture
+def verifier():
+    v = OrderVerifier(pool="thread", workers=2)
+    yield v
+    v.close()
+
+
+def test_accepts_maker_signed_orders(verifier):
+    row = signed_order()
+    abi_hashed = dict(row, order_hash="0x" + abi_order_hash(order_tuple(row)).hex())
+    assert verifier.verify_many([(row, None), (dict(row, signature=compact(row["signature"])), None),
+                                 (abi_hashed, None)]) == [None, None, None]
+
+
+@pytest.mark.parametrize("change, reason", [
+    (lambda row: row.update(making_amount="2000000000000000000"), "orderHash does not match order fields"),
+    (lambda row: row.update(signature=signed_order(OTHER_KEY)["signature"]), "Signature is not from maker"),
+    (lambda row: row.update(signature=None), "Missing signature"),
+    (lambda row: row.update(signature="0x1234"), "Invalid signature"),
+    (lambda row: row.update(signature="0xzz"), "Malformed signature"),
+    (lambda row: row.update(salt="-1"), "Unsignable order: out of uint256 range"),
+])
+def test_rejects_bad_orders(verifier, change, reason):
+    row = signed_order()
+    change(row)
+    assert verifier.verify(row) == reason
+
+
+def test_rejects_high_s_signatures():
+    row = signed_order()
+    raw = bytes.fromhex(row["signature"][2:])
+    s = int.from_bytes(raw[32:64], "big")
+    secp256k1n = 2 * S_UPPER_BOUND + 1
+    flipped = raw[:32] + (secp256k1n - s).to_bytes(32, "big") + bytes([raw[64] ^ 1])
+    digest = order_hash(order_tuple(row), DOMAIN)
+    assert recover_signer(digest, row["signature"]) == MAKER[2:].lower()
+    assert recover_signer(digest, "0x" + flipped.hex()) is None
+
+
+def test_cache_is_keyed_by_every_signed_field(verifier):
+    row = signed_order()
+    assert verifier.verify(row) is None
+    assert verifier.verify(dict(row)) is None
+    # same orderHash and signature with an altered amount is verified afresh, and fails
+    assert verifier.verify(dict(row, taking_amount="1")) == "orderHash does not match order fields"
+    assert (verifier.hits, verifier.misses, verifier.rejected) == (1, 2, 1)
+
+
+def test_warn_and_off_modes_accept_everything():
+    bad = signed_order(signature=None)
+    for mode in ("warn", "off"):
+        v = OrderVerifier(mode=mode, pool="thread", workers=1)
+        assert v.verify(bad) is None
+        v.close()
+
+
+def test_process_pool_verifies_chunks():
+    v = OrderVerifier(pool="process", workers=2)
+    try:
+        rows = [signed_order(salt=str(i)) for i in range(40)] + [signed_order(signature=None)]
+        assert v.verify_many([(row, None) for row in rows]) == [None] * 40 + ["Missing signature"]
+    finally:
+        v.close()
+
+
+def test_taker_request_signatures(verifier):
+    body = {"taker": MAKER, "makerAsset": "0x" + "11" * 20, "takerAsset": "0x" + "22" * 20, "optionType": "call",
+            "optionStrike": 2500, "optionExpiry": 1767225600, "maxPremium": "30", "amount": 10, "deadline": 1}
+    message = taker_message("match", body, MATCH_FIELDS)
+    assert message.decode().splitlines()[:2] == ["OpEx match", f"taker: {MAKER}"]
+    assert "timeInForce: " in message.decode().splitlines()
+    signature = sign(personal_digest(message))
+    assert verifier.verify_taker(message, signature, MAKER) is None
+    altered = taker_message("match", dict(body, amount=11), MATCH_FIELDS)
+    assert verifier.verify_taker(altered, signature, MAKER) == "Signature is not from taker"
+    assert verifier.verify_taker(message, sign(personal_digest(message), OTHER_KEY), MAKER) == \
+        "Signature is not from taker"
@@ -23,7 +23,7 @@ export default function Options() {
   const [selectedUnderlyingAsset, setSelectedUnderlyingAsset] =
     useState<string>("1INCH");
   const [selectedExpiryPeriod, setSelectedExpiryPeriod] =
-    useState<string>("7d");
+    useState<string>("weekly");
 
   const {
     data,
@@ -41,7 +41,7 @@ export function OptionsFilters({
 
   // Format expiry period for display
   const formatExpiryPeriod = (period: string): string => {
-    return period.toUpperCase(); // "7d" -> "7D", "30d" -> "30D"
+    return period.charAt(0).toUpperCase() + period.slice(1); // "weekly" -> "Weekly"
   };
 
   return (
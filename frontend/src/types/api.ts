@@ -2,6 +2,9 @@
 export interface ApiOptionResponse {
   expiration_date: number;
   heston_price: number;
+  bid_price: number | null;
+  ask_price: number | null;
+  implied_vol: number | null;
   instrument_name: string;
   option_type: "call" | "put";
   strike_price: number;
@@ -11,6 +14,9 @@ export interface ApiOptionResponse {
 export interface ApiHistoryResponse {
   expiration_date: number;
   heston_price: number;
+  bid_price: number | null;
+  ask_price: number | null;
+  implied_vol: number | null;
   instrument_name: string;
   option_type: "call" | "put";
   strike_price: number;
@@ -248,7 +248,7 @@ export function calculateTimeToExpiry(expirationTimestamp: number): string {
 // Parse instrument name to extract components
 export function parseInstrumentName(instrumentName: string) {
   // Format: <underlying_asset>-<strike_price>-<expiry_date>-<call/put>
-  // Example: 1INCH-0.219-7d-put
+  // Example: ETH-3420-20261023-call (expiry date is YYYYMMDD, UTC)
   const parts = instrumentName.split("-");
   if (parts.length !== 4) {
     console.warn(`Invalid instrument name format: ${instrumentName}`);
@@ -258,7 +258,7 @@ export function parseInstrumentName(instrumentName: string) {
   return {
     underlyingAsset: parts[0],
     strikePrice: parseFloat(parts[1]),
-    expiryPeriod: parts[2], // e.g., "7d", "30d"
+    expiryDate: parts[2], // e.g., "20261023"; filter on expiration_date instead
     optionType: parts[3] as "call" | "put",
   };
 }
@@ -274,15 +274,44 @@ export function filterByUnderlyingAsset(
   });
 }
 
+// Expiry periods of the listed chain: the next weekly and the month-end contract
+export const EXPIRY_PERIODS = ["weekly", "monthly"] as const;
+export type ExpiryPeriod = (typeof EXPIRY_PERIODS)[number];
+
+// Month-end contracts expire on the last Friday of their month (08:00 UTC)
+function isMonthEnd(expirationTimestamp: number): boolean {
+  const expiry = new Date(expirationTimestamp * 1000);
+  const weekLater = new Date((expirationTimestamp + 7 * 24 * 60 * 60) * 1000);
+  return (
+    expiry.getUTCDay() === 5 && weekLater.getUTCMonth() !== expiry.getUTCMonth()
+  );
+}
+
+// Expiry (unix seconds) a period stands for: the nearest live expiry for "weekly",
+// the nearest month-end for "monthly"
+export function expiryForPeriod(
+  apiData: ApiOptionResponse[],
+  expiryPeriod: string
+): number | null {
+  const now = Date.now() / 1000;
+  const expiries = Array.from(
+    new Set(apiData.map((option) => option.expiration_date))
+  )
+    .filter((expiry) => expiry > now)
+    .sort((a, b) => a - b);
+  const candidates =
+    expiryPeriod === "monthly" ? expiries.filter(isMonthEnd) : expiries;
+  return candidates.length > 0 ? candidates[0] : null;
+}
+
 // Filter options data by expiry period
 export function filterByExpiryPeriod(
   apiData: ApiOptionResponse[],
   expiryPeriod: string
 ): ApiOptionResponse[] {
-  return apiData.filter((option) => {
-    const parsed = parseInstrumentName(option.instrument_name);
-    return parsed?.expiryPeriod === expiryPeriod;
-  });
+  if (expiryPeriod === "all") return apiData;
+  const expiry = expiryForPeriod(apiData, expiryPeriod);
+  return apiData.filter((option) => option.expiration_date === expiry);
 }
 
 // Get unique underlying assets from API data
@@ -301,18 +330,11 @@ export function getUniqueUnderlyingAssets(
   return Array.from(assets).sort();
 }
 
-// Get unique expiry periods from API data
+// Get the expiry periods that have a listed expiry in the API data
 export function getUniqueExpiryPeriods(apiData: ApiOptionResponse[]): string[] {
-  const periods = new Set<string>();
-
-  apiData.forEach((option) => {
-    const parsed = parseInstrumentName(option.instrument_name);
-    if (parsed) {
-      periods.add(parsed.expiryPeriod);
-    }
-  });
-
-  return Array.from(periods).sort();
+  return EXPIRY_PERIODS.filter(
+    (period) => expiryForPeriod(apiData, period) !== null
+  );
 }
 
 // Price-related API functions
@@ -22,6 +22,9 @@ export interface OptionHistory {
     option_type: "call" | "put";
     timestamp: string;
   }>;
+  // Long histories arrive in several chunks; absent on single-message histories
+  offset?: number;
+  final?: boolean;
 }
 
 export interface WebSocketEventHandlers {
@@ -38,6 +41,7 @@ class WebSocketManager {
   private maxReconnectAttempts = 5;
   private reconnectDelay = 1000;
   private subscriptions = new Set<string>();
+  private historyChunks = new Map<string, OptionHistory["data"]>();
   private eventHandlers: WebSocketEventHandlers = {};
 
   constructor() {
@@ -90,13 +94,21 @@ class WebSocketManager {
     });
 
     this.socket.on("history", (data: OptionHistory) => {
+      // Concatenate chunked histories and hand them on once the last chunk is in
+      const previous = data.offset ? this.historyChunks.get(data.instrument) ?? [] : [];
+      const points = previous.concat(data.data);
+      if (data.final === false) {
+        this.historyChunks.set(data.instrument, points);
+        return;
+      }
+      this.historyChunks.delete(data.instrument);
       console.log(
         "📈 Received history for:",
         data.instrument,
-        data.data.length,
+        points.length,
         "points"
       );
-      this.eventHandlers.onHistory?.(data);
+      this.eventHandlers.onHistory?.({ instrument: data.instrument, data: points });
     });
 
     this.socket.on("update", (data: OptionUpdate) => {